@@ -152,7 +152,7 @@ Issue: "No listings found"
   → Use --mock flag to test: python main.py "car" 1 --mock
 
 Issue: Timeout errors
-  → Increase REQUEST_DELAY_MIN/MAX in config.py
+  → Lower RATE_LIMIT_PER_SECOND in config.py
   → Check your internet connection
 
 Issue: Playwright installation failed
@@ -78,7 +78,7 @@ TROUBLESHOOTING
    → Prueba con --mock mientras investigas
 
 ❌ Timeout error:
-   → Aumenta REQUEST_DELAY_MIN/MAX en config.py
+   → Reduce RATE_LIMIT_PER_SECOND en config.py
    → Verifica tu conexión a internet
 
 ❌ Playwright error:
@@ -94,8 +94,8 @@ Para desarrollo rápido:
 config.SCRAPER_TIMEOUT = 20000  # 20 segundos
 
 Para scraping profundo:
-config.REQUEST_DELAY_MIN = 3
-config.REQUEST_DELAY_MAX = 7
+config.RATE_LIMIT_PER_SECOND = 0.25
+config.RATE_LIMIT_BURST = 1
 
 Para máxima precisión:
 config.DEAL_THRESHOLD = 2.0  # más estricto
@@ -2,6 +2,7 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+from src.backend_registry import backend_registry
 from src.processor import DataProcessor
 from src.scraper import scrape_revolico
 import config
@@ -389,6 +390,7 @@ def render_analytics(df):
 def main():
     """Main application function."""
     setup_page()
+    backend_registry.probe()  # probed on the first run only, then cached for the process
     
     # Sidebar with settings
     settings = render_advanced_sidebar()
@@ -415,7 +417,7 @@ def main():
                 
                 try:
                     logger.info(f"Scraping real data for: {settings['query']}")
-                data = scrape_revolico(settings['query'], max_pages=settings['max_pages'])
+                data = scrape_revolico(settings['query'], max_pages=settings['max_pages'], race=True)
                 logger.info(f"Got {len(data) if data else 0} listings")
                 
             except Exception as e:
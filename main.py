@@ -4,7 +4,8 @@ import json
 import os
 from datetime import datetime
 from pathlib import Path
-from src.scraper import scrape_revolico
+from src.backend_registry import backend_registry
+from src.scraper import scrape_revolico_async
 from src.processor import DataProcessor
 from logger import get_logger
 import config
@@ -38,7 +39,7 @@ async def main(query: str, max_pages: int = 1, use_mock: bool = False):
     else:
         logger.info("Scraping Revolico")
         try:
-            data = await scrape_revolico(query, max_pages=max_pages)
+            data = await scrape_revolico_async(query, max_pages=max_pages)
         except Exception as e:
             logger.error(f"Scraping failed: {e}", exc_info=True)
             return
@@ -136,4 +137,11 @@ if __name__ == "__main__":
     max_pages = int(sys.argv[2]) if len(sys.argv) > 2 else 1
     use_mock = "--mock" in sys.argv
     
+    if "--health" in sys.argv:
+        # Which backends can run on this machine, as JSON (exit code 1 if none)
+        report = backend_registry.report()
+        print(json.dumps(report, indent=2))
+        sys.exit(0 if report['usable'] else 1)
+    
+    backend_registry.probe()  # once at startup, not on the first scrape
     asyncio.run(main(query, max_pages=max_pages, use_mock=use_mock))
\ No newline at end of file
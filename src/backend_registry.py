@@ -0,0 +1,169 @@
+"""Which scraping backends can run here, probed once per process."""
+import copy
+import importlib.util
+import re
+import shutil
+import subprocess
+import threading
+import time
+from logger import get_logger
+import config
+
+logger = get_logger(__name__)
+
+# The batched curl-direct scraper needs --parallel (7.66), --no-progress-meter
+# (7.67) and, in its -w line, %{stderr} (7.63) and %{exitcode}/%{errormsg} (7.75)
+CURL_MIN_VERSION = (7, 75)
+PROBE_TIMEOUT = 5.0  # seconds a probe may spend running an executable
+
+
+def _missing_modules(*requirements) -> list[str]:
+    """The requirements that cannot be imported here; 'a|b' is met by either module."""
+    return [requirement for requirement in requirements
+            if not any(importlib.util.find_spec(name) for name in requirement.split('|'))]
+
+
+def _needs_modules(*requirements) -> dict:
+    """Capability of a backend that only needs Python packages."""
+    missing = _missing_modules(*requirements)
+    if missing:
+        return {'available': False, 'reason': f"missing Python package(s): {', '.join(missing)}"}
+    return {'available': True, 'reason': None}
+
+
+def _probe_http2() -> dict:
+    if not config.HTTP2_ENABLED:
+        return {'available': False, 'reason': "disabled (SCRAPER_HTTP2=0)"}
+    return _needs_modules('httpx', 'h2', 'bs4')
+
+
+def _probe_requests() -> dict:
+    return _needs_modules('requests', 'httpx', 'bs4')
+
+
+def _probe_curl() -> dict:
+    """The curl executable: present, runnable and recent enough for batched transfers."""
+    from src.scraper_curl import curl_binary
+    
+    capability = _needs_modules('bs4')
+    if not capability['available']:
+        return capability
+    binary = curl_binary()
+    path = shutil.which(binary)
+    if not path:
+        return {'available': False, 'reason': f"{binary} executable not found on PATH"}
+    try:
+        output = subprocess.run([path, "--version"], capture_output=True, text=True,
+                                timeout=PROBE_TIMEOUT, errors='ignore').stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        return {'available': False, 'reason': f"{binary} --version failed: {e}"}
+    
+    match = re.match(r"curl (\d+)\.(\d+)(?:\.(\d+))?", output)
+    if not match:
+        return {'available': False, 'reason': f"unrecognised {binary} --version output"}
+    version = tuple(int(part) for part in match.groups(default="0"))
+    features = re.search(r"^Features:(.*)$", output, re.MULTILINE)
+    capability = {
+        'available': version[:2] >= CURL_MIN_VERSION,
+        'reason': None,
+        'binary': path,
+        'version': ".".join(map(str, version)),
+        'features': features.group(1).split() if features else [],
+    }
+    if not capability['available']:
+        capability['reason'] = (f"curl {capability['version']} is too old "
+                                f"(needs {'.'.join(map(str, CURL_MIN_VERSION))}+)")
+    return capability
+
+
+def _probe_ultimate() -> dict:
+    """curl-cffi, else cloudscraper, else plain requests: usable in any of these modes."""
+    capability = _needs_modules('requests', 'bs4')
+    if capability['available']:
+        capability['client'] = next(
+            (name for name in ('curl_cffi', 'cloudscraper') if importlib.util.find_spec(name)), 'requests'
+        )
+    return capability
+
+
+# Probe of every backend, by name: RevolicoScraper.BACKENDS plus the
+# standalone browser-based scrapers
+PROBES = {
+    'http2': _probe_http2,
+    'requests': _probe_requests,
+    'curl-direct': _probe_curl,
+    'ultimate': _probe_ultimate,
+    'cloudflare': lambda: _needs_modules('cloudscraper', 'bs4'),
+    'selenium': lambda: _needs_modules('undetected_chromedriver', 'selenium'),
+    'playwright': lambda: _needs_modules('playwright', 'bs4'),
+}
+
+
+class BackendRegistry:
+    """
+    Capability map of the scraping backends.
+    
+    Each backend's probe checks its Python packages (without importing them)
+    and executables once, on first use (or an explicit probe() at startup);
+    the map is then reused for the life of the process, so scrapes skip a
+    backend that cannot run here at no cost instead of failing on it every
+    time. A backend without a probe is assumed usable.
+    """
+    
+    def __init__(self, probes: dict = None):
+        self.probes = PROBES if probes is None else probes
+        self._capabilities = None
+        self._probed_at = None
+        self._lock = threading.Lock()
+    
+    def probe(self, refresh: bool = False) -> dict:
+        """
+        Probe every backend (the first time, or again with ``refresh``).
+        
+        Returns:
+            {backend: {'available': bool, 'reason': why not or None, ...details}}
+        """
+        with self._lock:
+            if self._capabilities is None or refresh:
+                self._capabilities = {name: self._run_probe(name, probe) for name, probe in self.probes.items()}
+                self._probed_at = time.time()
+                usable = [name for name, capability in self._capabilities.items() if capability['available']]
+                logger.info(f"Usable backends: {', '.join(usable) or 'none'}")
+                for name, capability in self._capabilities.items():
+                    if not capability['available']:
+                        logger.info(f"Backend {name} unavailable: {capability['reason']}")
+            return self._capabilities
+    
+    @staticmethod
+    def _run_probe(name: str, probe) -> dict:
+        start = time.perf_counter()
+        try:
+            capability = dict(probe())
+        except Exception as e:
+            logger.debug(f"Probe of {name} failed", exc_info=True)
+            capability = {'available': False, 'reason': f"probe failed: {e}"}
+        capability['probe_seconds'] = round(time.perf_counter() - start, 3)
+        return capability
+    
+    def available(self, backend: str) -> bool:
+        """Whether ``backend`` can run here."""
+        capability = self.probe().get(backend)
+        return capability is None or capability['available']
+    
+    def usable(self, backends) -> list[str]:
+        """``backends`` minus those that cannot run here, in the same order."""
+        return [backend for backend in backends if self.available(backend)]
+    
+    def report(self) -> dict:
+        """Capability map for health checks: {'probed_at', 'usable', 'backends'}."""
+        capabilities = self.probe()
+        with self._lock:
+            return {
+                'probed_at': self._probed_at,
+                'usable': [name for name, capability in capabilities.items() if capability['available']],
+                'backends': copy.deepcopy(capabilities),
+            }
+
+
+# Shared by every scrape in this process
+backend_registry = BackendRegistry()
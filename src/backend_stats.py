@@ -0,0 +1,103 @@
+"""Rolling per-backend success/latency stats used to order scrape attempts."""
+import random
+import time
+from pathlib import Path
+from logger import get_logger
+from src.json_store import JsonStore
+import config
+
+logger = get_logger(__name__)
+
+# Outcomes recorded for an attempt
+SUCCESS = 'success'
+EMPTY = 'empty'
+CHALLENGE = 'challenge'
+ERROR = 'error'
+
+
+def _percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile of ``values`` (which must not be empty)."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class BackendStats:
+    """
+    Last BACKEND_STATS_WINDOW outcomes of every scraping backend.
+    
+    order() ranks backends by expected time-to-success: the latency of an
+    attempt divided by a success probability drawn from Beta(successes + 1,
+    failures + 1). Sampling (rather than using the mean) keeps giving
+    backends with few samples a chance, while one that works now quickly
+    moves to the front. The window is persisted as JSON under CACHE_DIR,
+    in a JsonStore like the cookie vault, so it survives restarts.
+    """
+    
+    def __init__(self, path: Path = None, window: int = None, rng: random.Random = None):
+        self.path = Path(path or config.CACHE_DIR / "backend_stats.json")
+        self.window = window or config.BACKEND_STATS_WINDOW
+        self._store = JsonStore(self.path, "backend stats")
+        self._rng = rng or random.Random()
+    
+    def record(self, backend: str, outcome: str, latency: float):
+        """
+        Remember the outcome of one attempt.
+        
+        Args:
+            backend: Backend name
+            outcome: SUCCESS, EMPTY, CHALLENGE or ERROR
+            latency: Seconds the attempt took
+        """
+        with self._store.locked() as data:
+            samples = data.setdefault(backend, [])
+            samples.append([outcome, round(latency, 3), time.time()])
+            del samples[:-self.window]
+        logger.debug(f"Backend {backend}: {outcome} in {latency:.2f}s")
+    
+    def summary(self, backend: str) -> dict:
+        """Success rate, challenge rate and p50/p95 latency over the window."""
+        samples = self._store.read().get(backend, [])
+        if not samples:
+            return {'attempts': 0, 'success_rate': None, 'challenge_rate': None,
+                    'p50': None, 'p95': None}
+        latencies = [latency for _, latency, _ in samples]
+        return {
+            'attempts': len(samples),
+            'success_rate': sum(1 for o, _, _ in samples if o == SUCCESS) / len(samples),
+            'challenge_rate': sum(1 for o, _, _ in samples if o == CHALLENGE) / len(samples),
+            'p50': _percentile(latencies, 0.5),
+            'p95': _percentile(latencies, 0.95),
+        }
+    
+    def stats(self) -> dict:
+        """summary() of every backend seen so far."""
+        return {backend: self.summary(backend) for backend in self._store.read()}
+    
+    def order(self, backends) -> list:
+        """
+        Backends sorted by sampled expected time-to-success (best first).
+        
+        Backends without history get the default latency and a uniform
+        prior; ties keep the order given.
+        """
+        data = self._store.read()
+        scored = []
+        for position, backend in enumerate(backends):
+            samples = data.get(backend, [])
+            successes = sum(1 for o, _, _ in samples if o == SUCCESS)
+            p_success = self._rng.betavariate(successes + 1, len(samples) - successes + 1)
+            latency = (_percentile([s[1] for s in samples], 0.5) if samples
+                       else config.BACKEND_DEFAULT_LATENCY)
+            scored.append((latency / max(p_success, 1e-6), position, backend))
+        ordered = [backend for _, _, backend in sorted(scored)]
+        logger.debug(f"Backend order: {ordered}")
+        return ordered
+    
+    def clear(self):
+        """Forget all recorded outcomes."""
+        with self._store.locked() as data:
+            data.clear()
+
+
+backend_stats = BackendStats()
@@ -0,0 +1,284 @@
+"""Warm Playwright browsers on long-lived worker threads, shared by every browser-based scrape."""
+import atexit
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from logger import get_logger
+from src.deadline import Deadline, DeadlineExceeded
+from src.threading_wrapper import use_compatible_event_loop
+import config
+
+logger = get_logger(__name__)
+
+_STOP = object()  # queue sentinel: the worker closes its browser and exits
+
+
+def launch_chromium(headless: bool, args: list):
+    """Start Playwright on the calling thread and launch Chromium; returns (browser, stop)."""
+    from playwright.sync_api import sync_playwright
+    playwright = sync_playwright().start()
+    try:
+        browser = playwright.chromium.launch(headless=headless, args=args)
+    except Exception:
+        playwright.stop()
+        raise
+    return browser, playwright.stop
+
+
+class _Job:
+    def __init__(self, fn, args, kwargs, context_options, context_setup):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.context_options = context_options or {}
+        self.context_setup = context_setup
+        self.future = Future()
+        # Jobs with the same context settings may share a BrowserContext
+        self.context_key = (json.dumps(self.context_options, sort_keys=True, default=str),
+                            getattr(context_setup, '__qualname__', None))
+
+
+class _BrowserWorker(threading.Thread):
+    """
+    One thread owning one browser, fed jobs by its pool's queue.
+    
+    Playwright's sync API is bound to the thread that started it, so the
+    browser, its contexts and pages never leave this thread: jobs run here.
+    """
+    
+    def __init__(self, pool: 'BrowserPool', index: int):
+        super().__init__(name=f"{pool.name}-{index}", daemon=True)
+        self.pool = pool
+        self.browser = None
+        self._stop_playwright = None
+        self.context = None
+        self.context_key = None
+        self.context_jobs = 0
+        self.ready = threading.Event()  # set once the first launch was tried (see warm())
+    
+    def run(self):
+        use_compatible_event_loop()
+        if self.pool._eager:
+            try:
+                self._ensure_browser()
+            except Exception as e:
+                logger.error(f"{self.name}: could not start a browser: {e}")
+                self._close_browser()
+        self.ready.set()
+        while True:
+            job = self.pool._jobs.get()
+            if job is _STOP:
+                break
+            if job.future.set_running_or_notify_cancel():
+                self._run_job(job)
+        self._close_browser()
+    
+    def _run_job(self, job: _Job):
+        try:
+            context = self._context_for(job)
+        except Exception as e:
+            logger.error(f"{self.name}: could not get a browser context: {e}")
+            self._close_browser()
+            job.future.set_exception(e)
+            return
+        
+        self.context_jobs += 1
+        try:
+            job.future.set_result(job.fn(context, *job.args, **job.kwargs))
+        except BaseException as e:
+            job.future.set_exception(e)
+        finally:
+            self._after_job()
+    
+    def _context_for(self, job: _Job):
+        """The warm context for ``job``'s settings: reused, or a fresh one on a live browser."""
+        self._ensure_browser()
+        if (self.context is not None and self.context_key == job.context_key
+                and self.context_jobs < self.pool.context_max_jobs):
+            self.pool._count('contexts_reused')
+            return self.context
+        
+        self._close_context()
+        self.context = self.browser.new_context(**job.context_options)
+        if job.context_setup:
+            job.context_setup(self.context)
+        self.context_key = job.context_key
+        self.context_jobs = 0
+        self.pool._count('contexts_created')
+        return self.context
+    
+    def _ensure_browser(self):
+        """Launch the browser if there is none, or relaunch it if it crashed."""
+        if self.browser is not None and not self._connected():
+            logger.warning(f"{self.name}: browser disconnected, restarting it")
+            self._close_browser()
+            self.pool._count('restarts')
+        if self.browser is None:
+            start = time.perf_counter()
+            self.browser, self._stop_playwright = self.pool._launch()
+            self.pool._count('launches')
+            logger.info(f"{self.name}: browser started in {time.perf_counter() - start:.2f}s")
+    
+    def _after_job(self):
+        """Leave the context clean for the next job; drop it (and the browser) if they broke."""
+        if not self._connected():
+            logger.warning(f"{self.name}: browser crashed during a job; it restarts on the next one")
+            self._close_browser()
+            self.pool._count('restarts')
+            return
+        try:
+            for page in list(self.context.pages):
+                page.close()
+        except Exception as e:
+            logger.debug(f"{self.name}: discarding a broken context: {e}")
+            self._close_context()
+    
+    def _connected(self) -> bool:
+        try:
+            return self.browser is not None and self.browser.is_connected()
+        except Exception:
+            return False
+    
+    def _close_context(self):
+        if self.context is not None:
+            try:
+                self.context.close()
+            except Exception as e:
+                logger.debug(f"{self.name}: error closing context: {e}")
+        self.context = None
+        self.context_key = None
+    
+    def _close_browser(self):
+        self._close_context()
+        for close in (getattr(self.browser, 'close', None), self._stop_playwright):
+            if close is None:
+                continue
+            try:
+                close()
+            except Exception as e:
+                logger.debug(f"{self.name}: error shutting the browser down: {e}")
+        self.browser = None
+        self._stop_playwright = None
+
+
+class BrowserPool:
+    """
+    Long-lived browsers that run browser-based scrape jobs.
+    
+    ``size`` worker threads each own a warm browser (started on their first
+    job, or by warm()) and take jobs from one queue, so a scrape waits for
+    a free browser instead of launching its own. A job runs as
+    ``fn(context, *args, **kwargs)`` on the worker's thread with a
+    BrowserContext built from ``context_options`` (Playwright new_context
+    arguments) and ``context_setup(context)``. Contexts are recycled: the
+    next job with the same settings gets the same context - and the
+    cookies, e.g. a cleared challenge, it already holds - with its pages
+    closed, for up to ``context_max_jobs`` jobs. A browser found
+    disconnected (crashed) is relaunched before the next job.
+    """
+    
+    def __init__(self, size: int = None, headless: bool = None, launch_args: list = None,
+                 context_max_jobs: int = None, launch=None, name: str = "browser"):
+        self.size = max(1, size or config.BROWSER_POOL_SIZE)
+        self.headless = config.SCRAPER_HEADLESS if headless is None else headless
+        self.launch_args = launch_args or ["--disable-blink-features=AutomationControlled"]
+        self.context_max_jobs = context_max_jobs or config.BROWSER_CONTEXT_MAX_JOBS
+        self._launch = launch or (lambda: launch_chromium(self.headless, self.launch_args))
+        self.name = name
+        self._jobs = queue.Queue()
+        self._workers = []
+        self._eager = False
+        self._lock = threading.Lock()  # guards _workers and the counters below
+        self.launches = 0
+        self.restarts = 0
+        self.contexts_created = 0
+        self.contexts_reused = 0
+    
+    def submit(self, fn, *args, context_options: dict = None, context_setup=None, **kwargs) -> Future:
+        """Queue ``fn(context, *args, **kwargs)`` for the next free browser; returns its Future."""
+        self._start_workers()
+        job = _Job(fn, args, kwargs, context_options, context_setup)
+        self._jobs.put(job)
+        return job.future
+    
+    def run(self, fn, *args, context_options: dict = None, context_setup=None,
+            deadline: Deadline = None, **kwargs):
+        """
+        submit() and wait for the result (re-raises the job's exception).
+        
+        Raises:
+            DeadlineExceeded: If ``deadline`` passed first (waiting for a free
+                browser included). A job still queued is cancelled and never
+                starts; one already running is left to finish on its worker.
+        """
+        future = self.submit(fn, *args, context_options=context_options,
+                             context_setup=context_setup, **kwargs)
+        deadline = deadline or Deadline()
+        try:
+            return future.result(deadline.remaining() if deadline.bounded else None)
+        except FutureTimeout:
+            started = not future.cancel()
+            raise DeadlineExceeded(
+                f"Time budget exhausted {'during' if started else 'waiting for'} a browser job on {self.name}"
+            ) from None
+    
+    def warm(self, timeout: float = 60.0) -> int:
+        """
+        Start every browser now (e.g. at application startup) rather than on
+        their first job; returns how many are running.
+        """
+        self._eager = True
+        self._start_workers()
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            worker.ready.wait(timeout)
+        return sum(worker.browser is not None for worker in workers)
+    
+    def _start_workers(self):
+        with self._lock:
+            if self._workers:
+                return
+            self._workers = [_BrowserWorker(self, i) for i in range(self.size)]
+            for worker in self._workers:
+                worker.start()
+    
+    def close(self, timeout: float = 10.0):
+        """Close every browser once the queued jobs are done; the pool restarts on the next submit."""
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for _ in workers:
+            self._jobs.put(_STOP)
+        for worker in workers:
+            worker.join(timeout)
+    
+    def stats(self) -> dict:
+        """Snapshot of pool usage for logging or health checks."""
+        with self._lock:
+            return {
+                'workers': len(self._workers),
+                'queued': self._jobs.qsize(),
+                'launches': self.launches,
+                'restarts': self.restarts,
+                'contexts_created': self.contexts_created,
+                'contexts_reused': self.contexts_reused,
+            }
+    
+    def _count(self, counter: str):
+        """Add one to a usage counter; the workers update them from their own threads."""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+# Headless browsers of the automated scrapes
+browser_pool = BrowserPool()
+# A visible browser a person can solve challenges in (HybridInteractiveScraper)
+interactive_browser_pool = BrowserPool(
+    size=1, headless=False, name="interactive-browser",
+    launch_args=["--disable-blink-features=AutomationControlled", "--disable-dev-shm-usage"]
+)
+
+atexit.register(browser_pool.close)
+atexit.register(interactive_browser_pool.close)
@@ -0,0 +1,90 @@
+"""Load several result pages at once in tabs of one browser context."""
+from logger import get_logger
+from src.deadline import Deadline, DeadlineExceeded
+import config
+
+logger = get_logger(__name__)
+
+
+def context_cleared(context) -> bool:
+    """Whether ``context`` holds a Cloudflare clearance cookie, i.e. has passed the challenge."""
+    try:
+        return any(cookie.get('name') == 'cf_clearance' for cookie in context.cookies())
+    except Exception as e:
+        logger.debug(f"Could not read the context's cookies: {e}")
+        return False
+
+
+def scrape_in_tabs(context, page_nums, navigate, harvest, tabs: int = None,
+                   paginator=None, deadline: Deadline = None, first_tab=None) -> dict:
+    """
+    Scrape ``page_nums`` in up to ``tabs`` tabs of ``context`` at a time.
+    
+    Meant for a context that has already cleared the site's challenge (its
+    cookies are shared by every tab); otherwise pass ``tabs=1`` so pages
+    load one at a time in ``first_tab``. Pages go in waves: every tab of a
+    wave starts its navigation - ``navigate(page, page_num) -> state``,
+    which should take the shared rate limiter and return once the request
+    is committed - before any tab is harvested with ``harvest(page,
+    page_num, state) -> listings``. The browser loads the wave's pages
+    concurrently while this thread waits on the first of them, so a wave
+    takes about as long as its slowest page. Playwright's sync API stays on
+    the calling thread throughout.
+    
+    Args:
+        context: Playwright BrowserContext
+        page_nums: Pages to scrape, in order
+        navigate: Starts loading a page in a tab
+        harvest: Waits for that page and extracts its listings
+        tabs: Tabs at once (default config.BROWSER_TABS)
+        paginator: Pages it puts past the end of the results are skipped
+        deadline: No new wave is started once it has expired
+        first_tab: An open page of ``context`` to use as the first tab
+    
+    Returns:
+        {page_num: listings or the Exception that page failed with}
+    """
+    tabs = max(1, tabs or config.BROWSER_TABS)
+    deadline = deadline or Deadline()
+    pending = list(page_nums)
+    outcomes = {}
+    opened = []
+    pool = [first_tab] if first_tab is not None else []
+    
+    try:
+        while pending:
+            if paginator is not None:
+                pending = [n for n in pending if paginator.wants(n)]
+            if not pending:
+                break
+            if deadline.expired():
+                for page_num in pending:
+                    outcomes[page_num] = DeadlineExceeded(f"Time budget exhausted before page {page_num}")
+                break
+            
+            wave, pending = pending[:tabs], pending[tabs:]
+            while len(pool) < len(wave):
+                tab = context.new_page()
+                opened.append(tab)
+                pool.append(tab)
+            logger.info(f"Loading pages {wave} in {len(wave)} tab(s)")
+            
+            started = {}
+            for tab, page_num in zip(pool, wave):
+                try:
+                    started[page_num] = (tab, navigate(tab, page_num))
+                except Exception as e:
+                    outcomes[page_num] = e
+            for page_num, (tab, state) in started.items():
+                try:
+                    outcomes[page_num] = harvest(tab, page_num, state)
+                except Exception as e:
+                    outcomes[page_num] = e
+    finally:
+        for tab in opened:
+            try:
+                tab.close()
+            except Exception as e:
+                logger.debug(f"Error closing a tab: {e}")
+    
+    return outcomes
@@ -0,0 +1,99 @@
+"""Early detection of Cloudflare challenge pages on streamed responses."""
+from logger import get_logger
+from src.cookie_vault import cookie_vault
+import config
+
+logger = get_logger(__name__)
+
+# Markers that only appear on interstitial/challenge pages. The
+# "challenge-platform" script is deliberately absent: Cloudflare injects it
+# into normal pages too.
+CHALLENGE_MARKERS = (
+    'Just a moment',
+    'cf-challenge',
+    '_cf_chl_opt',
+    'cf-browser-verification',
+    'Attention Required! | Cloudflare',
+    'Enable JavaScript and cookies to continue',
+)
+
+
+class ChallengeBlocked(Exception):
+    """A backend received a Cloudflare challenge instead of search results."""
+    
+    def __init__(self, url: str, status_code: int = None, marker: str = None):
+        self.url = url
+        self.status_code = status_code
+        self.marker = marker
+        super().__init__(f"Cloudflare challenge at {url} (status {status_code}, marker {marker!r})")
+
+
+def find_challenge_marker(text) -> str:
+    """Return the first challenge marker found in ``text`` (str or bytes), or None."""
+    if isinstance(text, (bytes, bytearray)):
+        text = bytes(text).decode('latin-1')
+    for marker in CHALLENGE_MARKERS:
+        if marker in text:
+            return marker
+    return None
+
+
+def check_challenge(text, url: str, status_code: int = None, used_clearance: bool = False):
+    """
+    Raise ChallengeBlocked if ``text`` (the start of a body) is a challenge page.
+    
+    A clearance cookie that was sent along and still got challenged is
+    evicted from the cookie vault.
+    """
+    marker = find_challenge_marker(text)
+    if marker is None:
+        return
+    logger.warning(f"Challenge page detected at {url} ({marker!r}), aborting")
+    if used_clearance:
+        cookie_vault.evict(url, reason="challenged")
+    raise ChallengeBlocked(url, status_code, marker)
+
+
+def read_body(chunks, url: str, status_code: int = None, used_clearance: bool = False) -> bytes:
+    """
+    Accumulate a streamed body, sniffing the first CHALLENGE_SNIFF_BYTES.
+    
+    Args:
+        chunks: Iterable of byte chunks (iter_content / iter_bytes)
+        url: Requested URL (for logging and eviction)
+        status_code: Response status
+        used_clearance: Whether the request carried a vault clearance cookie
+    
+    Returns:
+        The complete body
+    
+    Raises:
+        ChallengeBlocked: As soon as the sniffed prefix contains a marker;
+            the rest of the body is never downloaded
+    """
+    sniff_bytes = config.CHALLENGE_SNIFF_BYTES
+    body = bytearray()
+    sniffed = False
+    for chunk in chunks:
+        body.extend(chunk)
+        if not sniffed and len(body) >= sniff_bytes:
+            check_challenge(body[:sniff_bytes], url, status_code, used_clearance)
+            sniffed = True
+    if not sniffed:
+        check_challenge(body, url, status_code, used_clearance)
+    return bytes(body)
+
+
+async def read_body_async(chunks, url: str, status_code: int = None, used_clearance: bool = False) -> bytes:
+    """Async variant of read_body for httpx's aiter_bytes()."""
+    sniff_bytes = config.CHALLENGE_SNIFF_BYTES
+    body = bytearray()
+    sniffed = False
+    async for chunk in chunks:
+        body.extend(chunk)
+        if not sniffed and len(body) >= sniff_bytes:
+            check_challenge(body[:sniff_bytes], url, status_code, used_clearance)
+            sniffed = True
+    if not sniffed:
+        check_challenge(body, url, status_code, used_clearance)
+    return bytes(body)
@@ -0,0 +1,108 @@
+"""Persistent store of Cloudflare clearance cookies shared by every backend."""
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+from logger import get_logger
+from src.json_store import JsonStore
+import config
+
+logger = get_logger(__name__)
+
+# Cookies Cloudflare issues when a challenge is solved (or tied to the solve)
+CLEARANCE_COOKIE_PREFIXES = ('cf_', '__cf')
+
+
+def _site_key(url: str) -> str:
+    """Cookies are scoped to the site, so www.revolico.com and revolico.com share one entry."""
+    host = (urlparse(url).hostname or url).lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class CookieVault:
+    """
+    Clearance cookies plus the User-Agent they were minted with, per site.
+    
+    Browser backends (Hybrid, Playwright, Selenium) store the cookies after a
+    successful page; the HTTP backends attach them through clearance_headers()
+    and evict it when the site answers with a 403 (report_response) or a
+    challenge page (src.challenge). The vault lives in a JSON file under
+    CACHE_DIR (a JsonStore, guarded by a FileLock), so several processes
+    (and threads) can share it safely.
+    """
+    
+    def __init__(self, path: Path = None, default_ttl: float = None):
+        self.path = Path(path or config.CACHE_DIR / "cf_clearance.json")
+        self.default_ttl = default_ttl if default_ttl is not None else config.CLEARANCE_TTL
+        self._store = JsonStore(self.path, "cookie vault")
+    
+    def store(self, url: str, cookies, user_agent: str):
+        """
+        Save clearance cookies obtained by a browser.
+        
+        Args:
+            url: Page the browser was on
+            cookies: Playwright-style list of dicts (name, value, expires) or
+                Selenium-style (name, value, expiry); other cookies are ignored
+            user_agent: User-Agent of the browser that solved the challenge
+        """
+        clearance = {}
+        expires = None
+        for cookie in cookies:
+            name = cookie.get('name', '')
+            if not name.startswith(CLEARANCE_COOKIE_PREFIXES):
+                continue
+            clearance[name] = cookie.get('value', '')
+            cookie_expiry = cookie.get('expires', cookie.get('expiry'))
+            if name == 'cf_clearance' and cookie_expiry and cookie_expiry > 0:
+                expires = float(cookie_expiry)
+        
+        if 'cf_clearance' not in clearance:
+            return
+        
+        entry = {
+            'cookies': clearance,
+            'user_agent': user_agent,
+            'stored_at': time.time(),
+            'expires': expires or time.time() + self.default_ttl,
+        }
+        with self._store.locked() as data:
+            data[_site_key(url)] = entry
+        logger.info(f"Stored Cloudflare clearance for {_site_key(url)}")
+    
+    def get(self, url: str):
+        """Return a still-valid clearance entry for the site of ``url``, or None."""
+        key = _site_key(url)
+        entry = self._store.read().get(key)
+        if not entry:
+            return None
+        if entry['expires'] <= time.time():
+            self.evict(url, reason="expired")
+            return None
+        return entry
+    
+    def evict(self, url: str, reason: str = "blocked"):
+        """Forget the clearance for a site (expired, 403 or challenged again)."""
+        key = _site_key(url)
+        with self._store.locked() as data:
+            removed = data.pop(key, None)
+        if removed:
+            logger.info(f"Evicted Cloudflare clearance for {key} ({reason})")
+    
+    def clearance_headers(self, url: str) -> dict:
+        """Cookie and User-Agent headers to send with a request, or {} if none."""
+        entry = self.get(url)
+        if not entry:
+            return {}
+        cookie = "; ".join(f"{name}={value}" for name, value in entry['cookies'].items())
+        headers = {'Cookie': cookie}
+        if entry.get('user_agent'):
+            headers['User-Agent'] = entry['user_agent']
+        return headers
+    
+    def report_response(self, url: str, status_code: int, used_clearance: bool = True):
+        """Evict the clearance if a request that carried it was refused anyway."""
+        if used_clearance and status_code == 403:
+            self.evict(url)
+
+
+cookie_vault = CookieVault()
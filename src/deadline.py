@@ -0,0 +1,88 @@
+"""Overall time budget of a scrape, shared by every backend and request it makes."""
+import asyncio
+import math
+import time
+from logger import get_logger
+import config
+
+logger = get_logger(__name__)
+
+
+class DeadlineExceeded(Exception):
+    """The scrape's time budget ran out before a request could be made."""
+
+
+class Deadline:
+    """
+    Point on the time.monotonic() clock by which a scrape must be done.
+    
+    Request timeouts are derived from what is left (timeout()), waits that
+    would overrun it are skipped (sleep(), RetryBudget), and a request with
+    less than DEADLINE_MIN_REQUEST seconds left is not sent at all: it
+    raises DeadlineExceeded, which callers treat as "page not fetched"
+    rather than as a failure. Deadline() without arguments never expires.
+    """
+    
+    def __init__(self, budget_s: float = None, at: float = None):
+        ends = [end for end in (at, None if budget_s is None else time.monotonic() + budget_s) if end is not None]
+        self.at = min(ends) if ends else None
+    
+    @classmethod
+    def of(cls, deadline=None, budget_s: float = None) -> 'Deadline':
+        """
+        Deadline for the ``deadline``/``budget_s`` arguments of a scrape call.
+        
+        Args:
+            deadline: A Deadline, or a time.monotonic() timestamp
+            budget_s: Seconds from now; with both, the earlier one wins
+        """
+        if isinstance(deadline, Deadline):
+            if budget_s is None:
+                return deadline
+            deadline = deadline.at
+        return cls(budget_s=budget_s, at=deadline)
+    
+    @property
+    def bounded(self) -> bool:
+        return self.at is not None
+    
+    def remaining(self) -> float:
+        """Seconds left (infinite without a deadline, never negative)."""
+        if self.at is None:
+            return math.inf
+        return max(0.0, self.at - time.monotonic())
+    
+    def expired(self) -> bool:
+        return self.remaining() < config.DEADLINE_MIN_REQUEST
+    
+    def allows(self, seconds: float) -> bool:
+        """Whether waiting ``seconds`` still leaves time for a request."""
+        return seconds + config.DEADLINE_MIN_REQUEST <= self.remaining()
+    
+    def timeout(self, default: float) -> float:
+        """
+        Timeout for the next request: ``default`` capped at the time left.
+        
+        Raises:
+            DeadlineExceeded: If too little time is left to send it
+        """
+        remaining = self.remaining()
+        if remaining < config.DEADLINE_MIN_REQUEST:
+            raise DeadlineExceeded(f"Time budget exhausted ({remaining:.2f}s left)")
+        return min(default, remaining)
+    
+    def sleep(self, seconds: float) -> bool:
+        """Sleep ``seconds`` unless that would overrun the deadline; returns whether it slept."""
+        if not self.allows(seconds):
+            logger.debug(f"Skipping a {seconds:.2f}s wait: {self.remaining():.2f}s left")
+            return False
+        time.sleep(seconds)
+        return True
+    
+    async def sleep_async(self, seconds: float) -> bool:
+        """Async variant of sleep."""
+        if not self.allows(seconds):
+            logger.debug(f"Skipping a {seconds:.2f}s wait: {self.remaining():.2f}s left")
+            return False
+        await asyncio.sleep(seconds)
+        return True
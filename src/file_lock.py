@@ -0,0 +1,89 @@
+"""Cross-process advisory file lock (fcntl on POSIX, msvcrt on Windows)."""
+import os
+import sys
+import time
+from pathlib import Path
+
+if sys.platform == 'win32':
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """
+    Exclusive lock held on ``path`` for the duration of a ``with`` block.
+    
+    Works across processes and across threads of the same process (each
+    FileLock opens its own descriptor). The lock file itself is left in
+    place; only the OS lock matters.
+    """
+    
+    def __init__(self, path: Path, timeout: float = None, poll_interval: float = 0.05):
+        self.path = Path(path)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._fd = None
+    
+    def acquire(self, blocking: bool = True) -> bool:
+        """
+        Take the lock.
+        
+        Args:
+            blocking: Wait (up to ``timeout``) instead of failing immediately
+        
+        Returns:
+            True if the lock was acquired
+        
+        Raises:
+            TimeoutError: If ``timeout`` elapsed while waiting
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+        
+        while True:
+            try:
+                self._lock_fd(fd)
+                self._fd = fd
+                return True
+            except OSError:
+                if not blocking:
+                    os.close(fd)
+                    return False
+                if deadline is not None and time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise TimeoutError(f"Timed out waiting for lock {self.path}")
+                time.sleep(self.poll_interval)
+    
+    def release(self):
+        """Release the lock if held."""
+        if self._fd is None:
+            return
+        try:
+            self._unlock_fd(self._fd)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc):
+        self.release()
+    
+    @staticmethod
+    def _lock_fd(fd: int):
+        if sys.platform == 'win32':
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    
+    @staticmethod
+    def _unlock_fd(fd: int):
+        if sys.platform == 'win32':
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(fd, fcntl.LOCK_UN)
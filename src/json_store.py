@@ -0,0 +1,77 @@
+"""A JSON file shared by threads and processes, read-modify-written under a FileLock."""
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from logger import get_logger
+from src.file_lock import FileLock
+
+logger = get_logger(__name__)
+
+
+def write_json_atomic(path: Path, data, **dump_kwargs):
+    """
+    Replace ``path`` with ``data`` as JSON in one step.
+    
+    The JSON goes to a temp file in the same directory, moved into place
+    with os.replace, so readers see the old file or the new one, never a
+    half-written one. The temp file is removed if anything fails.
+    
+    Args:
+        path: File to write (its directory is created if needed)
+        data: JSON-serialisable value
+        **dump_kwargs: Passed on to json.dump
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **dump_kwargs)
+        os.replace(tmp_path, path)
+    finally:
+        # Gone after a successful os.replace(); left over if anything failed
+        Path(tmp_path).unlink(missing_ok=True)
+
+
+class JsonStore:
+    """
+    A dict persisted as JSON at ``path``.
+    
+    Updates go through locked(), which holds a thread lock and a FileLock
+    (``path`` with a .lock suffix) around the read-modify-write; the file is
+    replaced atomically, so readers never see a half-written one and need no
+    lock.
+    """
+    
+    def __init__(self, path: Path, name: str = "JSON store", lock_timeout: float = 10):
+        self.path = Path(path)
+        self.name = name
+        self.lock_timeout = lock_timeout
+        self._file_lock_path = self.path.with_suffix(".lock")
+        self._lock = threading.Lock()
+    
+    def read(self) -> dict:
+        """The stored dict; {} if the file is missing or unreadable."""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.debug(f"Ignoring unreadable {self.name}: {e}")
+            return {}
+    
+    def write(self, data: dict):
+        """Replace the file with ``data`` (see write_json_atomic)."""
+        write_json_atomic(self.path, data)
+    
+    @contextmanager
+    def locked(self):
+        """Read-modify-write the file under the thread and file locks."""
+        with self._lock, FileLock(self._file_lock_path, timeout=self.lock_timeout):
+            data = self.read()
+            yield data
+            self.write(data)
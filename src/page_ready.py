@@ -0,0 +1,122 @@
+"""Wait until a browser page is ready to harvest, instead of sleeping a fixed time."""
+import itertools
+import time
+from logger import get_logger
+from src.challenge import CHALLENGE_MARKERS
+from src.deadline import Deadline
+import config
+
+logger = get_logger(__name__)
+
+# One check of the page, run in it. Ready means: no challenge markers, and
+# the number of listing containers has not changed for stableMs - with at
+# least one listing, or with the document fully loaded (an empty result
+# page). Per-wait state lives in window.__pageReady[token]; a navigation
+# (e.g. the challenge clearing) starts it over.
+_READY_JS = """
+({token, selector, markers, sniff, stableMs}) => {
+    const store = window.__pageReady || (window.__pageReady = {});
+    const count = document.querySelectorAll(selector).length;
+    // A challenge page has no listings: only serialise the DOM when there are none
+    const html = count ? "" : (document.documentElement ? document.documentElement.outerHTML.slice(0, sniff) : "");
+    const challenge = markers.some(marker => html.includes(marker));
+    const now = Date.now();
+    let state = store[token];
+    if (!state || state.count !== count || state.challenge !== challenge) {
+        state = store[token] = {count, challenge, since: now};
+    }
+    const settled = now - state.since >= stableMs;
+    const ready = !challenge && settled && (count > 0 || document.readyState === "complete");
+    return ready ? {count, challenge} : false;
+}
+"""
+_STATE_JS = "token => (window.__pageReady || {})[token] || null"
+
+_tokens = itertools.count()
+
+
+def _arg(selector: str) -> dict:
+    return {
+        'token': f"wait{next(_tokens)}",
+        'selector': selector,
+        'markers': list(CHALLENGE_MARKERS),
+        'sniff': config.CHALLENGE_SNIFF_BYTES,
+        'stableMs': config.PAGE_READY_STABLE_MS,
+    }
+
+
+def _cap(cap: float, deadline: Deadline) -> float:
+    """Seconds to wait at most: ``cap`` (default PAGE_READY_MAX_WAIT), leaving time for a request."""
+    cap = config.PAGE_READY_MAX_WAIT if cap is None else cap
+    if deadline is None:
+        return cap
+    return min(cap, max(0.0, deadline.remaining() - config.DEADLINE_MIN_REQUEST))
+
+
+def _outcome(ready: bool, state, start: float) -> dict:
+    state = state or {}
+    return {
+        'ready': ready,
+        'listings': state.get('count', 0),
+        'challenge': state.get('challenge', False),
+        'waited': round(time.perf_counter() - start, 3),
+    }
+
+
+def wait_until_ready(page, selector: str, cap: float = None, deadline: Deadline = None) -> dict:
+    """
+    Wait until a Playwright page's listings (``selector``) have rendered.
+    
+    Returns as soon as the page is ready (see _READY_JS): the check runs
+    inside the page every PAGE_READY_POLL_MS, so polling costs no round
+    trips, and waiting goes on across navigations such as a challenge
+    clearing. Gives up after ``cap`` seconds (default PAGE_READY_MAX_WAIT),
+    capped by ``deadline``.
+    
+    Returns:
+        {'ready': bool, 'listings': count, 'challenge': bool, 'waited': seconds}
+    """
+    cap = _cap(cap, deadline)
+    arg = _arg(selector)
+    start = time.perf_counter()
+    try:
+        handle = page.wait_for_function(_READY_JS, arg=arg, polling=config.PAGE_READY_POLL_MS,
+                                        timeout=max(cap, 0.001) * 1000)
+        outcome = _outcome(True, handle.json_value(), start)
+    except Exception as e:
+        logger.debug(f"Page not ready after {cap:.1f}s: {e}")
+        try:
+            state = page.evaluate(_STATE_JS, arg['token'])
+        except Exception:
+            state = None
+        outcome = _outcome(False, state, start)
+    logger.debug(f"Page readiness: {outcome}")
+    return outcome
+
+
+def wait_until_ready_selenium(driver, selector: str, cap: float = None, deadline: Deadline = None) -> dict:
+    """wait_until_ready() for a Selenium driver: the same check, polled from here."""
+    cap = _cap(cap, deadline)
+    arg = _arg(selector)
+    script = f"return ({_READY_JS})(arguments[0]);"
+    start = time.perf_counter()
+    while True:
+        try:
+            result = driver.execute_script(script, arg)
+        except Exception as e:
+            # e.g. the page navigated away mid-check
+            logger.debug(f"Readiness check failed: {e}")
+            result = None
+        if result:
+            outcome = _outcome(True, result, start)
+            break
+        if time.perf_counter() - start >= cap:
+            try:
+                state = driver.execute_script(f"return ({_STATE_JS})(arguments[0]);", arg['token'])
+            except Exception:
+                state = None
+            outcome = _outcome(False, state, start)
+            break
+        time.sleep(config.PAGE_READY_POLL_MS / 1000)
+    logger.debug(f"Page readiness: {outcome}")
+    return outcome
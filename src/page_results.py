@@ -0,0 +1,57 @@
+"""Per-page scrape outcomes shared by the backends and the fallback chain."""
+from logger import get_logger
+from src.challenge import ChallengeBlocked
+from src.deadline import DeadlineExceeded
+
+logger = get_logger(__name__)
+
+
+def flatten_pages(outcomes: dict) -> list[dict]:
+    """
+    Listings of a single backend's ``{page_num: listings | Exception}`` in page order.
+    
+    Keeps the backends' historical behaviour: a failed first page or a
+    challenge anywhere fails the whole scrape, other failed pages are
+    logged and skipped. Pages the time budget did not leave room for
+    (DeadlineExceeded) are skipped too, so what was fetched in time is
+    returned.
+    """
+    results = []
+    for page_num in sorted(outcomes):
+        outcome = outcomes[page_num]
+        if isinstance(outcome, DeadlineExceeded):
+            logger.warning(f"Page {page_num} not fetched: {outcome}")
+            continue
+        if isinstance(outcome, Exception):
+            logger.error(f"Error on page {page_num}: {outcome}")
+            if page_num == 1 or isinstance(outcome, ChallengeBlocked):
+                raise outcome
+            continue
+        results.extend(outcome)
+    return results
+
+
+def served_pages(outcomes: dict) -> dict:
+    """The pages of ``outcomes`` that produced listings."""
+    return {page_num: listings for page_num, listings in outcomes.items()
+            if isinstance(listings, list) and listings}
+
+
+def merge_pages(pages: dict) -> list[dict]:
+    """
+    Concatenate ``{page_num: listings}`` in page order, dropping repeated URLs.
+    
+    Pages served by different backends can overlap when the site shifts
+    results between requests; listings without a URL are always kept.
+    """
+    results = []
+    seen = set()
+    for page_num in sorted(pages):
+        for listing in pages[page_num]:
+            url = listing.get('url')
+            if url:
+                if url in seen:
+                    continue
+                seen.add(url)
+            results.append(listing)
+    return results
@@ -0,0 +1,152 @@
+"""Detect where a query's results end so scrapers stop paginating past it."""
+import math
+import re
+from logger import get_logger
+from src.response_cache import response_cache
+
+logger = get_logger(__name__)
+
+# "1.234 anuncios", "57 resultados", "120 results"
+TOTAL_COUNT_PATTERN = re.compile(
+    r'(\d{1,3}(?:[.,\s]\d{3})+|\d+)\s*(?:anuncios|resultados|results|ads)\b', re.IGNORECASE
+)
+PAGE_LINK_PATTERN = re.compile(r'href="[^"]*[?&](?:amp;)?page=(\d+)', re.IGNORECASE)
+NEXT_LINK_PATTERN = re.compile(
+    r'rel="next"|aria-label="(?:next|siguiente)[^"]*"|>\s*(?:siguiente|next)\s*(?:&raquo;|»|&gt;|›)?\s*<',
+    re.IGNORECASE
+)
+# <a href="?q=car&page=12" rel="last">, aria-label="Última página", >Última »<
+LAST_LINK_PATTERN = re.compile(
+    r'<a\b(?=[^>]*href="[^"]*[?&](?:amp;)?page=(\d+))[^>]*'
+    r'(?:rel="last"|aria-label="(?:last|[uú]ltima)[^"]*"|>\s*(?:last|[uú]ltima)\b)',
+    re.IGNORECASE
+)
+# What the site (or a generic results page) shows when a query has no results at all
+NO_RESULTS_PATTERN = re.compile(
+    r'no\s+(?:se\s+encontraron|hay|hemos\s+encontrado)\s+(?:anuncios|resultados)|sin\s+resultados'
+    r'|\b0\s+(?:anuncios|resultados|results)\b|no\s+results?\s+(?:found|for)',
+    re.IGNORECASE
+)
+
+
+def detect_last_page(html: str, page_num: int):
+    """
+    Last results page as far as the markup of ``html`` (results page ``page_num``) tells.
+    
+    An explicit "last page" link gives it; otherwise a page with pagination
+    links but neither a "next" link nor links to higher pages is the last
+    one. The total-count text is not used here: see estimate_last_page().
+    
+    Args:
+        html: Page HTML
+        page_num: Page the HTML belongs to
+    
+    Returns:
+        Last page number, or None if the HTML does not say
+    """
+    if not html:
+        return None
+    
+    match = LAST_LINK_PATTERN.search(html)
+    if match:
+        return max(int(match.group(1)), page_num)
+    
+    linked = [int(n) for n in PAGE_LINK_PATTERN.findall(html)]
+    if linked and not NEXT_LINK_PATTERN.search(html) and max(linked) <= page_num:
+        return page_num
+    return None
+
+
+def estimate_last_page(html: str, per_page: int):
+    """
+    Last page implied by the total-count text ("1.234 anuncios") of ``html``.
+    
+    Only a hint: promoted listings or a short count of ``per_page`` (unique
+    listings on a full page) skew it, so it never ends pagination by itself.
+    
+    Returns:
+        Estimated last page, or None if the HTML gives no count
+    """
+    match = TOTAL_COUNT_PATTERN.search(html or "")
+    if not match or not per_page:
+        return None
+    total = int(re.sub(r'\D', '', match.group(1)))
+    return max(1, math.ceil(total / per_page)) if total else None
+
+
+def known_last_page(query: str, cache=None):
+    """Last page discovered by an earlier scrape of ``query`` (from its cached first page's markup)."""
+    entry = (cache or response_cache).peek(query, 1)
+    if not entry or entry['stale']:
+        return None
+    return detect_last_page(entry.get('body', ""), 1)
+
+
+class Paginator:
+    """
+    Where the results of one scrape end, learned page by page.
+
+    Scrapers call observe() with every page they get and check wants()
+    before requesting the next one. The end is found from the page markup
+    (detect_last_page), an empty page, or a page repeating listings already
+    seen (sites often serve the last page again for out-of-range numbers).
+    An empty first page only means "no results" when it says so
+    (NO_RESULTS_PATTERN): otherwise a markup change or a parse failure
+    would pass for an empty result set.
+    The total-count text only gives ``estimated_last_page``, a hint.
+    """
+    
+    def __init__(self, query: str = None, cache=None):
+        self.last_page = known_last_page(query, cache) if query else None
+        self.estimated_last_page = None
+        self.per_page = 0  # most unique listings seen on one page
+        self._seen_urls = set()
+
+    def observe(self, page_num: int, listings: list[dict], html: str = None):
+        """
+        Learn from a fetched page.
+
+        Args:
+            page_num: Page number
+            listings: Listings extracted from it
+            html: The page HTML, if the backend has it. An empty page only
+                ends the results when its HTML was actually received.
+        """
+        if html is not None and not listings:
+            if page_num > 1 or NO_RESULTS_PATTERN.search(html):
+                self._end_at(page_num - 1, f"page {page_num} is empty")
+            else:
+                logger.warning("Page 1 has no listings and no \"no results\" text; not ending the results")
+            return
+        
+        urls = {listing.get('url') for listing in listings if listing.get('url')}
+        if urls and urls <= self._seen_urls:
+            self._end_at(page_num - 1, f"page {page_num} repeats earlier listings")
+            return
+        self._seen_urls |= urls
+        # The same listing twice on a page (e.g. promoted) is one result
+        self.per_page = max(self.per_page, len(urls) if urls else len(listings))
+        
+        if self.estimated_last_page is not None and page_num > self.estimated_last_page:
+            logger.debug(f"Page {page_num} has results past the estimated last page {self.estimated_last_page}")
+        estimate = estimate_last_page(html, self.per_page)
+        if estimate is not None:
+            self.estimated_last_page = max(estimate, page_num)
+        
+        last_page = detect_last_page(html, page_num)
+        if last_page is not None:
+            self._end_at(last_page, f"page {page_num} markup")
+
+    def wants(self, page_num: int) -> bool:
+        """Whether ``page_num`` may still have results."""
+        return self.last_page is None or page_num <= self.last_page
+
+    def plan(self, page_nums) -> list[int]:
+        """The pages of ``page_nums`` worth requesting."""
+        return [page_num for page_num in page_nums if self.wants(page_num)]
+
+    def _end_at(self, last_page: int, reason: str):
+        last_page = max(last_page, 0)
+        if self.last_page is None or last_page < self.last_page:
+            logger.info(f"Results end at page {last_page} ({reason})")
+            self.last_page = last_page
@@ -0,0 +1,184 @@
+"""Overlap page downloads with parsing: the next page is fetched while the current one is parsed."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from logger import get_logger
+from src.challenge import ChallengeBlocked
+import config
+
+logger = get_logger(__name__)
+
+# Totals over every scrape timed by a PageTimer in this process
+pipeline_stats = {'scrapes': 0, 'pages': 0, 'fetch_seconds': 0.0, 'parse_seconds': 0.0,
+                  'wall_seconds': 0.0, 'overlap_seconds': 0.0}
+_stats_lock = threading.Lock()
+
+
+def _union(intervals: list) -> list:
+    """Merge (start, end) intervals into sorted, disjoint ones."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _intersection(a: list, b: list) -> float:
+    """Total length of the overlap of two sorted, disjoint interval lists."""
+    total, i, j = 0.0, 0, 0
+    while i < len(a) and j < len(b):
+        total += max(0.0, min(a[i][1], b[j][1]) - max(a[i][0], b[j][0]))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return total
+
+
+class PageTimer:
+    """
+    When the pages of one scrape were being fetched and parsed.
+    
+    summary() reports the time something was being downloaded, the time
+    something was being parsed, and the overlap: time both were happening
+    at once. A plain fetch-then-parse loop has no overlap; in a pipelined
+    one, up to all of the parse time hides behind downloads.
+    """
+    
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._fetches = []
+        self._parses = []
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def fetching(self):
+        """Time a download (may run on any thread, several at once)."""
+        with self._timed(self._fetches):
+            yield
+    
+    @contextmanager
+    def parsing(self):
+        """Time a parse (may run on any thread)."""
+        with self._timed(self._parses):
+            yield
+    
+    @contextmanager
+    def _timed(self, intervals: list):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                intervals.append((start, time.perf_counter()))
+    
+    def summary(self) -> dict:
+        """Busy and overlapping seconds so far; also added to pipeline_stats."""
+        with self._lock:
+            fetches, parses = _union(self._fetches), _union(self._parses)
+            pages = len(self._parses)
+        summary = {
+            'pages': pages,
+            'fetch_seconds': round(sum(end - start for start, end in fetches), 3),
+            'parse_seconds': round(sum(end - start for start, end in parses), 3),
+            'wall_seconds': round(time.perf_counter() - self._start, 3),
+            'overlap_seconds': round(_intersection(fetches, parses), 3),
+        }
+        with _stats_lock:
+            pipeline_stats['scrapes'] += 1
+            for key, value in summary.items():
+                pipeline_stats[key] += value
+        logger.info(
+            f"{pages} page(s): fetching {summary['fetch_seconds']:.2f}s, parsing {summary['parse_seconds']:.2f}s, "
+            f"overlapped {summary['overlap_seconds']:.2f}s, wall {summary['wall_seconds']:.2f}s"
+        )
+        return summary
+
+
+class PagePipeline:
+    """
+    Page-by-page scrape loop that parses page N while page N+1 downloads.
+    
+    ``fetch(page_num)`` runs on the calling thread in page order, so rate
+    limiting, sessions and proxy leases behave as in a plain loop, and
+    returns whatever ``parse(page_num, fetched)`` needs. Parsing runs on a
+    single worker thread, so pages are still parsed - and observed by the
+    Paginator - in page order. Downloads stay at most one page ahead of
+    parsing: page N+1 is only requested once page N-1 has been parsed, even
+    if parsing is slower than downloading. So at most one page past the end
+    of the results is fetched (while the last one is parsed); pages the
+    Paginator puts past the end are dropped from the outcome.
+    
+    With ``enabled`` False (config.SCRAPER_PIPELINE off) every page is
+    parsed on the calling thread right after its download.
+    """
+    
+    def __init__(self, paginator, enabled: bool = None):
+        self.paginator = paginator
+        self.enabled = config.SCRAPER_PIPELINE if enabled is None else enabled
+        self.timer = PageTimer()
+        self.stats = {}  # PageTimer.summary() of the last run
+    
+    def run(self, page_nums, fetch, parse, stop=None) -> dict:
+        """
+        Fetch and parse ``page_nums`` while the Paginator wants them.
+        
+        Args:
+            page_nums: Pages to scrape, in order
+            fetch: fetch(page_num) -> data for parse
+            parse: parse(page_num, data) -> listings
+            stop: stop(page_num, error) -> True to fetch no further pages
+                after a failed one; defaults to stopping on a challenge
+        
+        Returns:
+            {page_num: listings or the Exception that page failed with}
+        """
+        stop = stop or (lambda page_num, error: isinstance(error, ChallengeBlocked))
+        outcomes = {}
+        parses = {}
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="parse") if self.enabled else None
+        
+        def parse_timed(page_num, fetched):
+            with self.timer.parsing():
+                return parse(page_num, fetched)
+        
+        try:
+            for page_num in page_nums:
+                if len(parses) > 1:
+                    # One page ahead: all but the latest parse are done, so the
+                    # Paginator has seen every page before the one being parsed
+                    wait([list(parses.values())[-2]])
+                if not self.paginator.wants(page_num):
+                    break
+                try:
+                    with self.timer.fetching():
+                        fetched = fetch(page_num)
+                except Exception as e:
+                    outcomes[page_num] = e
+                    if stop(page_num, e):
+                        break
+                    continue
+                if executor:
+                    parses[page_num] = executor.submit(parse_timed, page_num, fetched)
+                else:
+                    try:
+                        outcomes[page_num] = parse_timed(page_num, fetched)
+                    except Exception as e:
+                        outcomes[page_num] = e
+            
+            if executor:
+                for page_num, future in parses.items():
+                    try:
+                        outcomes[page_num] = future.result()
+                    except Exception as e:
+                        outcomes[page_num] = e
+        finally:
+            if executor:
+                executor.shutdown(wait=True)
+        
+        self.stats = self.timer.summary()
+        return {page_num: outcomes[page_num] for page_num in sorted(outcomes)
+                if self.paginator.wants(page_num)}
@@ -0,0 +1,355 @@
+"""Pool of egress proxies with health scoring, shared by every backend."""
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from urllib.parse import unquote, urlparse
+from logger import get_logger
+from src.backend_stats import CHALLENGE, ERROR, SUCCESS
+from src.challenge import ChallengeBlocked
+from src.deadline import Deadline, DeadlineExceeded
+from src.rate_limiter import TokenBucket
+import config
+
+logger = get_logger(__name__)
+
+# Statuses that say the site refused this egress IP, or the proxy itself broke
+CHALLENGE_STATUSES = (403, 429, 503)
+PROXY_ERROR_STATUSES = (407, 502, 504)
+
+POLL_INTERVAL = 0.05  # seconds between checks while an async caller waits for a slot
+
+
+class ProxyUnavailable(Exception):
+    """No proxy could be leased: all were ejected, or none freed up in time."""
+
+
+def _server(url: str) -> str:
+    """scheme://host:port of a proxy URL, without credentials."""
+    parsed = urlparse(url)
+    server = f"{parsed.scheme}://{parsed.hostname}"
+    return f"{server}:{parsed.port}" if parsed.port else server
+
+
+class Proxy:
+    """One egress proxy: its limits, requests in flight and recent outcomes."""
+    
+    def __init__(self, url: str, max_concurrency: int, rate: float, burst: int, window: int):
+        self.url = url
+        self.label = _server(url)
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self.in_flight = 0
+        self.samples = deque(maxlen=window)  # (outcome, latency or None)
+        self.consecutive_failures = 0
+        self.cooldowns = 0
+        self.cooldown_until = 0.0
+        self.ejected = False
+    
+    def latency(self):
+        """
+        Median latency of the recent timed attempts that got an answer, or None.
+        
+        Errors and challenges are left out: a proxy that fails fast must not
+        look fast.
+        """
+        latencies = [latency for outcome, latency in self.samples
+                     if latency is not None and outcome not in (CHALLENGE, ERROR)]
+        return statistics.median(latencies) if latencies else None
+    
+    def success_rate(self) -> float:
+        """Share of recent attempts that were neither errors nor challenges (Laplace-smoothed)."""
+        failures = sum(1 for outcome, _ in self.samples if outcome in (CHALLENGE, ERROR))
+        return (len(self.samples) - failures + 1) / (len(self.samples) + 2)
+    
+    def summary(self) -> dict:
+        """Latency, error/challenge rates and state, for logging or health checks."""
+        attempts = len(self.samples)
+        return {
+            'attempts': attempts,
+            'in_flight': self.in_flight,
+            'p50': self.latency(),
+            'error_rate': (sum(1 for o, _ in self.samples if o == ERROR) / attempts
+                           if attempts else None),
+            'challenge_rate': (sum(1 for o, _ in self.samples if o == CHALLENGE) / attempts
+                               if attempts else None),
+            'cooling_down': self.cooldown_until > time.monotonic(),
+            'ejected': self.ejected,
+        }
+
+
+class ProxyLease:
+    """
+    A proxy checked out of the pool for one request, batch or browser session.
+    
+    ``url`` is None when no proxies are configured; the helpers then return
+    None too, which every client takes as "connect directly".
+    """
+    
+    def __init__(self, proxy: Proxy = None, slots: int = 1, timed: bool = True):
+        self.proxy = proxy
+        self.slots = slots
+        self.timed = timed
+        self.outcome = SUCCESS
+    
+    @property
+    def url(self):
+        return self.proxy.url if self.proxy else None
+    
+    def requests_proxies(self):
+        """``proxies=`` mapping for requests, cloudscraper and curl_cffi."""
+        return {'http': self.url, 'https': self.url} if self.url else None
+    
+    def playwright_proxy(self):
+        """``proxy=`` settings for Playwright's chromium.launch()."""
+        if not self.url:
+            return None
+        parsed = urlparse(self.url)
+        settings = {'server': _server(self.url)}
+        if parsed.username:
+            settings['username'] = unquote(parsed.username)
+            settings['password'] = unquote(parsed.password or "")
+        return settings
+    
+    def chrome_argument(self):
+        """``--proxy-server`` flag for Chrome (it cannot carry credentials)."""
+        return f"--proxy-server={_server(self.url)}" if self.url else None
+    
+    def report_status(self, status_code: int):
+        """Count a refused (403/429/503) or proxy-failed (407/502/504) response against the proxy."""
+        if status_code in CHALLENGE_STATUSES:
+            self.outcome = CHALLENGE
+        elif status_code in PROXY_ERROR_STATUSES:
+            self.outcome = ERROR
+    
+    def mark(self, outcome: str):
+        """Record ``outcome`` (SUCCESS, EMPTY, CHALLENGE or ERROR) when the lease ends."""
+        self.outcome = outcome
+
+
+class ProxyPool:
+    """
+    Egress proxies shared by every backend, leased one request at a time.
+    
+    lease() picks, among the proxies with a free slot, the one with the
+    lowest median latency divided by its success rate, then waits for that
+    proxy's own token bucket. When the lease ends its latency and outcome are
+    recorded: an exception counts as ERROR (CHALLENGE for ChallengeBlocked),
+    otherwise whatever the caller reported. ``failures_before_cooldown``
+    failures in a row put a proxy on cooldown, twice as long each time, and
+    one that fails again after ``max_cooldowns`` cooldowns is ejected. With
+    no proxies configured every lease is a direct connection and nothing is
+    tracked.
+    """
+    
+    def __init__(self, proxies: list[str] = None, max_concurrency: int = None,
+                 rate: float = None, burst: int = None, window: int = None,
+                 cooldown: float = None, failures_before_cooldown: int = None,
+                 max_cooldowns: int = None, acquire_timeout: float = None):
+        proxies = config.PROXIES if proxies is None else proxies
+        self.max_concurrency = max_concurrency or config.PROXY_MAX_CONCURRENCY
+        self.cooldown = cooldown if cooldown is not None else config.PROXY_COOLDOWN
+        self.failures_before_cooldown = failures_before_cooldown or config.PROXY_FAILURES_BEFORE_COOLDOWN
+        self.max_cooldowns = max_cooldowns if max_cooldowns is not None else config.PROXY_MAX_COOLDOWNS
+        self.acquire_timeout = acquire_timeout or config.PROXY_ACQUIRE_TIMEOUT
+        self.proxies = [
+            Proxy(url, self.max_concurrency,
+                  rate or config.PROXY_RATE_PER_SECOND,
+                  burst or config.PROXY_BURST,
+                  window or config.PROXY_STATS_WINDOW)
+            for url in proxies
+        ]
+        self._cond = threading.Condition()
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.proxies)
+    
+    @contextmanager
+    def lease(self, requests: int = 1, timed: bool = True, deadline: Deadline = None):
+        """
+        Check out a proxy for the duration of the ``with`` block.
+        
+        Args:
+            requests: Requests the caller will send through it; they take
+                that many tokens and up to the proxy's concurrency cap in
+                slots (the lease's ``slots``)
+            timed: Whether the block's duration is a meaningful latency
+                sample (False for browser sessions)
+            deadline: The scrape's Deadline; waits are cut short by it
+        
+        Yields:
+            ProxyLease
+        
+        Raises:
+            ProxyUnavailable: If every proxy is ejected or none is free
+                within ``acquire_timeout`` seconds (or before ``deadline``)
+            DeadlineExceeded: If the proxy's rate limit would make the
+                request overrun ``deadline``
+        """
+        if not self.enabled:
+            yield ProxyLease(None, requests, timed)
+            return
+        
+        give_up = time.monotonic() + min(self.acquire_timeout, (deadline or Deadline()).remaining())
+        with self._cond:
+            lease = self._checkout(requests, timed)
+            while lease is None:
+                self._cond.wait(self._wait_time(give_up))
+                lease = self._checkout(requests, timed)
+        
+        start = None
+        try:
+            wait = self._reserve(lease.proxy, requests)
+            if wait > 0:
+                if deadline is not None and not deadline.allows(wait):
+                    raise DeadlineExceeded(f"Proxy {lease.proxy.label} rate limit would overrun the time budget")
+                logger.debug(f"Proxy {lease.proxy.label}: waiting {wait:.2f}s for its rate limit")
+                time.sleep(wait)
+            start = time.monotonic()
+            yield lease
+        except DeadlineExceeded:
+            lease.outcome = None  # out of time: says nothing about the proxy
+            raise
+        except ChallengeBlocked:
+            lease.outcome = CHALLENGE
+            raise
+        except Exception:
+            lease.outcome = ERROR
+            raise
+        except BaseException:
+            lease.outcome = None  # interrupted: says nothing about the proxy
+            raise
+        finally:
+            self._release(lease, time.monotonic() - start if start is not None else None)
+    
+    @asynccontextmanager
+    async def lease_async(self, requests: int = 1, timed: bool = True, deadline: Deadline = None):
+        """Async variant of lease(); cancelling it frees the slot without a sample."""
+        if not self.enabled:
+            yield ProxyLease(None, requests, timed)
+            return
+        
+        give_up = time.monotonic() + min(self.acquire_timeout, (deadline or Deadline()).remaining())
+        while True:
+            with self._cond:
+                lease = self._checkout(requests, timed)
+                if lease is None:
+                    wait = min(POLL_INTERVAL, self._wait_time(give_up))
+            if lease is not None:
+                break
+            await asyncio.sleep(wait)
+        
+        start = None
+        try:
+            wait = self._reserve(lease.proxy, requests)
+            if wait > 0:
+                if deadline is not None and not deadline.allows(wait):
+                    raise DeadlineExceeded(f"Proxy {lease.proxy.label} rate limit would overrun the time budget")
+                logger.debug(f"Proxy {lease.proxy.label}: waiting {wait:.2f}s for its rate limit")
+                await asyncio.sleep(wait)
+            start = time.monotonic()
+            yield lease
+        except DeadlineExceeded:
+            lease.outcome = None  # out of time: says nothing about the proxy
+            raise
+        except ChallengeBlocked:
+            lease.outcome = CHALLENGE
+            raise
+        except Exception:
+            lease.outcome = ERROR
+            raise
+        except BaseException:
+            lease.outcome = None  # cancelled: says nothing about the proxy
+            raise
+        finally:
+            self._release(lease, time.monotonic() - start if start is not None else None)
+    
+    def stats(self) -> dict:
+        """summary() of every proxy, by proxy label."""
+        with self._cond:
+            return {proxy.label: proxy.summary() for proxy in self.proxies}
+    
+    def _checkout(self, requests: int, timed: bool):
+        """Occupy slots on the best free proxy, or return None (caller holds the lock)."""
+        live = [proxy for proxy in self.proxies if not proxy.ejected]
+        if not live:
+            raise ProxyUnavailable("All proxies have been ejected")
+        
+        now = time.monotonic()
+        free = [
+            proxy for proxy in live
+            if proxy.cooldown_until <= now
+            and proxy.in_flight + min(requests, proxy.max_concurrency) <= proxy.max_concurrency
+        ]
+        if not free:
+            return None
+        
+        # Untried proxies are assumed as fast as the best known one so they get a turn
+        known = [proxy.latency() for proxy in live if proxy.latency() is not None]
+        default_latency = min(known) if known else 1.0
+        
+        def score(proxy):
+            latency = proxy.latency()
+            latency = default_latency if latency is None else latency
+            return latency / proxy.success_rate(), proxy.in_flight
+        
+        proxy = min(free, key=score)
+        slots = min(requests, proxy.max_concurrency)
+        proxy.in_flight += slots
+        return ProxyLease(proxy, slots, timed)
+    
+    def _wait_time(self, give_up: float) -> float:
+        """Seconds to wait before retrying a checkout (caller holds the lock)."""
+        now = time.monotonic()
+        remaining = give_up - now
+        if remaining <= 0:
+            raise ProxyUnavailable("No proxy became free in time")
+        cooling = [proxy.cooldown_until - now for proxy in self.proxies
+                   if not proxy.ejected and proxy.cooldown_until > now]
+        return min([remaining] + cooling)
+    
+    @staticmethod
+    def _reserve(proxy: Proxy, requests: int) -> float:
+        """Take one token per request from the proxy's bucket; seconds to wait for the last."""
+        wait = 0.0
+        for _ in range(requests):
+            wait = proxy.bucket.reserve()
+        return wait
+    
+    def _release(self, lease: ProxyLease, latency):
+        """Free the lease's slots and learn from its outcome."""
+        proxy = lease.proxy
+        with self._cond:
+            proxy.in_flight -= lease.slots
+            if lease.outcome is not None:
+                proxy.samples.append((lease.outcome, latency if lease.timed else None))
+                self._update_health(proxy, lease.outcome)
+            self._cond.notify_all()
+    
+    def _update_health(self, proxy: Proxy, outcome: str):
+        """Cool down or eject a proxy that keeps failing (caller holds the lock)."""
+        if outcome not in (CHALLENGE, ERROR):
+            proxy.consecutive_failures = 0
+            proxy.cooldowns = 0
+            return
+        
+        proxy.consecutive_failures += 1
+        if proxy.consecutive_failures < self.failures_before_cooldown:
+            return
+        
+        proxy.consecutive_failures = 0
+        proxy.cooldowns += 1
+        if proxy.cooldowns > self.max_cooldowns:
+            proxy.ejected = True
+            logger.warning(f"Ejected proxy {proxy.label} after {self.max_cooldowns} cooldowns")
+            return
+        
+        pause = self.cooldown * 2 ** (proxy.cooldowns - 1)
+        proxy.cooldown_until = time.monotonic() + pause
+        logger.warning(f"Proxy {proxy.label} cooling down for {pause:.1f}s (last outcome: {outcome})")
+
+
+proxy_pool = ProxyPool()
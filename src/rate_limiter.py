@@ -0,0 +1,97 @@
+"""Process-wide per-host token-bucket rate limiting shared by every backend."""
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+from logger import get_logger
+from src.deadline import Deadline, DeadlineExceeded
+import config
+
+logger = get_logger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+    
+    Tokens refill continuously at ``rate`` per second up to ``burst``. Each
+    request reserves one token; if none is available the reservation goes
+    into debt and the caller is told how long to wait, so concurrent callers
+    queue up fairly instead of all waking at once.
+    """
+    
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reserve(self) -> float:
+        """Take one token and return the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+    
+    def refund(self):
+        """Give back a token reserved by a request that was not sent."""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+
+class RateLimiter:
+    """Registry of token buckets, one per host."""
+    
+    def __init__(self, rate: float = None, burst: int = None):
+        self.rate = rate or config.RATE_LIMIT_PER_SECOND
+        self.burst = burst or config.RATE_LIMIT_BURST
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+    
+    def bucket(self, url: str) -> TokenBucket:
+        """Return the bucket for the host of ``url`` (created on first use)."""
+        host = urlparse(url).netloc or url
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return self._buckets[host]
+    
+    def acquire(self, url: str, deadline: Deadline = None):
+        """
+        Block until a request to ``url`` fits within its host's rate.
+        
+        Raises:
+            DeadlineExceeded: If the wait would overrun ``deadline`` (the
+                token is given back and nothing is waited)
+        """
+        bucket = self.bucket(url)
+        wait = self._reserve(bucket, url, deadline)
+        if wait > 0:
+            logger.debug(f"Rate limit: waiting {wait:.2f}s for {url}")
+            time.sleep(wait)
+    
+    async def acquire_async(self, url: str, deadline: Deadline = None):
+        """Async variant of acquire."""
+        bucket = self.bucket(url)
+        wait = self._reserve(bucket, url, deadline)
+        if wait > 0:
+            logger.debug(f"Rate limit: waiting {wait:.2f}s for {url}")
+            await asyncio.sleep(wait)
+    
+    @staticmethod
+    def _reserve(bucket: TokenBucket, url: str, deadline: Deadline = None) -> float:
+        wait = bucket.reserve()
+        if deadline is not None and not deadline.allows(wait):
+            bucket.refund()
+            if deadline.expired():
+                raise DeadlineExceeded(f"Time budget exhausted before requesting {url}")
+            raise DeadlineExceeded(f"Rate limit wait of {wait:.2f}s for {url} would overrun the time budget")
+        return wait
+
+
+rate_limiter = RateLimiter()
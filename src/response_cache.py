@@ -0,0 +1,241 @@
+"""Disk-backed cache of search result pages shared by every backend."""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from logger import get_logger
+from src.json_store import write_json_atomic
+import config
+
+logger = get_logger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query so equivalent searches share cache entries."""
+    return " ".join(query.lower().split())
+
+
+def validators_from(headers) -> dict:
+    """Pick the cache validators (ETag / Last-Modified) out of response headers."""
+    headers = {name.lower(): value for name, value in headers.items()}
+    validators = {}
+    if headers.get('etag'):
+        validators['etag'] = headers['etag']
+    if headers.get('last-modified'):
+        validators['last_modified'] = headers['last-modified']
+    return validators
+
+
+def conditional_headers(entry) -> dict:
+    """Build If-None-Match / If-Modified-Since headers for a stale cache entry."""
+    if not entry:
+        return {}
+    validators = entry.get('validators') or {}
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+
+class ResponseCache:
+    """
+    Per-page response cache stored as one JSON file per (query, page).
+    
+    Entries hold the raw HTML (when the backend has it) and the extracted
+    listings, so a hit costs neither a request nor a parse. Each entry has
+    its own TTL and keeps the server's validators, so an expired page can be
+    revalidated with a conditional request; the directory is capped at ``max_bytes`` and the least
+    recently used files (by mtime, bumped on every hit) are evicted first.
+    Entries are written with write_json_atomic (src.json_store), so
+    concurrent processes never observe a half-written entry.
+    """
+    
+    def __init__(self, directory: Path = None, ttl: float = None, max_bytes: int = None):
+        self.directory = Path(directory or config.CACHE_DIR / "responses")
+        self.ttl = ttl if ttl is not None else config.CACHE_TTL
+        self.max_bytes = max_bytes or config.CACHE_MAX_BYTES
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+    
+    def key(self, query: str, page_num: int) -> str:
+        """Backend-independent cache key for a results page."""
+        raw = f"{normalize_query(query)}\x00{page_num}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    
+    def get(self, query: str, page_num: int, include_stale: bool = False):
+        """
+        Return the cached entry for a page if it is still fresh.
+        
+        Args:
+            query: Search query
+            page_num: Results page number
+            include_stale: Also return expired entries (marked ``stale``) so
+                the caller can revalidate them; they still count as misses
+        
+        Returns:
+            Entry dict with 'listings', 'body', 'validators', 'stale', or None
+        """
+        path = self._path(query, page_num)
+        entry = self._read(path)
+        
+        stale = entry is not None and time.time() - entry['stored_at'] > entry['ttl']
+        if entry is None or stale:
+            with self._lock:
+                self.misses += 1
+            if stale and include_stale:
+                entry['stale'] = True
+                return entry
+            return None
+        
+        entry['stale'] = False
+        self._touch(path)
+        with self._lock:
+            self.hits += 1
+        logger.debug(f"Cache hit: '{query}' page {page_num}")
+        return entry
+    
+    def peek(self, query: str, page_num: int):
+        """Like get(include_stale=True) but without counting a lookup or bumping the LRU."""
+        entry = self._read(self._path(query, page_num))
+        if entry is not None:
+            entry['stale'] = time.time() - entry['stored_at'] > entry['ttl']
+        return entry
+    
+    def get_listings(self, query: str, page_num: int):
+        """Return cached listings for a page, or None on a miss."""
+        entry = self.get(query, page_num)
+        return entry['listings'] if entry else None
+    
+    def put(self, query: str, page_num: int, listings: list[dict], body: str = "",
+            ttl: float = None, validators: dict = None):
+        """
+        Store a page's listings (and optionally its HTML).
+        
+        Args:
+            query: Search query
+            page_num: Results page number
+            listings: Extracted listing dictionaries
+            body: Raw HTML, if the backend has it
+            ttl: Seconds the entry stays fresh (default: config.CACHE_TTL)
+            validators: ETag / Last-Modified from the response (see validators_from)
+        """
+        entry = {
+            'query': normalize_query(query),
+            'page': page_num,
+            'stored_at': time.time(),
+            'ttl': ttl if ttl is not None else self.ttl,
+            'listings': listings,
+            'body': body or "",
+            'validators': validators or {},
+        }
+        
+        try:
+            write_json_atomic(self._path(query, page_num), entry, ensure_ascii=False)
+            self._evict()
+        except OSError as e:
+            logger.warning(f"Could not write cache entry: {e}")
+    
+    def refresh(self, query: str, page_num: int, entry: dict, validators: dict = None) -> list[dict]:
+        """
+        Renew a stale entry after a 304 Not Modified and return its listings.
+        
+        Args:
+            query: Search query
+            page_num: Results page number
+            entry: The stale entry that was revalidated
+            validators: Updated validators from the 304 response, if any
+            
+        Returns:
+            The entry's already-extracted listings
+        """
+        with self._lock:
+            self.revalidated += 1
+        logger.debug(f"Revalidated '{query}' page {page_num} (304 Not Modified)")
+        self.put(
+            query,
+            page_num,
+            entry['listings'],
+            body=entry.get('body', ""),
+            ttl=entry['ttl'],
+            validators={**entry.get('validators', {}), **(validators or {})}
+        )
+        return entry['listings']
+    
+    def clear(self):
+        """Remove every cached entry."""
+        for path in self.directory.glob("*.json"):
+            path.unlink(missing_ok=True)
+    
+    def stats(self) -> dict:
+        """Hit/miss counters and on-disk footprint."""
+        files = list(self.directory.glob("*.json"))
+        total = sum(self._size(f) for f in files)
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidated': self.revalidated,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(files),
+                'bytes': total,
+            }
+    
+    def _path(self, query: str, page_num: int) -> Path:
+        return self.directory / f"{self.key(query, page_num)}.json"
+    
+    def _read(self, path: Path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.debug(f"Discarding unreadable cache entry {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+    
+    def _touch(self, path: Path):
+        """Mark an entry as recently used for LRU eviction."""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+    
+    def _evict(self):
+        """Delete least recently used entries until the cache fits max_bytes."""
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        
+        for _, size, path in sorted(entries):
+            path.unlink(missing_ok=True)
+            total -= size
+            logger.debug(f"Evicted cache entry {path.name}")
+            if total <= self.max_bytes:
+                break
+    
+    @staticmethod
+    def _size(path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+
+response_cache = ResponseCache()
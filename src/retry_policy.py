@@ -0,0 +1,339 @@
+"""Shared retry layer: error classes, jittered backoff, per-scrape retry budgets and circuit breakers."""
+import asyncio
+import random
+import socket
+import subprocess
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from logger import get_logger
+from src.backend_stats import CHALLENGE, EMPTY, SUCCESS
+from src.challenge import ChallengeBlocked
+from src.deadline import Deadline, DeadlineExceeded
+import config
+
+logger = get_logger(__name__)
+
+# Error classes returned by classify() (CHALLENGE is the backend_stats outcome)
+TIMEOUT = 'timeout'
+RATE_LIMITED = 'rate_limited'
+SERVER_ERROR = 'server_error'
+DNS = 'dns'
+CONNECTION = 'connection'
+OTHER = 'other'
+
+# Worth another try with the same client. A challenge is not (the same IP and
+# fingerprint get the same page; the next backend handles it), and neither is
+# a host that does not resolve.
+RETRYABLE = frozenset({TIMEOUT, RATE_LIMITED, SERVER_ERROR, CONNECTION})
+
+# Exception class names and messages of requests, httpx, curl-cffi and curl
+_TIMEOUT_NAMES = {'Timeout', 'TimeoutException', 'ReadTimeout', 'ConnectTimeout', 'PoolTimeout', 'WriteTimeout'}
+_CONNECTION_NAMES = {'ConnectionError', 'ConnectError', 'NetworkError', 'RemoteProtocolError',
+                     'ChunkedEncodingError', 'ProxyError'}
+_DNS_MARKERS = ('name or service not known', 'nodename nor servname', 'getaddrinfo failed',
+                'could not resolve host', 'failed to resolve', 'temporary failure in name resolution',
+                'no address associated with hostname')
+_CONNECTION_MARKERS = ('connection refused', 'connection reset', 'failed to connect',
+                       "couldn't connect", 'connection aborted', 'empty reply from server')
+
+
+class RetryableStatus(Exception):
+    """A response whose status asks to come back later: 429 or a 5xx."""
+    
+    def __init__(self, url: str, status_code: int, retry_after: float = None):
+        self.url = url
+        self.status_code = status_code
+        self.retry_after = retry_after
+        super().__init__(f"{url} returned status {status_code}")
+
+
+def _retry_after(headers) -> float:
+    """Seconds asked for by a Retry-After header (delta or HTTP date), or None."""
+    value = headers.get('Retry-After') or headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def check_status(url: str, status_code: int, headers=None):
+    """
+    Raise RetryableStatus for a 429 or 5xx response.
+    
+    Call it after the body went through the challenge check, so a
+    Cloudflare 503 challenge still surfaces as ChallengeBlocked. Other
+    statuses are left to the caller.
+    """
+    if status_code == 429 or 500 <= status_code < 600:
+        raise RetryableStatus(url, status_code, _retry_after(headers or {}))
+
+
+def _chain(error: BaseException) -> list:
+    """``error`` and the exceptions it was raised from (requests/httpx wrap socket errors)."""
+    chain = []
+    while error is not None and error not in chain and len(chain) < 10:
+        chain.append(error)
+        error = error.__cause__ or error.__context__
+    return chain
+
+
+def classify(error: BaseException) -> str:
+    """
+    Class of a failed request: CHALLENGE, RATE_LIMITED, SERVER_ERROR, DNS,
+    TIMEOUT, CONNECTION or OTHER.
+    
+    Works on the exceptions of every HTTP client in the project by looking
+    at the exception chain's types, class names and messages, so none of
+    the optional clients has to be imported here.
+    """
+    if isinstance(error, ChallengeBlocked):
+        return CHALLENGE
+    if isinstance(error, DeadlineExceeded):
+        return OTHER  # never retried, whatever timeout it stands for
+    if isinstance(error, RetryableStatus):
+        return RATE_LIMITED if error.status_code == 429 else SERVER_ERROR
+    
+    chain = _chain(error)
+    names = {cls.__name__ for e in chain for cls in type(e).__mro__}
+    text = " ".join(str(e).lower() for e in chain)
+    
+    if any(isinstance(e, socket.gaierror) for e in chain) or any(m in text for m in _DNS_MARKERS):
+        return DNS
+    if (any(isinstance(e, (TimeoutError, subprocess.TimeoutExpired)) for e in chain)
+            or names & _TIMEOUT_NAMES or 'timed out' in text):
+        return TIMEOUT
+    if names & _CONNECTION_NAMES or any(m in text for m in _CONNECTION_MARKERS):
+        return CONNECTION
+    return OTHER
+
+
+class RetryBudget:
+    """
+    Retries left for one scrape.
+    
+    Every page and backend of the scrape draws from the same budget
+    (thread-safe, for racing mode), so a bad spell costs at most
+    RETRY_BUDGET extra requests in total rather than a few per page. With
+    the scrape's ``deadline`` a retry whose backoff would overrun it is
+    refused as well.
+    """
+    
+    def __init__(self, retries: int = None, deadline: Deadline = None):
+        self.remaining = config.RETRY_BUDGET if retries is None else retries
+        self.spent = 0
+        self.deadline = deadline or Deadline()
+        self._lock = threading.Lock()
+    
+    def take(self, delay: float = 0.0) -> bool:
+        """Spend one retry that first waits ``delay`` seconds; False if there is no budget (or time) for it."""
+        with self._lock:
+            if self.remaining <= 0 or not self.deadline.allows(delay):
+                return False
+            self.remaining -= 1
+            self.spent += 1
+            return True
+
+
+class RetryPolicy:
+    """
+    When to retry a failed request, and how long to wait first.
+    
+    Only RETRYABLE errors are retried, ``max_attempts`` tries at most, and
+    each retry is paid for from the scrape's RetryBudget. Waits are "full
+    jitter" exponential backoff - uniform between 0 and base_delay * 2**n,
+    capped at max_delay - so pages that failed together do not come back
+    together. A 429's Retry-After is waited at least; one longer than
+    max_delay is not waited for at all.
+    """
+    
+    def __init__(self, max_attempts: int = None, base_delay: float = None, max_delay: float = None,
+                 rng: random.Random = None):
+        self.max_attempts = max_attempts or config.RETRY_MAX_ATTEMPTS
+        self.base_delay = config.RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = config.RETRY_MAX_DELAY if max_delay is None else max_delay
+        self._rng = rng or random.Random()
+    
+    def backoff(self, retry: int, error: BaseException = None) -> float:
+        """Seconds to wait before retry number ``retry`` (from 0), or None to give up."""
+        delay = self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is not None:
+            if retry_after > self.max_delay:
+                return None
+            delay = max(delay, retry_after)
+        return delay
+    
+    def _delay_before_retry(self, error: Exception, attempt: int, budget: RetryBudget):
+        """Backoff after failed try number ``attempt``, or None if it should not be retried."""
+        kind = classify(error)
+        if kind not in RETRYABLE or attempt >= self.max_attempts:
+            return None
+        delay = self.backoff(attempt - 1, error)
+        if delay is None or not budget.take(delay):
+            return None
+        logger.warning(f"{kind} ({error}); retry {attempt} in {delay:.2f}s")
+        return delay
+    
+    @staticmethod
+    def _out_of_time(error: Exception, budget: RetryBudget) -> Exception:
+        """
+        ``error``, or DeadlineExceeded for a timeout caused by the deadline.
+        
+        Request timeouts are capped at the time left, so a timeout once the
+        deadline has passed says nothing about the site or the backend.
+        """
+        if budget.deadline.expired() and classify(error) == TIMEOUT:
+            exceeded = DeadlineExceeded(f"Time budget ran out: {error}")
+            exceeded.__cause__ = error
+            return exceeded
+        return error
+    
+    def call(self, fn, *args, budget: RetryBudget = None, **kwargs):
+        """Call ``fn(*args, **kwargs)``, retrying it as described above; re-raises the last error."""
+        budget = budget or RetryBudget()
+        attempt = 1
+        while True:
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._delay_before_retry(e, attempt, budget)
+                if delay is None:
+                    error = self._out_of_time(e, budget)
+                    if error is not e:
+                        raise error
+                    raise
+            time.sleep(delay)
+            attempt += 1
+    
+    async def call_async(self, fn, *args, budget: RetryBudget = None, **kwargs):
+        """call() for a coroutine function; waits with asyncio.sleep."""
+        budget = budget or RetryBudget()
+        attempt = 1
+        while True:
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._delay_before_retry(e, attempt, budget)
+                if delay is None:
+                    error = self._out_of_time(e, budget)
+                    if error is not e:
+                        raise error
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+    
+    def call_pages(self, fetch, page_nums: list[int], budget: RetryBudget = None) -> dict:
+        """
+        Run a batch ``fetch(page_nums) -> {page_num: listings | Exception}``
+        and fetch the pages that failed with a retryable error again, as one
+        smaller batch per retry. Each retried page costs one retry from
+        ``budget``. An exception from the whole batch counts for every page.
+        """
+        budget = budget or RetryBudget()
+        
+        def run(pages):
+            try:
+                return fetch(pages)
+            except Exception as e:
+                return {page_num: e for page_num in pages}
+        
+        outcomes = run(list(page_nums))
+        for attempt in range(1, self.max_attempts):
+            delays = {}
+            for page_num, outcome in sorted(outcomes.items()):
+                if isinstance(outcome, Exception) and classify(outcome) in RETRYABLE:
+                    delay = self.backoff(attempt - 1, outcome)
+                    if delay is not None and budget.take(delay):
+                        delays[page_num] = delay
+            if not delays:
+                break
+            delay = max(delays.values())
+            logger.warning(f"Retrying pages {sorted(delays)} in {delay:.2f}s (retry {attempt})")
+            time.sleep(delay)
+            outcomes.update(run(sorted(delays)))
+        return {page_num: self._out_of_time(outcome, budget) if isinstance(outcome, Exception) else outcome
+                for page_num, outcome in outcomes.items()}
+
+
+class CircuitBreakers:
+    """
+    One circuit breaker per backend, tripped by repeated challenges.
+    
+    Closed: attempts go through and challenges in a row are counted. After
+    ``threshold`` of them the breaker opens and allow() refuses the backend
+    for ``cooldown`` seconds - it would only be challenged again. Then one
+    trial attempt is let through (half-open): a success or an empty result
+    closes the breaker, another challenge reopens it for twice as long (at
+    most ``max_cooldown``). Other errors neither trip nor reset it.
+    """
+    
+    def __init__(self, threshold: int = None, cooldown: float = None, max_cooldown: float = None):
+        self.threshold = threshold or config.BREAKER_CHALLENGE_THRESHOLD
+        self.cooldown = config.BREAKER_COOLDOWN if cooldown is None else cooldown
+        self.max_cooldown = config.BREAKER_MAX_COOLDOWN if max_cooldown is None else max_cooldown
+        self._lock = threading.Lock()
+        self._breakers = {}
+    
+    def _state(self, backend: str) -> dict:
+        return self._breakers.setdefault(backend, {
+            'challenges': 0, 'open_until': None, 'cooldown': self.cooldown, 'trial': False, 'trips': 0
+        })
+    
+    def allow(self, backend: str) -> bool:
+        """Whether an attempt on ``backend`` may run now (claims the trial when half-open)."""
+        with self._lock:
+            state = self._state(backend)
+            if state['open_until'] is None:
+                return True
+            if time.monotonic() < state['open_until'] or state['trial']:
+                return False
+            state['trial'] = True
+            logger.info(f"Circuit breaker for {backend} half-open: trial attempt")
+            return True
+    
+    def record(self, backend: str, outcome: str):
+        """Feed the outcome (backend_stats SUCCESS, EMPTY, CHALLENGE or ERROR) of an attempt."""
+        with self._lock:
+            state = self._state(backend)
+            trial, state['trial'] = state['trial'], False
+            if outcome in (SUCCESS, EMPTY):
+                if state['open_until'] is not None:
+                    logger.info(f"Circuit breaker for {backend} closed")
+                state.update(challenges=0, open_until=None, cooldown=self.cooldown)
+            elif outcome == CHALLENGE:
+                state['challenges'] += 1
+                if trial:
+                    state['cooldown'] = min(self.max_cooldown, state['cooldown'] * 2)
+                if trial or (state['open_until'] is None and state['challenges'] >= self.threshold):
+                    state['open_until'] = time.monotonic() + state['cooldown']
+                    state['trips'] += 1
+                    logger.warning(
+                        f"Circuit breaker for {backend} open for {state['cooldown']:.0f}s "
+                        f"after {state['challenges']} challenges in a row"
+                    )
+    
+    def stats(self) -> dict:
+        """State ('closed', 'open' or 'half-open'), challenges in a row and trips per backend."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                backend: {
+                    'state': ('closed' if state['open_until'] is None
+                              else 'open' if now < state['open_until'] else 'half-open'),
+                    'challenges': state['challenges'],
+                    'trips': state['trips'],
+                }
+                for backend, state in self._breakers.items()
+            }
+
+
+# Shared by every backend in this process
+retry_policy = RetryPolicy()
+circuit_breakers = CircuitBreakers()
@@ -1,14 +1,41 @@
 """Advanced web scraper for Revolico listings."""
-import random
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from urllib.parse import urljoin
-from playwright.sync_api import sync_playwright, Page
+from playwright.sync_api import Page
 from faker import Faker
 from logger import get_logger
+from src.backend_registry import backend_registry
+from src.backend_stats import CHALLENGE, EMPTY, ERROR, SUCCESS, backend_stats
+from src.browser_pool import browser_pool
+from src.browser_tabs import context_cleared, scrape_in_tabs
+from src.challenge import ChallengeBlocked
+from src.cookie_vault import cookie_vault
+from src.deadline import Deadline, DeadlineExceeded
+from src.page_results import merge_pages, served_pages
+from src.page_ready import wait_until_ready
+from src.pagination import Paginator, known_last_page
+from src.proxy_pool import proxy_pool
+from src.rate_limiter import rate_limiter
+from src.response_cache import response_cache
+from src.retry_policy import RetryBudget, circuit_breakers
+from src.singleflight import scrape_flight
+from src.transfer_stats import transfer_stats
 import config
 
 logger = get_logger(__name__)
 fake = Faker()
 
+# Cost of racing mode across all scrapes in this process: attempts launched,
+# attempts beyond the winning one, and attempts still running when a winner
+# returned
+race_stats = {'races': 0, 'attempts': 0, 'extra_attempts': 0, 'abandoned': 0}
+_race_lock = threading.Lock()
+
 
 class RevolicoScraper:
     """Scraper for Revolico.com listings."""
@@ -17,22 +44,74 @@ class RevolicoScraper:
         self.base_url = config.REVOLICO_SEARCH_URL
         self.timeout = config.SCRAPER_TIMEOUT
         self.headless = config.SCRAPER_HEADLESS
-        
-    def scrape(self, query: str, max_pages: int = 1) -> list[dict]:
+        self.paginator = Paginator()
+        self.deadline = Deadline()
+        self.retry_budget = RetryBudget()
+    
+    # HTTP backends tried by scrape(); this is also the order used before
+    # backend_stats has any history. 'http2' is the requests engine over one
+    # multiplexed HTTP/2 connection. Those backend_registry finds unusable
+    # here (e.g. no h2 package, no curl executable) are left out.
+    BACKENDS = ('http2', 'requests', 'curl-direct', 'ultimate')
+    
+    # Listing containers, most specific first: the first with more than 5
+    # matches wins ('[data-cy="listing"]', modern Revolico, with any match)
+    LISTING_SELECTORS = [
+        '[data-cy="listing"]',
+        # Class-based selectors
+        'div[class*="ListingCard"]',
+        'div[class*="listing-item"]',
+        'article[class*="listing"]',
+        'div.listing',
+        '[class*="ProductCard"]',
+        'div[class*="ad-item"]',
+        # More aggressive strategies
+        'article',  # Try all articles
+        'div[class*="card"]',
+        'div[class*="item"]',
+        'a[class*="listing"]',
+        'section[class*="listing"]',
+        'div[data-testid*="listing"]',
+        # Maybe it's a link-based structure
+        'a[href*="/es/anuncio/"]',
+        'a[href*="/anuncio/"]',
+        'div > a[href*="/"]',  # All links in divs
+    ]
+    
+    # Where a listing element keeps its data, most specific first
+    TITLE_SELECTORS = ['[data-cy="title"]', 'h2, h3', '[class*="title"]', 'a[class*="link"]']
+    PRICE_SELECTORS = ['[data-cy="price"]', '[class*="price"]', 'span[class*="amount"]', '[class*="cost"]']
+    LINK_SELECTORS = ['a[data-cy="listing-link"]', 'a[href*="/listing/"]', 'a']
+    
+    def scrape(self, query: str, max_pages: int = 1, race: bool = None,
+               deadline=None, budget_s: float = None) -> list[dict]:
         """
         Scrape Revolico listings for a given query.
         
-        Tries multiple methods:
-        1. Hybrid (user solves Cloudflare challenge manually - MOST RELIABLE)
-        2. Requests with proper headers
-        3. Curl direct
-        4. Ultimate bypass
-        5. Playwright headless
+        Each results page is a unit of work: the HTTP backends (http2,
+        requests, curl-direct, ultimate bypass) are tried in the order chosen by
+        backend_stats, and every backend only fetches the pages the previous
+        ones failed to serve; pages past the end of the results (see
+        src.pagination) are not asked for. Transient failures are retried
+        within one RetryBudget for the whole scrape, and backends whose
+        circuit breaker is open (repeated challenges) are skipped. Pages are
+        merged in order and deduplicated by URL; which backend served each
+        page is left in ``page_sources``.
+        
+        With a deadline every request, wait and retry is fitted into the time
+        left (see src.deadline); once it runs out no further backend is
+        tried and the pages served so far are returned, possibly none.
         
         Args:
             query: Search query
             max_pages: Maximum number of pages to scrape
-            
+            race: Hedge backends concurrently (see _scrape_racing) for the
+                first round instead of trying them one at a time; defaults
+                to config.SCRAPER_RACE
+            deadline: Deadline (or time.monotonic() timestamp) to finish by
+            budget_s: Seconds the scrape may take; defaults to
+                config.SCRAPE_BUDGET (0: no deadline)
+        
         Returns:
             List of listing dictionaries
         """
@@ -43,43 +122,272 @@ class RevolicoScraper:
         # Try requests method instead
         logger.info("Skipping HYBRID scraper (Playwright incompatible with Python 3.14)")
         
-        # Try requests
+        if race is None:
+            race = config.SCRAPER_RACE
+        
+        page_nums = list(range(1, max_pages + 1))
+        pages = {}
+        self.page_sources = {}
+        self._start_budget(deadline, budget_s)
+        backends = backend_stats.order(backend_registry.usable(self.BACKENDS))
+        
+        if race:
+            winner, served, launched = self._scrape_racing(query, page_nums, backends)
+            self._collect(pages, served, winner)
+            backends = [backend for backend in backends if backend not in launched]
+        
+        for backend in backends:
+            remaining = self._remaining(query, page_nums, pages)
+            if not remaining or self._out_of_time(remaining):
+                break
+            self._collect(pages, self._attempt(backend, query, remaining), backend)
+        
+        return self._finish(query, pages, page_nums)
+    
+    async def scrape_async(self, query: str, max_pages: int = 1, race: bool = None,
+                           deadline=None, budget_s: float = None) -> list[dict]:
+        """
+        Async variant of scrape for callers running an event loop.
+        
+        The concurrent requests engine is awaited natively; the blocking
+        backends (and racing mode) run in a worker thread so the loop stays free.
+        
+        Args:
+            query: Search query
+            max_pages: Maximum number of pages to scrape
+            race: See scrape
+            deadline: See scrape
+            budget_s: See scrape
+        
+        Returns:
+            List of listing dictionaries
+        """
+        logger.info(f"Starting async scrape for query: {query} (max {max_pages} pages)")
+        
+        if race is None:
+            race = config.SCRAPER_RACE
+        if race:
+            return await asyncio.to_thread(self.scrape, query, max_pages, True, deadline, budget_s)
+        
+        page_nums = list(range(1, max_pages + 1))
+        pages = {}
+        self.page_sources = {}
+        self._start_budget(deadline, budget_s)
+        
+        for backend in backend_stats.order(backend_registry.usable(self.BACKENDS)):
+            remaining = self._remaining(query, page_nums, pages)
+            if not remaining or self._out_of_time(remaining):
+                break
+            if backend in ('requests', 'http2'):
+                served = await self._attempt_requests_async(query, remaining, http2=backend == 'http2')
+            else:
+                served = await asyncio.to_thread(self._attempt, backend, query, remaining)
+            self._collect(pages, served, backend)
+        
+        return self._finish(query, pages, page_nums)
+    
+    def _start_budget(self, deadline, budget_s: float):
+        """Set this scrape's deadline and the retry budget bounded by it."""
+        if deadline is None and budget_s is None and config.SCRAPE_BUDGET > 0:
+            budget_s = config.SCRAPE_BUDGET
+        self.deadline = Deadline.of(deadline, budget_s)
+        self.retry_budget = RetryBudget(deadline=self.deadline)
+        if self.deadline.bounded:
+            logger.info(f"Time budget: {self.deadline.remaining():.1f}s")
+    
+    def _out_of_time(self, remaining: list[int]) -> bool:
+        """Whether the deadline leaves no time for another backend to fetch ``remaining``."""
+        if not self.deadline.expired():
+            return False
+        logger.warning(f"Time budget exhausted: pages {remaining} not fetched")
+        return True
+    
+    def _scrape_racing(self, query: str, page_nums: list[int], backends: list[str]) -> tuple:
+        """
+        Hedged execution of the backends over ``page_nums``.
+        
+        The first of ``backends`` starts at once; whenever RACE_HEDGE_DELAY
+        passes without a result, or a running backend fails, the next one is
+        started (at most RACE_MAX_BACKENDS in flight). The first attempt that
+        serves any page wins and the remaining attempts are abandoned: their
+        threads finish in the background, still filling the response cache
+        and the backend stats. The extra attempts are counted in race_stats.
+        
+        Returns:
+            (winning backend or None, {page_num: listings} it served,
+            backends launched)
+        """
+        queue = list(backends)
+        if not queue:
+            return None, {}, []
+        width = max(1, config.RACE_MAX_BACKENDS)
+        # At most ``width`` attempts run at once
+        executor = ThreadPoolExecutor(max_workers=min(len(queue), width), thread_name_prefix="race")
+        pending = {}
+        launched = []
+        
         try:
-            logger.info("Attempting requests scraper...")
-            from src.scraper_requests import scrape_revolico_requests
-            results = scrape_revolico_requests(query, max_pages)
-            if results and len(results) > 0:
-                logger.info(f"Success with requests: {len(results)} listings")
-                return results
-            logger.info("Requests returned no results, trying curl-direct...")
-        except Exception as e:
-            logger.warning(f"Requests failed: {e}. Trying curl-direct...")
+            while True:
+                if self.deadline.expired():
+                    break
+                if queue and len(pending) < width:
+                    backend = queue.pop(0)
+                    if launched:
+                        logger.info(f"Hedging with {backend}")
+                    launched.append(backend)
+                    pending[executor.submit(self._attempt, backend, query, page_nums)] = backend
+                if not pending:
+                    break
+                
+                hedge_delay = config.RACE_HEDGE_DELAY if queue and len(pending) < width else None
+                if self.deadline.bounded:
+                    hedge_delay = min(hedge_delay or self.deadline.remaining(), self.deadline.remaining())
+                done, _ = wait(pending, timeout=hedge_delay, return_when=FIRST_COMPLETED)
+                for future in done:
+                    backend = pending.pop(future)
+                    served = future.result()
+                    if served:
+                        self._account_race(launched, backend, abandoned=list(pending.values()))
+                        return backend, served, launched
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
         
-        # Try curl direct
+        self._account_race(launched, None, abandoned=list(pending.values()))
+        return None, {}, launched
+    
+    def _account_race(self, launched: list, winner: str, abandoned: list):
+        """Record how many attempts a race cost beyond the one that won."""
+        with _race_lock:
+            race_stats['races'] += 1
+            race_stats['attempts'] += len(launched)
+            race_stats['extra_attempts'] += len(launched) - 1 if winner else 0
+            race_stats['abandoned'] += len(abandoned)
+        self.last_race = {'launched': launched, 'winner': winner, 'abandoned': abandoned}
+        logger.info(f"Race: winner={winner}, launched={launched}, abandoned={abandoned}")
+    
+    def _attempt(self, backend: str, query: str, page_nums: list[int]) -> dict:
+        """Run one backend over ``page_nums``; returns the pages it served."""
+        if not circuit_breakers.allow(backend):
+            logger.info(f"Skipping {backend}: circuit breaker open")
+            return {}
+        logger.info(f"Attempting {backend} scraper for pages {page_nums}...")
+        start = time.perf_counter()
         try:
-            logger.info("Attempting curl-direct scraping...")
-            from src.scraper_curl import scrape_revolico_curl
-            results = scrape_revolico_curl(query, max_pages)
-            if results and len(results) > 0:
-                logger.info(f"Success with curl-direct: {len(results)} listings")
-                return results
-            logger.info("curl-direct returned no results, trying ultimate bypass...")
+            outcomes = self._run_backend(backend, query, page_nums)
         except Exception as e:
-            logger.warning(f"curl-direct failed: {e}. Trying ultimate bypass...")
-        
-        # Try ultimate bypass
+            outcomes = {page_num: e for page_num in page_nums}
+        return self._record_attempt(backend, outcomes, time.perf_counter() - start)
+    
+    async def _attempt_requests_async(self, query: str, page_nums: list[int], http2: bool = False) -> dict:
+        """_attempt for the requests/http2 backends, awaiting their native async engine."""
+        backend = 'http2' if http2 else 'requests'
+        if not circuit_breakers.allow(backend):
+            logger.info(f"Skipping {backend}: circuit breaker open")
+            return {}
+        logger.info(f"Attempting {backend} scraper for pages {page_nums}...")
+        start = time.perf_counter()
         try:
-            logger.info("Attempting ultimate Cloudflare bypass...")
-            from src.scraper_ultimate import scrape_revolico_ultimate
-            results = scrape_revolico_ultimate(query, max_pages)
-            if results and len(results) > 0:
-                logger.info(f"Success with ultimate bypass: {len(results)} listings")
-                return results
-            logger.info("Ultimate bypass returned no results, trying Playwright...")
+            from src.scraper_requests import RequestsScraper
+            scraper = RequestsScraper(http2=http2)
+            scraper.deadline = self.deadline
+            scraper.retry_budget = self.retry_budget
+            outcomes = await scraper.scrape_pages_async(query, page_nums)
         except Exception as e:
-            logger.warning(f"Ultimate bypass failed: {e}. Trying Playwright...")
+            outcomes = {page_num: e for page_num in page_nums}
+        return self._record_attempt(backend, outcomes, time.perf_counter() - start)
+    
+    def _record_attempt(self, backend: str, outcomes: dict, elapsed: float) -> dict:
+        """Log a backend's per-page outcomes, feed backend_stats and circuit_breakers, return the served pages."""
+        served = served_pages(outcomes)
+        errors = [e for e in outcomes.values() if isinstance(e, Exception)]
         
-        # All HTTP methods failed
+        if not served and errors and all(isinstance(e, DeadlineExceeded) for e in errors):
+            # Cut short by the time budget: says nothing about the backend.
+            # Still reported to its breaker, in case this was its trial attempt.
+            logger.warning(f"{backend} ran out of time: {errors[0]}")
+            circuit_breakers.record(backend, ERROR)
+            return served
+        if served:
+            outcome = SUCCESS
+            logger.info(f"{backend} served pages {sorted(served)}")
+        elif any(isinstance(e, ChallengeBlocked) for e in errors):
+            outcome = CHALLENGE
+            logger.warning(f"{backend} blocked by challenge. Trying next backend...")
+        elif errors:
+            outcome = ERROR
+            logger.warning(f"{backend} failed: {errors[0]}. Trying next backend...")
+        else:
+            outcome = EMPTY
+            logger.info(f"{backend} returned no results, trying next backend...")
+        backend_stats.record(backend, outcome, elapsed)
+        circuit_breakers.record(backend, outcome)
+        return served
+    
+    def _collect(self, pages: dict, served: dict, backend: str):
+        """Add pages served by ``backend`` to ``pages`` and page_sources."""
+        for page_num, listings in served.items():
+            pages[page_num] = listings
+            self.page_sources[page_num] = backend
+    
+    def _remaining(self, query: str, page_nums: list[int], pages: dict) -> list[int]:
+        """Pages not served yet, minus those past the end of the results found so far."""
+        last_page = known_last_page(query)
+        return [n for n in page_nums if n not in pages and (last_page is None or n <= last_page)]
+    
+    def _finish(self, query: str, pages: dict, page_nums: list[int]) -> list[dict]:
+        """Merge the served pages, report their sources, raise if none were served in time."""
+        if not pages:
+            if self.deadline.expired():
+                logger.warning(f"Time budget exhausted before any page of '{query}' was served")
+                self._log_bandwidth(query)
+                return []
+            self._all_backends_failed()
+        
+        missing = self._remaining(query, page_nums, pages)
+        sources = ", ".join(f"{n}: {self.page_sources[n]}" for n in sorted(self.page_sources))
+        logger.info(f"Pages served by backend - {sources}" + (f"; missing {missing}" if missing else ""))
+        
+        results = merge_pages(pages)
+        logger.info(f"Scrape complete: {len(results)} listings from {len(pages)} page(s)")
+        self._log_bandwidth(query)
+        return results
+    
+    def _log_bandwidth(self, query: str):
+        """Log the bytes downloaded so far for ``query`` and by each backend (see transfer_stats)."""
+        def kb(totals):
+            return (f"{totals['wire_bytes'] / 1024:.1f} KB on the wire, {totals['body_bytes'] / 1024:.1f} KB decoded "
+                    f"({totals['saved_ratio']:.0%} saved)")
+        
+        report = transfer_stats.report()
+        if query in report['queries']:
+            logger.info(f"Bandwidth for '{query}': {kb(report['queries'][query])}")
+        for backend, totals in report['backends'].items():
+            logger.debug(f"Bandwidth of {backend}: {totals['responses']} response(s), {kb(totals)}")
+    
+    def _run_backend(self, backend: str, query: str, page_nums: list[int]) -> dict:
+        """
+        Run one of BACKENDS by name over ``page_nums`` ({page_num: listings | Exception}).
+        
+        The backend spends its retries from this scrape's retry_budget and
+        fits its requests into this scrape's deadline.
+        """
+        if backend in ('requests', 'http2'):
+            from src.scraper_requests import RequestsScraper
+            scraper = RequestsScraper(http2=backend == 'http2')
+        elif backend == 'curl-direct':
+            from src.scraper_curl import CurlDirectScraper
+            scraper = CurlDirectScraper()
+        elif backend == 'ultimate':
+            from src.scraper_ultimate import UltraPotentScraper
+            scraper = UltraPotentScraper()
+        else:
+            raise ValueError(f"Unknown backend: {backend}")
+        scraper.deadline = self.deadline
+        scraper.retry_budget = self.retry_budget
+        return scraper.scrape_pages(query, page_nums)
+    
+    def _all_backends_failed(self):
+        """Raise the error shown when no HTTP backend produced listings."""
         logger.error("All HTTP scraping methods failed")
         raise Exception(
             "All scraping methods failed. Revolico requires either:\n"
@@ -100,186 +408,207 @@ class RevolicoScraper:
         )
     
     def _scrape_playwright(self, query: str, max_pages: int) -> list[dict]:
-        """Internal Playwright scraping implementation (runs in thread to avoid asyncio issues)."""
-        from src.threading_wrapper import run_playwright_in_thread
-        return run_playwright_in_thread(self._scrape_playwright_internal, query, max_pages)
+        """Internal Playwright scraping implementation (on a warm browser of browser_pool)."""
+        # One proxy for the whole browser session (its duration is not a latency sample)
+        with proxy_pool.lease(timed=False, deadline=self.deadline) as lease:
+            context_options = {
+                'user_agent': _browser_user_agent(),
+                'viewport': {'width': 1280, 'height': 720},
+                'proxy': lease.playwright_proxy(),
+            }
+            return browser_pool.run(self._scrape_playwright_internal, query, max_pages,
+                                    context_options=context_options, context_setup=_prepare_context,
+                                    deadline=self.deadline)
     
-    def _scrape_playwright_internal(self, query: str, max_pages: int) -> list[dict]:
-        """Playwright scraping implementation (runs in thread)."""
+    def _scrape_playwright_internal(self, context, query: str, max_pages: int) -> list[dict]:
+        """Playwright scraping implementation (runs on a browser_pool worker thread)."""
         results = []
+        page = context.new_page()
+        self.paginator = Paginator(query, response_cache)
         
-        with sync_playwright() as p:
-            # Launch with stealth mode to bypass Cloudflare
-            browser = p.chromium.launch(
-                headless=self.headless,
-                args=["--disable-blink-features=AutomationControlled"]
-            )
-            context = browser.new_context(
-                user_agent=fake.user_agent() if config.USER_AGENT_ROTATION else None,
-                viewport={'width': 1280, 'height': 720}
-            )
-            
-            # Add stealth script to hide automation
-            context.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => false,
-                });
-            """)
-            
-            # Block resource types to speed up scraping
-            context.route(
-                "**/*",
-                lambda route: route.abort() if route.request.resource_type in 
-                ["image", "stylesheet", "font", "media"] else route.continue_()
-            )
-            
-            page = context.new_page()
-            
-            for page_num in range(1, max_pages + 1):
-                logger.info(f"Scraping page {page_num}")
-                results.extend(self._scrape_page(page, query, page_num))
-                
-                # Random delay between pages
-                if page_num < max_pages:
-                    delay = random.uniform(config.REQUEST_DELAY_MIN, config.REQUEST_DELAY_MAX)
-                    logger.debug(f"Waiting {delay:.2f}s before next page")
-                    page.wait_for_timeout(int(delay * 1000))
-            
-            browser.close()
+        # Page 1 alone: it clears the challenge for the whole context and
+        # tells the paginator how many pages there are
+        cleared = False
+        if not self._out_of_time([1]):
+            logger.info("Scraping page 1")
+            cached = self._cached_page(query, 1)
+            if cached is None:
+                cached = self._scrape_page(page, query, 1)
+                cleared = bool(cached)
+            results.extend(cached)
+        
+        # The rest in tabs of this context once it is past the challenge;
+        # otherwise one at a time, as several tabs would all be challenged
+        tabs = None if cleared or context_cleared(context) else 1
+        uncached = []
+        for page_num in range(2, max_pages + 1):
+            if not self.paginator.wants(page_num):
+                break
+            cached = self._cached_page(query, page_num)
+            if cached is None:
+                uncached.append(page_num)
+            else:
+                results.extend(cached)
+        outcomes = scrape_in_tabs(
+            context, uncached,
+            navigate=lambda tab, page_num: self._open_page(tab, query, page_num, wait_until="commit"),
+            harvest=lambda tab, page_num, url: self._harvest_page(tab, query, page_num, url),
+            tabs=tabs, paginator=self.paginator, deadline=self.deadline, first_tab=page,
+        )
+        for page_num in sorted(outcomes):
+            if isinstance(outcomes[page_num], Exception):
+                logger.error(f"Error scraping page {page_num}: {outcomes[page_num]}")
+            else:
+                results.extend(outcomes[page_num])
+        
+        page.close()
         
         logger.info(f"Completed scrape. Found {len(results)} listings")
         return results
     
     def _scrape_page(self, page: Page, query: str, page_num: int = 1) -> list[dict]:
         """Scrape a single page of results."""
-        url = f"{self.base_url}?q={query}&page={page_num}" if page_num > 1 else f"{self.base_url}?q={query}"
+        cached = self._cached_page(query, page_num)
+        if cached is not None:
+            return cached
         
         try:
-            logger.debug(f"Navigating to {url}")
-            page.goto(url, timeout=self.timeout, wait_until="networkidle")
+            url = self._open_page(page, query, page_num)
         except Exception as e:
-            logger.error(f"Error navigating to {url}: {e}")
+            logger.error(f"Error navigating to page {page_num}: {e}")
             return []
-        
-        # Wait for listings to load - try multiple wait strategies
-        try:
-            # Try to wait for common listing selectors
-            page.wait_for_selector('article, div[class*="card"], div[class*="item"], a[href*="/anuncio/"]', timeout=5000)
-            logger.debug("Waited for listings to load")
-        except Exception as e:
-            logger.warning(f"Timeout waiting for listings: {e}")
-        
-        # Random delay after page load
-        page.wait_for_timeout(random.randint(1000, 3000))
-        
+        return self._harvest_page(page, query, page_num, url)
+    
+    def _cached_page(self, query: str, page_num: int):
+        """The cached listings of a page (None if not cached)."""
+        entry = response_cache.get(query, page_num)
+        if entry is None:
+            return None
+        logger.info(f"Page {page_num} served from cache")
+        self.paginator.observe(page_num, entry['listings'], entry.get('body', ""))
+        return entry['listings']
+    
+    def _open_page(self, page: Page, query: str, page_num: int, wait_until: str = "domcontentloaded") -> str:
+        """Navigate ``page`` to a results page under the shared rate limit; returns the URL."""
+        url = f"{self.base_url}?q={query}&page={page_num}" if page_num > 1 else f"{self.base_url}?q={query}"
+        rate_limiter.acquire(url, self.deadline)
+        logger.debug(f"Navigating to {url}")
+        page.goto(url, timeout=self.deadline.timeout(self.timeout / 1000) * 1000, wait_until=wait_until)
+        return url
+    
+    def _harvest_page(self, page: Page, query: str, page_num: int, url: str) -> list[dict]:
+        """Wait for an opened results page and extract (and cache) its listings."""
+        # Harvest as soon as the listings stop changing (a tab opened with
+        # wait_until="commit" is still loading)
+        ready = wait_until_ready(page, 'article, div[class*="card"], div[class*="item"], a[href*="/anuncio/"]',
+                                 deadline=self.deadline)
+        if ready['ready']:
+            logger.debug(f"Page {page_num} ready in {ready['waited']:.1f}s")
+        else:
+            logger.warning(f"Timeout waiting for listings on page {page_num}")
+
         # Try multiple selector strategies
         listings = self._find_listings(page)
         logger.info(f"Found {len(listings)} listings on page {page_num}")
         
         results = []
-        for i, listing in enumerate(listings):
-            try:
-                item = self._extract_listing_data(listing)
-                if item and item.get('titulo') and item.get('precio_raw'):
-                    results.append(item)
-                    logger.debug(f"Extracted listing {i+1}: {item['titulo'][:50]}")
-            except Exception as e:
-                logger.warning(f"Error extracting listing {i+1}: {e}")
-                continue
-        
+        for i, item in enumerate(self._extract_listings(page, listings)):
+            if item and item.get('titulo') and item.get('precio_raw'):
+                results.append(item)
+                logger.debug(f"Extracted listing {i+1}: {item['titulo'][:50]}")
+
+        if results:
+            response_cache.put(query, page_num, results)
+            # Share the solved challenge with the cheap HTTP backends
+            cookie_vault.store(url, page.context.cookies(), page.evaluate("navigator.userAgent"))
+        # No HTML here: only repeated listings can end the pagination
+        self.paginator.observe(page_num, results)
         return results
     
     def _find_listings(self, page: Page) -> list:
-        """Find listing containers using multiple selector strategies."""
-        # Dump page HTML for debugging
-        logger.debug("Page content length: " + str(len(page.content())))
-        
-        # Strategy 1: data-cy attribute (modern Revolico)
-        listings = page.query_selector_all('[data-cy="listing"]')
-        if listings:
-            logger.debug("Found listings using [data-cy='listing']")
-            return listings
-        
-        # Strategy 2: Class-based selectors
-        selectors_to_try = [
-            'div[class*="ListingCard"]',
-            'div[class*="listing-item"]',
-            'article[class*="listing"]',
-            'div.listing',
-            '[class*="ProductCard"]',
-            'div[class*="ad-item"]',
-            # More aggressive strategies
-            'article',  # Try all articles
-            'div[class*="card"]',
-            'div[class*="item"]',
-            'a[class*="listing"]',
-            'section[class*="listing"]',
-            'div[data-testid*="listing"]',
-            # Maybe it's a link-based structure
-            'a[href*="/es/anuncio/"]',
-            'a[href*="/anuncio/"]',
-            'div > a[href*="/"]',  # All links in divs
-        ]
-        
-        for selector in selectors_to_try:
-            try:
-                listings = page.query_selector_all(selector)
-                if listings and len(listings) > 5:  # Only return if we got multiple results
-                    logger.debug(f"Found {len(listings)} listings using {selector}")
-                    return listings
-                elif listings:
-                    logger.debug(f"Found only {len(listings)} listings using {selector} (need more)")
-            except Exception as e:
-                logger.debug(f"Selector failed {selector}: {e}")
-                continue
+        """
+        Find listing containers using multiple selector strategies.
         
-        # If all selectors fail, try to get all divs and look for price patterns
-        logger.warning("Could not find listings with standard selectors. Trying fallback...")
-        all_divs = page.query_selector_all('div')
-        logger.debug(f"Total divs on page: {len(all_divs)}")
+        Every candidate of LISTING_SELECTORS is counted in the page in one
+        evaluate() round trip; only the winner's elements are then fetched.
+        """
+        # The element count is only worked out for the debug log
+        debug = logger.isEnabledFor(logging.DEBUG)
+        try:
+            probe = page.evaluate(_COUNT_SELECTORS_JS, {'selectors': self.LISTING_SELECTORS, 'debug': debug})
+        except Exception as e:
+            logger.warning(f"Could not probe listing selectors: {e}")
+            return []
+        
+        if debug:
+            logger.debug(f"Page elements: {probe['elements']}; selector matches: "
+                         + ", ".join(f"{selector}={count}" for selector, count
+                                     in zip(self.LISTING_SELECTORS, probe['counts']) if count))
         
+        for i, (selector, count) in enumerate(zip(self.LISTING_SELECTORS, probe['counts'])):
+            # Any data-cy match; otherwise only a selector with multiple results
+            if count > (0 if i == 0 else 5):
+                logger.debug(f"Found {count} listings using {selector}")
+                return page.query_selector_all(selector)
+        
+        logger.warning("Could not find listings with standard selectors")
         return []
     
+    def _extract_listings(self, page: Page, listings: list) -> list:
+        """
+        Data of every listing element (None for those that failed).
+        
+        With BROWSER_EXTRACT_IN_PAGE all of them are read by one script in
+        a single evaluate() round trip to the browser, instead of a
+        query_selector/inner_text round trip per field, selector and
+        listing; the per-element queries remain as the fallback.
+        """
+        if config.BROWSER_EXTRACT_IN_PAGE and listings:
+            try:
+                rows = page.evaluate(_EXTRACT_LISTINGS_JS, {
+                    'listings': listings,
+                    'title': self.TITLE_SELECTORS,
+                    'price': self.PRICE_SELECTORS,
+                    'link': self.LINK_SELECTORS,
+                })
+                return [self._listing(row['titulo'], row['precio_raw'], row['url']) for row in rows]
+            except Exception as e:
+                logger.warning(f"In-page extraction failed, querying each listing: {e}")
+        
+        return [self._extract_listing_data(listing) for listing in listings]
+    
     def _extract_listing_data(self, listing) -> dict:
         """Extract data from a listing element."""
         try:
-            # Title extraction
-            titulo = self._extract_text(listing, [
-                '[data-cy="title"]',
-                'h2, h3',
-                '[class*="title"]',
-                'a[class*="link"]'
-            ])
-            
-            # Price extraction
-            precio_raw = self._extract_text(listing, [
-                '[data-cy="price"]',
-                '[class*="price"]',
-                'span[class*="amount"]',
-                '[class*="cost"]'
-            ])
+            titulo = self._extract_text(listing, self.TITLE_SELECTORS)
+            precio_raw = self._extract_text(listing, self.PRICE_SELECTORS)
             
             # URL extraction
             url = ""
-            for selector in ['a[data-cy="listing-link"]', 'a[href*="/listing/"]', 'a']:
+            for selector in self.LINK_SELECTORS:
                 link = listing.query_selector(selector)
                 if link:
                     url = link.get_attribute('href')
                     if url:
-                        # Make absolute URL if necessary
-                        if not url.startswith('http'):
-                            url = urljoin(config.REVOLICO_BASE_URL, url)
                         break
             
-            return {
-                'titulo': titulo.strip() if titulo else "",
-                'precio_raw': precio_raw.strip() if precio_raw else "",
-                'url': url if url else ""
-            }
+            return self._listing(titulo, precio_raw, url)
         except Exception as e:
             logger.warning(f"Error extracting listing data: {e}")
             return None
     
+    @staticmethod
+    def _listing(titulo: str, precio_raw: str, url: str) -> dict:
+        """Listing dict from the raw texts of its element."""
+        # Make absolute URL if necessary
+        if url and not url.startswith('http'):
+            url = urljoin(config.REVOLICO_BASE_URL, url)
+        return {
+            'titulo': titulo.strip() if titulo else "",
+            'precio_raw': precio_raw.strip() if precio_raw else "",
+            'url': url if url else ""
+        }
+    
     def _extract_text(self, element, selectors: list[str]) -> str:
         """Try multiple selectors to extract text."""
         for selector in selectors:
@@ -294,10 +623,98 @@ class RevolicoScraper:
         return ""
 
 
-def scrape_revolico(query: str, max_pages: int = 1) -> list[dict]:
-    """Convenience function to scrape Revolico."""
-    scraper = RevolicoScraper()
-    return scraper.scrape(query, max_pages)
+# Number of matches of each selector (-1: invalid selector), plus the
+# page's element count when debugging - without serialising the DOM
+_COUNT_SELECTORS_JS = """
+({selectors, debug}) => ({
+    counts: selectors.map(selector => {
+        try {
+            return document.querySelectorAll(selector).length;
+        } catch (e) {
+            return -1;
+        }
+    }),
+    elements: debug ? document.getElementsByTagName("*").length : null,
+})
+"""
+
+# RevolicoScraper._extract_listing_data for every listing element at once,
+# in the page: the first selector with text (href for links) wins
+_EXTRACT_LISTINGS_JS = """
+({listings, title, price, link}) => {
+    const first = (element, selectors, read) => {
+        for (const selector of selectors) {
+            try {
+                const found = element.querySelector(selector);
+                const value = found && read(found);
+                if (value) return value;
+            } catch (e) {}
+        }
+        return "";
+    };
+    return listings.map(element => ({
+        titulo: first(element, title, found => found.innerText),
+        precio_raw: first(element, price, found => found.innerText),
+        url: first(element, link, found => found.getAttribute('href')),
+    }));
+}
+"""
+
+
+@functools.lru_cache(maxsize=1)
+def _browser_user_agent() -> str:
+    """
+    User agent of the pooled browser contexts (None: Chromium's own).
+    
+    Picked once per process: a recycled context keeps its cookies, and a
+    cleared challenge is only honoured for the user agent that solved it.
+    """
+    return fake.user_agent() if config.USER_AGENT_ROTATION else None
+
+
+def _prepare_context(context):
+    """Set up a new pooled browser context: stealth script and resource blocking."""
+    # Add stealth script to hide automation
+    context.add_init_script("""
+        Object.defineProperty(navigator, 'webdriver', {
+            get: () => false,
+        });
+    """)
+    
+    # Block resource types to speed up scraping
+    context.route(
+        "**/*",
+        lambda route: route.abort() if route.request.resource_type in 
+        ["image", "stylesheet", "font", "media"] else route.continue_()
+    )
+
+
+def _flight_key(query: str, max_pages: int) -> tuple:
+    """Key under which identical scrapes are coalesced: case and spacing of the query don't matter."""
+    return " ".join(query.lower().split()), max_pages
+
+
+def scrape_revolico(query: str, max_pages: int = 1, race: bool = None,
+                    deadline=None, budget_s: float = None) -> list[dict]:
+    """
+    Convenience function to scrape Revolico.
+    
+    Concurrent calls for the same query and page count (e.g. two users, or a
+    double-clicked button) share one scrape, see src.singleflight; the
+    first caller's deadline/budget_s bounds it.
+    """
+    def run():
+        return RevolicoScraper().scrape(query, max_pages, race=race, deadline=deadline, budget_s=budget_s)
+    return list(scrape_flight.do(_flight_key(query, max_pages), run))
+
+
+async def scrape_revolico_async(query: str, max_pages: int = 1, race: bool = None,
+                                deadline=None, budget_s: float = None) -> list[dict]:
+    """Convenience coroutine to scrape Revolico from async code (coalesced like scrape_revolico)."""
+    async def run():
+        return await RevolicoScraper().scrape_async(query, max_pages, race=race,
+                                                    deadline=deadline, budget_s=budget_s)
+    return list(await scrape_flight.do_async(_flight_key(query, max_pages), run))
 
 
 if __name__ == "__main__":
@@ -2,9 +2,19 @@
 import cloudscraper
 from bs4 import BeautifulSoup
 import re
-import time
-import random
 from logger import get_logger
+from src.challenge import ChallengeBlocked, read_body
+from src.cookie_vault import cookie_vault
+from src.deadline import Deadline
+from src.proxy_pool import proxy_pool
+from src.page_results import flatten_pages
+from src.pagination import Paginator
+from src.pipeline import PagePipeline
+from src.rate_limiter import rate_limiter
+from src.response_cache import response_cache
+from src.retry_policy import RetryBudget, check_status, retry_policy
+from src.session_pool import session_pool
+from src.transfer_stats import ACCEPT_ENCODING, transfer_stats
 import config
 
 logger = get_logger(__name__)
@@ -15,91 +25,137 @@ class CloudflareBypassScraper:
     
     def __init__(self):
         self.base_url = config.REVOLICO_SEARCH_URL
-        self.scraper = cloudscraper.create_scraper()
+        self.scraper = session_pool.get('cloudscraper', self.base_url)
+        self.paginator = Paginator()
+        self.retry_budget = RetryBudget()
+        self.deadline = Deadline()
+        self.pipeline_stats = {}  # fetch/parse overlap of the last scrape (see src.pipeline)
         
-    def scrape(self, query: str, max_pages: int = 1) -> list[dict]:
+    def scrape(self, query: str, max_pages: int = 1, budget_s: float = None) -> list[dict]:
         """
         Scrape Revolico listings bypassing Cloudflare.
         
+        Each page is parsed while the next one downloads (see PagePipeline).
+        
         Args:
             query: Search query
             max_pages: Maximum number of pages to scrape
+            budget_s: Seconds the scrape may take (see src.deadline)
             
         Returns:
-            List of listing dictionaries
+            List of listing dictionaries (those fetched in time)
         """
         logger.info(f"Starting Cloudflare-bypass scrape for: {query} ({max_pages} pages)")
+        if budget_s is not None:
+            self.deadline = Deadline(budget_s)
+            self.retry_budget = RetryBudget(deadline=self.deadline)
         
-        results = []
-        
-        for page_num in range(1, max_pages + 1):
-            logger.info(f"Scraping page {page_num}")
-            try:
-                page_results = self._scrape_page(query, page_num)
-                results.extend(page_results)
-                
-                if page_num < max_pages:
-                    # Random delay between pages
-                    delay = random.uniform(1, 3)
-                    logger.debug(f"Waiting {delay:.1f}s before next page")
-                    time.sleep(delay)
-                    
-            except Exception as e:
-                logger.error(f"Error scraping page {page_num}: {e}")
-                if page_num == 1:
-                    raise  # If first page fails, something is really wrong
-                continue
+        self.paginator = Paginator(query, response_cache)
+        pipeline = PagePipeline(self.paginator)
+        outcomes = pipeline.run(
+            range(1, max_pages + 1),
+            fetch=lambda page_num: retry_policy.call(self._fetch_page, query, page_num, budget=self.retry_budget),
+            parse=lambda page_num, page: self._parse_page(query, page_num, page),
+            # A failed first page or a challenge: every other page would fail too
+            stop=lambda page_num, error: page_num == 1 or isinstance(error, ChallengeBlocked)
+        )
+        self.pipeline_stats = pipeline.stats
+        results = flatten_pages(outcomes)
         
         logger.info(f"Completed scrape. Found {len(results)} listings")
         return results
     
     def _scrape_page(self, query: str, page_num: int) -> list[dict]:
         """Scrape a single page."""
+        return self._parse_page(query, page_num, self._fetch_page(query, page_num))
+    
+    def _fetch_page(self, query: str, page_num: int) -> tuple:
+        """
+        Network half of a page.
+        
+        Returns:
+            (html, cache entry) for _parse_page: html is None for a cache
+            hit and "" if the response is unusable
+        """
+        entry = response_cache.get(query, page_num)
+        if entry is not None:
+            return None, entry
+        
         url = f"{self.base_url}?q={query}"
         if page_num > 1:
             url += f"&page={page_num}"
         
+        rate_limiter.acquire(url, self.deadline)
         logger.debug(f"Fetching: {url}")
         
+        clearance = cookie_vault.clearance_headers(url)
+        
         try:
             # Use cloudscraper to get past Cloudflare
-            response = self.scraper.get(
+            with proxy_pool.lease(deadline=self.deadline) as lease, self.scraper.get(
                 url,
-                timeout=15,
+                timeout=self.deadline.timeout(15),
+                stream=True,
                 headers={
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-            )
-            
-            logger.debug(f"Response status: {response.status_code}")
+                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+                    'Accept-Encoding': ACCEPT_ENCODING,
+                    **clearance
+                },
+                proxies=lease.requests_proxies()
+            ) as response:
+                logger.debug(f"Response status: {response.status_code}")
+                lease.report_status(response.status_code)
+                cookie_vault.report_response(url, response.status_code, used_clearance=bool(clearance))
+                
+                # Abandons the download as soon as a challenge page shows
+                with transfer_stats.measure('cloudflare', url, response) as meter:
+                    body = read_body(
+                        meter.chunks(response.iter_content(chunk_size=8192)), url,
+                        response.status_code, used_clearance=bool(clearance)
+                    )
             
             if response.status_code != 200:
+                check_status(url, response.status_code, response.headers)
                 logger.warning(f"Page returned status {response.status_code}")
-                return []
-            
-            # Parse with BeautifulSoup
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find all listings
-            listings = self._find_listings_soup(soup)
-            logger.info(f"Found {len(listings)} listings on page {page_num}")
+                return "", None
             
-            results = []
-            for listing in listings:
-                try:
-                    item = self._extract_data_soup(listing)
-                    if item and item.get('titulo') and item.get('precio_raw'):
-                        results.append(item)
-                except Exception as e:
-                    logger.debug(f"Error extracting listing: {e}")
-                    continue
-            
-            return results
+            return body.decode(response.encoding or 'utf-8', errors='replace'), None
             
         except Exception as e:
             logger.error(f"Error fetching page: {e}")
             raise
     
+    def _parse_page(self, query: str, page_num: int, page: tuple) -> list[dict]:
+        """CPU half of a page: extract and cache the listings (see _fetch_page)."""
+        html, entry = page
+        if html is None:
+            self.paginator.observe(page_num, entry['listings'], entry.get('body', ""))
+            return entry['listings']
+        if not html:
+            return []
+        
+        # Parse with BeautifulSoup
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # Find all listings
+        listings = self._find_listings_soup(soup)
+        logger.info(f"Found {len(listings)} listings on page {page_num}")
+        
+        results = []
+        for listing in listings:
+            try:
+                item = self._extract_data_soup(listing)
+                if item and item.get('titulo') and item.get('precio_raw'):
+                    results.append(item)
+            except Exception as e:
+                logger.debug(f"Error extracting listing: {e}")
+                continue
+        
+        if results:
+            response_cache.put(query, page_num, results, body=html)
+        self.paginator.observe(page_num, results, html)
+        return results
+    
     def _find_listings_soup(self, soup):
         """Find listing elements using BeautifulSoup."""
         # Try different selectors
@@ -192,10 +248,10 @@ class CloudflareBypassScraper:
             return None
 
 
-def scrape_revolico_cloudflare(query: str, max_pages: int = 1) -> list[dict]:
+def scrape_revolico_cloudflare(query: str, max_pages: int = 1, budget_s: float = None) -> list[dict]:
     """Convenience function using Cloudflare bypass."""
     scraper = CloudflareBypassScraper()
-    return scraper.scrape(query, max_pages)
+    return scraper.scrape(query, max_pages, budget_s)
 
 
 if __name__ == "__main__":
@@ -1,117 +1,413 @@
 """Scraper using curl executable directly - ultimate bypass."""
+import math
+import shutil
 import subprocess
+import sys
+import tempfile
 import json
 import re
+from pathlib import Path
 from bs4 import BeautifulSoup
-import time
-import random
 from logger import get_logger
+from src.backend_stats import CHALLENGE, ERROR
+from src.challenge import ChallengeBlocked, check_challenge
+from src.cookie_vault import cookie_vault
+from src.deadline import Deadline, DeadlineExceeded
+from src.page_results import flatten_pages
+from src.pagination import Paginator
+from src.proxy_pool import proxy_pool
+from src.rate_limiter import rate_limiter
+from src.response_cache import conditional_headers, response_cache, validators_from
+from src.retry_policy import RetryBudget, check_status, retry_policy
+from src.transfer_stats import transfer_stats
 import config
 
 logger = get_logger(__name__)
 
 
+def curl_binary() -> str:
+    """Name/path of the curl executable for this platform."""
+    name = "curl.exe" if sys.platform == 'win32' else "curl"
+    return shutil.which(name) or name
+
+
+def _config_line(option: str, value=None) -> str:
+    """One line of a curl config file: a bare switch, or ``option = "value"`` quoted and escaped."""
+    if value is None:
+        return option
+    value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    value = value.replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    return f'{option} = "{value}"'
+
+
 class CurlDirectScraper:
     """Scraper using curl executable directly (not Python libs - can't be blocked)."""
     
-    def __init__(self):
+    HEADERS = [
+        "User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+        "Accept: text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language: en-US,en;q=0.5",
+        "DNT: 1",
+        "Connection: keep-alive",
+        "Upgrade-Insecure-Requests: 1",
+    ]
+    
+    def __init__(self, max_concurrency: int = None):
         self.base_url = config.REVOLICO_SEARCH_URL
-        
-    def scrape(self, query: str, max_pages: int = 1) -> list[dict]:
+        self.max_concurrency = max_concurrency or config.ASYNC_MAX_CONCURRENCY
+        self.curl_binary = curl_binary()
+        self.paginator = Paginator()
+        self.retry_budget = RetryBudget()
+        self.deadline = Deadline()
+    
+    def scrape(self, query: str, max_pages: int = 1, budget_s: float = None) -> list[dict]:
         """
         Scrape using native curl executable.
         
+        All pages missing from the cache are fetched by one curl process per
+        rate-limit burst (see _scrape_pages_curl).
+        
         Args:
             query: Search query
             max_pages: Maximum number of pages to scrape
-            
+            budget_s: Seconds the scrape may take (see src.deadline)
+        
         Returns:
-            List of listings
+            List of listings (those fetched in time)
         """
         logger.info(f"Starting curl-direct scrape for: {query} ({max_pages} pages)")
+        if budget_s is not None:
+            self.deadline = Deadline(budget_s)
+            self.retry_budget = RetryBudget(deadline=self.deadline)
         
-        results = []
-        
-        for page_num in range(1, max_pages + 1):
-            logger.info(f"Scraping page {page_num}")
-            try:
-                page_results = self._scrape_page_curl(query, page_num)
-                results.extend(page_results)
-                
-                if page_num < max_pages:
-                    delay = random.uniform(1, 2)
-                    logger.debug(f"Waiting {delay:.1f}s...")
-                    time.sleep(delay)
-                    
-            except Exception as e:
-                logger.error(f"Error on page {page_num}: {e}")
-                if page_num == 1:
-                    raise
-                continue
+        results = flatten_pages(self.scrape_pages(query, range(1, max_pages + 1)))
         
         logger.info(f"Found {len(results)} listings")
         return results
     
+    def scrape_pages(self, query: str, page_nums) -> dict:
+        """
+        Fetch the given pages (cache first, the rest with curl --parallel).
+        
+        Pages past the last one (see Paginator) are not requested; when the
+        page count is not known yet, page 1 is fetched on its own first.
+        Pages that failed transiently are fetched again in a smaller batch
+        (see _fetch).
+        
+        Returns:
+            {page_num: listings or the Exception that page failed with};
+            pages past the end of the results are left out
+        """
+        self.paginator = Paginator(query, response_cache)
+        page_nums = self.paginator.plan(page_nums)
+        
+        page_results = {}
+        stale_entries = {}
+        for page_num in page_nums:
+            entry = response_cache.get(query, page_num, include_stale=True)
+            if entry and not entry['stale']:
+                page_results[page_num] = entry['listings']
+                self.paginator.observe(page_num, entry['listings'], entry.get('body', ""))
+            elif entry:
+                stale_entries[page_num] = entry
+        
+        to_fetch = self.paginator.plan(n for n in page_nums if n not in page_results)
+        if to_fetch[:1] == [1] and len(to_fetch) > 1 and self.paginator.last_page is None:
+            page_results.update(self._fetch(query, [1], stale_entries))
+            to_fetch = self.paginator.plan(to_fetch[1:])
+        if to_fetch:
+            page_results.update(self._fetch(query, to_fetch, stale_entries))
+        return page_results
+    
+    def _fetch(self, query: str, page_nums: list[int], stale_entries: dict) -> dict:
+        """_scrape_pages_curl, re-running the pages that timed out or got a 429/5xx."""
+        return retry_policy.call_pages(
+            lambda pages: self._scrape_pages_curl(query, pages, stale_entries),
+            page_nums, budget=self.retry_budget
+        )
+    
     def _scrape_page_curl(self, query: str, page_num: int) -> list[dict]:
-        """Use curl executable directly."""
+        """Scrape a single page (cache first, then a one-URL curl batch)."""
+        entry = response_cache.get(query, page_num, include_stale=True)
+        if entry and not entry['stale']:
+            return entry['listings']
+        
+        stale_entries = {page_num: entry} if entry else {}
+        outcome = self._fetch(query, [page_num], stale_entries)[page_num]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    
+    def _page_url(self, query: str, page_num: int) -> str:
+        """Build the search URL for a results page."""
         url = f"{self.base_url}?q={query}"
         if page_num > 1:
             url += f"&page={page_num}"
+        return url
+    
+    def _scrape_pages_curl(self, query: str, page_nums: list[int], stale_entries: dict) -> dict:
+        """
+        Fetch several pages with curl, one batch per rate-limit burst.
         
-        logger.debug(f"Fetching with curl: {url}")
+        A batch fires its requests at once, so it holds no more pages than
+        the host's bucket lets through back to back, and its tokens are
+        taken right before it runs: the per-host pacing holds however many
+        pages are asked for. Pages a finished batch puts past the end of the
+        results are not requested (and left out); an error that ends a whole
+        batch is recorded for each of its pages.
         
-        try:
-            # Use curl executable directly with all anti-block headers
-            cmd = [
-                "curl.exe",
-                "-L",  # Follow redirects
-                "-s",  # Silent mode
-                "--compressed",  # Automatic decompression
-                "-H", "User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                "-H", "Accept: text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-                "-H", "Accept-Language: en-US,en;q=0.5",
-                "-H", "Accept-Encoding: gzip, deflate",
-                "-H", "DNT: 1",
-                "-H", "Connection: keep-alive",
-                "-H", "Upgrade-Insecure-Requests: 1",
-                "--max-time", "15",
-                url
+        Returns:
+            Dict mapping page number to its listings, or to the Exception
+            that page failed with
+        """
+        size = max(1, rate_limiter.bucket(self.base_url).burst)
+        page_results = {}
+        pending = list(page_nums)
+        while pending:
+            batch, pending = pending[:size], self.paginator.plan(pending[size:])
+            try:
+                page_results.update(self._run_batch(query, batch, stale_entries))
+            except Exception as e:
+                page_results.update({page_num: e for page_num in batch})
+        return page_results
+    
+    def _run_batch(self, query: str, page_nums: list[int], stale_entries: dict) -> dict:
+        """
+        Fetch several pages with one curl process using --parallel.
+        
+        Each URL is its own --next group (so it can carry its own conditional
+        headers) and writes its headers and body to separate temp files; the
+        transfers share curl's connection cache, so the TLS handshake is paid
+        once per host instead of once per page. The whole batch goes through
+        one proxy lease, and --parallel-max is capped at the slots it holds.
+        The options are passed as a config file on stdin (``--config -``),
+        not as arguments, so the proxy credentials and the clearance cookie
+        never show up in the process list.
+        Transfer and batch timeouts are capped at the time left; a batch the
+        deadline cuts off keeps the pages that completed, the others fail
+        with DeadlineExceeded.
+        
+        Args:
+            query: Search query
+            page_nums: Pages to download
+            stale_entries: Expired cache entries to revalidate, by page number
+        
+        Returns:
+            Dict mapping page number to its listings, or to the Exception
+            that page failed with
+        
+        Raises:
+            subprocess.TimeoutExpired: If the whole batch timed out
+            DeadlineExceeded: If no time is left to start it
+        """
+        urls = {page_num: self._page_url(query, page_num) for page_num in page_nums}
+        for url in urls.values():
+            rate_limiter.acquire(url, self.deadline)
+        clearance = cookie_vault.clearance_headers(self.base_url)
+        
+        logger.debug(f"Fetching {len(urls)} pages with one curl process")
+        
+        with proxy_pool.lease(requests=len(urls), deadline=self.deadline) as lease, \
+                tempfile.TemporaryDirectory(prefix="curl_batch_") as tmp_dir:
+            tmp = Path(tmp_dir)
+            parallel = min(self.max_concurrency, lease.slots)
+            max_time = self.deadline.timeout(15)
+            options = [
+                _config_line("parallel"),
+                _config_line("parallel-max", parallel),
+                _config_line("no-progress-meter"),  # keep stderr to the -w lines
             ]
+            for i, (page_num, url) in enumerate(urls.items()):
+                if i > 0:
+                    options.append(_config_line("next"))
+                options += [
+                    _config_line("location"),  # Follow redirects
+                    _config_line("silent"),
+                    # Advertise and decode every coding this curl build supports (br, zstd, gzip)
+                    _config_line("compressed"),
+                    _config_line("max-time", f"{max_time:.1f}"),
+                    _config_line("dump-header", tmp / f"{page_num}.headers"),
+                    _config_line("output", tmp / f"{page_num}.html"),
+                    # One line per transfer: which page, how it ended, bytes received. On
+                    # (unbuffered) stderr, so the lines survive a batch killed at the deadline
+                    _config_line("write-out",
+                                 f"%{{stderr}}{page_num}\t%{{exitcode}}\t%{{size_download}}\t%{{errormsg}}\n"),
+                ]
+                if lease.url:
+                    options.append(_config_line("proxy", lease.url))
+                headers = self.HEADERS
+                if 'User-Agent' in clearance:
+                    headers = [h for h in headers if not h.startswith('User-Agent:')]
+                for header in headers:
+                    options.append(_config_line("header", header))
+                extra = {**conditional_headers(stale_entries.get(page_num)), **clearance}
+                for name, value in extra.items():
+                    options.append(_config_line("header", f"{name}: {value}"))
+                options.append(_config_line("url", url))
             
-            # Execute curl with UTF-8 encoding
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=20,
-                encoding='utf-8',
-                errors='ignore'  # Ignore encoding errors
-            )
-            
-            if result.returncode != 0:
-                logger.error(f"curl error: {result.stderr}")
-                raise Exception(f"curl failed with code {result.returncode}")
-            
-            html = result.stdout
-            
-            if not html or len(html) < 1000:
-                logger.warning("Got empty or very small response")
-                return []
-            
-            logger.debug(f"Got {len(html)} bytes of HTML")
+            batches = math.ceil(len(urls) / parallel)
+            batch_timeout = self.deadline.timeout(20 * batches)
+            cut_off = False
+            try:
+                result = subprocess.run(
+                    [self.curl_binary, "--config", "-"],
+                    input="\n".join(options) + "\n",
+                    capture_output=True,
+                    text=True,
+                    timeout=batch_timeout,
+                    encoding='utf-8',
+                    errors='ignore'
+                )
+                output = result.stderr
+                # With --parallel the exit code only reflects one failed transfer;
+                # judge every page by its own header/body files instead.
+                if result.returncode != 0:
+                    logger.debug(f"curl exited with {result.returncode}: {result.stderr.strip()}")
+            except subprocess.TimeoutExpired as e:
+                if batch_timeout >= 20 * batches:
+                    logger.error("curl timeout")
+                    raise
+                logger.warning("curl batch cut off by the time budget")
+                cut_off = True
+                output = e.stderr or ""
+                if isinstance(output, bytes):
+                    output = output.decode('utf-8', errors='ignore')
             
-            # Parse with BeautifulSoup
-            return self._extract_listings(html)
+            transfer_errors, wire_sizes, unparsed = self._parse_write_out(output)
+            if unparsed:
+                # e.g. a curl too old for %{exitcode}/%{errormsg}: without the
+                # write-out only the header/body files can tell how a page went
+                logger.warning(f"curl write-out not understood ({unparsed[0]!r}); "
+                               f"judging the pages by their files")
+            page_results = {}
+            for page_num in page_nums:
+                try:
+                    if cut_off and page_num not in wire_sizes and (
+                            not unparsed or not (tmp / f"{page_num}.headers").exists()):
+                        raise DeadlineExceeded(f"Time budget ran out while curl was fetching page {page_num}")
+                    if page_num in transfer_errors:
+                        # curl's own message ("Could not resolve host", "timed out", ...)
+                        # is what retry_policy classifies the failure by
+                        raise Exception(f"curl transfer for page {page_num} failed: {transfer_errors[page_num]}")
+                    page_results[page_num] = self._read_page(
+                        query, page_num, tmp, stale_entries.get(page_num), bool(clearance),
+                        wire_sizes.get(page_num)
+                    )
+                except Exception as e:
+                    page_results[page_num] = e
             
-        except subprocess.TimeoutExpired:
-            logger.error("curl timeout")
-            raise
-        except Exception as e:
-            logger.error(f"curl execution failed: {e}")
-            raise
+            failures = [r for r in page_results.values()
+                        if isinstance(r, Exception) and not isinstance(r, DeadlineExceeded)]
+            if any(isinstance(r, ChallengeBlocked) for r in failures):
+                lease.mark(CHALLENGE)
+            elif failures and len(failures) == len(page_results):
+                lease.mark(ERROR)
+        
+        return page_results
+    
+    def _read_page(self, query: str, page_num: int, tmp: Path, entry: dict = None,
+                   used_clearance: bool = False, wire: int = None) -> list[dict]:
+        """Turn one transfer's header/body files into listings (``wire``: compressed body size)."""
+        header_file = tmp / f"{page_num}.headers"
+        body_file = tmp / f"{page_num}.html"
+        
+        if not header_file.exists():
+            raise Exception(f"curl transfer for page {page_num} failed")
+        
+        status, headers = self._parse_headers(header_file.read_text(encoding='utf-8', errors='ignore'))
+        logger.debug(f"Page {page_num} status: {status}")
+        
+        if status == 304 and entry:
+            self.paginator.observe(page_num, entry['listings'], entry.get('body', ""))
+            return response_cache.refresh(query, page_num, entry, validators_from(headers))
+        
+        cookie_vault.report_response(self.base_url, status, used_clearance=used_clearance)
+        
+        html = ""
+        if body_file.exists():
+            transfer_stats.record('curl-direct', self._page_url(query, page_num), wire,
+                                  body_file.stat().st_size, headers.get('content-encoding'))
+            with open(body_file, 'rb') as f:
+                # Look at the head of the body before decoding/parsing the rest
+                head = f.read(config.CHALLENGE_SNIFF_BYTES)
+                check_challenge(head, self.base_url, status, used_clearance)
+                html = (head + f.read()).decode('utf-8', errors='ignore')
+        
+        if status != 200:
+            check_status(self._page_url(query, page_num), status, headers)
+        if status != 200 or not html or len(html) < 1000:
+            logger.warning(f"Page {page_num}: status {status}, {len(html)} bytes")
+            return []
+        
+        logger.debug(f"Got {len(html)} bytes of HTML")
+        
+        # Parse with BeautifulSoup
+        listings = self._extract_listings(html)
+        if listings:
+            response_cache.put(query, page_num, listings, body=html,
+                               validators=validators_from(headers))
+        self.paginator.observe(page_num, listings, html)
+        return listings
+    
+    @staticmethod
+    def _parse_write_out(output: str) -> tuple:
+        """
+        Parse the -w lines of a batch.
+        
+        Returns:
+            ({page_num: curl error message} for the transfers that failed,
+            {page_num: body bytes received, before decompression},
+            [write-out lines that could not be parsed])
+        """
+        errors, sizes, unparsed = {}, {}, []
+        for line in output.splitlines():
+            parts = line.split("\t", 3)
+            if not parts[0].isdigit() or len(parts) == 1:
+                # curl's own messages; these two mean it could not expand a variable
+                if "%{" in line or "write-out variable" in line:
+                    unparsed.append(line)
+                continue
+            if len(parts) != 4 or not parts[1].isdigit() or not parts[2].isdigit():
+                unparsed.append(line)
+                continue
+            page_num = int(parts[0])
+            sizes[page_num] = int(parts[2])
+            if parts[1] != "0":
+                errors[page_num] = f"curl: ({parts[1]}) {parts[3]}"
+        return errors, sizes, unparsed
+    
+    @staticmethod
+    def _parse_headers(dump: str) -> tuple:
+        """
+        Parse a ``curl -D`` header dump.
+        
+        With -L every redirect hop writes its own header block; the last one
+        belongs to the body.
+        
+        Returns:
+            (status_code, headers dict with lower-case names)
+        """
+        status, headers = 0, {}
+        for line in dump.splitlines():
+            line = line.strip()
+            if line.startswith('HTTP/'):
+                try:
+                    status = int(line.split()[1])
+                except (IndexError, ValueError):
+                    status = 0
+                headers = {}
+            elif ':' in line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+        return status, headers
     
     def _extract_listings(self, html: str) -> list[dict]:
         """Extract listings from HTML."""
+        try:
+            check_challenge(html[:config.CHALLENGE_SNIFF_BYTES], self.base_url)
+        except ChallengeBlocked:
+            return []
+        
         soup = BeautifulSoup(html, 'html.parser')
         
         # Find listing links
@@ -177,10 +473,10 @@ class CurlDirectScraper:
         return None
 
 
-def scrape_revolico_curl(query: str, max_pages: int = 1) -> list[dict]:
+def scrape_revolico_curl(query: str, max_pages: int = 1, budget_s: float = None) -> list[dict]:
     """Curl-direct scraper."""
     scraper = CurlDirectScraper()
-    return scraper.scrape(query, max_pages)
+    return scraper.scrape(query, max_pages, budget_s)
 
 
 if __name__ == "__main__":
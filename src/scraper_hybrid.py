@@ -1,15 +1,25 @@
 """Hybrid scraper: User solves Cloudflare challenge manually, app scrapes automatically."""
-from playwright.sync_api import sync_playwright, Page
+from playwright.sync_api import Page
 from bs4 import BeautifulSoup
 import re
-import time
-import random
 from logger import get_logger
-from src.threading_wrapper import run_playwright_in_thread
+from src.browser_pool import interactive_browser_pool
+from src.browser_tabs import context_cleared, scrape_in_tabs
+from src.challenge import find_challenge_marker
+from src.cookie_vault import cookie_vault
+from src.deadline import Deadline, DeadlineExceeded
+from src.page_ready import wait_until_ready
+from src.pagination import Paginator
+from src.proxy_pool import proxy_pool
+from src.rate_limiter import rate_limiter
+from src.response_cache import response_cache
 import config
 
 logger = get_logger(__name__)
 
+# Elements that show the results have rendered
+LISTING_SELECTOR = 'a[href*="/anuncio/"], a[href*="/es/anuncio/"], article, [data-testid*="listing"]'
+
 
 class HybridInteractiveScraper:
     """
@@ -19,8 +29,10 @@ class HybridInteractiveScraper:
     
     def __init__(self):
         self.base_url = config.REVOLICO_SEARCH_URL
+        self.paginator = Paginator()
+        self.deadline = Deadline()
         
-    def scrape(self, query: str, max_pages: int = 1) -> list[dict]:
+    def scrape(self, query: str, max_pages: int = 1, budget_s: float = None) -> list[dict]:
         """
         Scrape with user interaction for Cloudflare challenge.
         
@@ -29,111 +41,177 @@ class HybridInteractiveScraper:
         Args:
             query: Search query
             max_pages: Maximum number of pages to scrape
-            
+            budget_s: Seconds the scrape may take, the user's time included;
+                waits are shortened to fit and the pages scraped by then
+                are returned (see src.deadline)
+        
         Returns:
             List of listings
         """
         logger.info(f"Starting HYBRID scrape for: {query} ({max_pages} pages)")
+        if budget_s is not None:
+            self.deadline = Deadline(budget_s)
         logger.info("Browser will open - please complete Cloudflare challenge if it appears")
         
-        # Run in thread to avoid asyncio conflicts on Windows+Python3.14
-        return run_playwright_in_thread(self._scrape_internal, query, max_pages)
+        # One proxy for the whole browser session (its duration is not a latency sample)
+        with proxy_pool.lease(timed=False, deadline=self.deadline) as lease:
+            context_options = {
+                'viewport': {'width': 1280, 'height': 720},
+                'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                'proxy': lease.playwright_proxy(),
+            }
+            # VISIBLE BROWSER - user can see and solve captcha. It stays open
+            # between scrapes, and so does a context the user already cleared.
+            return interactive_browser_pool.run(self._scrape_internal, query, max_pages,
+                                                context_options=context_options, deadline=self.deadline)
     
-    def _scrape_internal(self, query: str, max_pages: int) -> list[dict]:
-        """Internal scrape logic (runs in thread)."""
+    def _scrape_internal(self, context, query: str, max_pages: int) -> list[dict]:
+        """Internal scrape logic (runs on the interactive browser's worker thread)."""
         results = []
+        page = context.new_page()
         
-        with sync_playwright() as p:
-            # Launch with headless=False so user can see and interact
-            browser = p.chromium.launch(
-                headless=False,  # VISIBLE BROWSER - user can see and solve captcha
-                args=[
-                    "--disable-blink-features=AutomationControlled",
-                    "--disable-dev-shm-usage",
-                ]
-            )
-            
-            context = browser.new_context(
-                viewport={'width': 1280, 'height': 720},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            )
-            
-            page = context.new_page()
-            
-            for page_num in range(1, max_pages + 1):
-                logger.info(f"Scraping page {page_num}")
-                try:
-                    page_results = self._scrape_page_interactive(page, query, page_num)
-                    results.extend(page_results)
-                    
-                    if page_num < max_pages:
-                        time.sleep(random.uniform(2, 4))
-                        
-                except Exception as e:
-                    logger.error(f"Error on page {page_num}: {e}")
-                    if page_num == 1:
-                        raise
-                    continue
-            
-            browser.close()
+        self.paginator = Paginator(query, response_cache)
+        # Page 1 is where the user clears the challenge, for the whole context
+        logger.info("Scraping page 1")
+        cleared = False
+        try:
+            first = self._cached_page(query, 1)
+            if first is None:
+                first = self._scrape_page_interactive(page, query, 1)
+                cleared = bool(first)
+            results.extend(first)
+        except DeadlineExceeded as e:
+            logger.warning(f"Stopping before page 1: {e}")
+            page.close()
+            return results
+        
+        # The rest in tabs of the cleared context, several at a time.
+        # Otherwise one page at a time, each with its chance for the user
+        # to clear the challenge.
+        if cleared or context_cleared(context):
+            tabs = None
+            navigate = lambda tab, page_num: self._open_tab(tab, query, page_num)
+            harvest = lambda tab, page_num, url: self._harvest_tab(tab, query, page_num, url)
+        else:
+            tabs = 1
+            navigate = lambda tab, page_num: None
+            harvest = lambda tab, page_num, _: self._scrape_page_interactive(tab, query, page_num)
+        uncached = []
+        for page_num in range(2, max_pages + 1):
+            if not self.paginator.wants(page_num):
+                break
+            cached = self._cached_page(query, page_num)
+            if cached is None:
+                uncached.append(page_num)
+            else:
+                results.extend(cached)
+        outcomes = scrape_in_tabs(context, uncached, navigate, harvest, tabs=tabs,
+                                  paginator=self.paginator, deadline=self.deadline, first_tab=page)
+        for page_num in sorted(outcomes):
+            if isinstance(outcomes[page_num], DeadlineExceeded):
+                logger.warning(f"Stopping before page {page_num}: {outcomes[page_num]}")
+            elif isinstance(outcomes[page_num], Exception):
+                logger.error(f"Error on page {page_num}: {outcomes[page_num]}")
+            else:
+                results.extend(outcomes[page_num])
+        
+        page.close()
         
         logger.info(f"Found {len(results)} listings")
         return results
     
-    def _scrape_page_interactive(self, page: Page, query: str, page_num: int) -> list[dict]:
-        """Scrape a page with user interaction for Cloudflare."""
+    def _cached_page(self, query: str, page_num: int):
+        """The cached listings of a page (None if not cached)."""
+        entry = response_cache.get(query, page_num)
+        if entry is None:
+            return None
+        logger.info(f"Page {page_num} served from cache")
+        self.paginator.observe(page_num, entry['listings'], entry.get('body', ""))
+        return entry['listings']
+    
+    def _page_url(self, query: str, page_num: int) -> str:
         url = f"{self.base_url}?q={query}"
         if page_num > 1:
             url += f"&page={page_num}"
+        return url
+    
+    def _scrape_page_interactive(self, page: Page, query: str, page_num: int) -> list[dict]:
+        """Scrape a page with user interaction for Cloudflare."""
+        cached = self._cached_page(query, page_num)
+        if cached is not None:
+            return cached
         
+        url = self._page_url(query, page_num)
+
+        goto_timeout = self.deadline.timeout(60)
         logger.info(f"Navigating to {url}")
-        logger.info("Please complete Cloudflare challenge if it appears (you have 60 seconds)")
+        logger.info(f"Please complete Cloudflare challenge if it appears (you have {goto_timeout:.0f} seconds)")
         
         try:
             # Navigate and wait for page to load
-            page.goto(url, timeout=60000, wait_until="domcontentloaded")
+            rate_limiter.acquire(url, self.deadline)
+            page.goto(url, timeout=self.deadline.timeout(60) * 1000, wait_until="domcontentloaded")
             
-            # Wait for Cloudflare to be passed - look for listings to appear
-            logger.info("Waiting for content to load (up to 45 seconds)...")
-            
-            try:
-                # Wait for specific elements we're looking for
-                page.wait_for_selector(
-                    'a[href*="/anuncio/"], a[href*="/es/anuncio/"], article, [data-testid*="listing"]',
-                    timeout=45000
-                )
+            # Wait for Cloudflare to be passed and the listings to finish rendering
+            selector_timeout = self.deadline.timeout(45)
+            logger.info(f"Waiting for content to load (up to {selector_timeout:.0f} seconds)...")
+            if wait_until_ready(page, LISTING_SELECTOR, cap=selector_timeout, deadline=self.deadline)['ready']:
                 logger.info("Found listing elements!")
-            except:
+            else:
                 logger.warning("Timeout waiting for standard selectors - checking anyway")
             
-            # Give page extra time to fully render
-            import time
-            time.sleep(3)
-            
             # Get HTML
             html = page.content()
             
             # Check if still on Cloudflare
-            if 'Just a moment' in html or len(html) < 5000:
-                logger.warning("Still on Cloudflare or page too small - waiting 30 seconds...")
+            if find_challenge_marker(html[:config.CHALLENGE_SNIFF_BYTES]) or len(html) < 5000:
+                # Whatever is left of the budget, up to 30 seconds, for the user
+                wait = min(30, max(0.0, self.deadline.remaining() - config.DEADLINE_MIN_REQUEST))
+                logger.warning(f"Still on Cloudflare or page too small - waiting up to {wait:.0f} seconds...")
                 logger.info("Please complete the challenge manually in the browser window")
-                time.sleep(30)
+                # Over as soon as the challenge is cleared and the listings are in
+                wait_until_ready(page, LISTING_SELECTOR, cap=wait, deadline=self.deadline)
                 html = page.content()
             
-            return self._extract_listings(html)
-            
+            return self._keep_page(page, query, page_num, url, html)
+        
         except Exception as e:
             logger.error(f"Navigation error: {e}")
             raise
     
+    def _open_tab(self, page: Page, query: str, page_num: int) -> str:
+        """Start loading a later results page in a tab of the cleared context; returns the URL."""
+        url = self._page_url(query, page_num)
+        rate_limiter.acquire(url, self.deadline)
+        logger.info(f"Navigating to {url}")
+        page.goto(url, timeout=self.deadline.timeout(60) * 1000, wait_until="commit")
+        return url
+    
+    def _harvest_tab(self, page: Page, query: str, page_num: int, url: str) -> list[dict]:
+        """Wait for a tab opened by _open_tab and extract its listings (no user wait: page 1 cleared the challenge)."""
+        if not wait_until_ready(page, LISTING_SELECTOR, deadline=self.deadline)['ready']:
+            logger.warning(f"Timeout waiting for listings on page {page_num} - checking anyway")
+        return self._keep_page(page, query, page_num, url, page.content())
+    
+    def _keep_page(self, page: Page, query: str, page_num: int, url: str, html: str) -> list[dict]:
+        """Extract a loaded page's listings, cache them and tell the paginator."""
+        listings = self._extract_listings(html)
+        if listings:
+            response_cache.put(query, page_num, listings, body=html)
+            # Share the solved challenge with the cheap HTTP backends
+            cookie_vault.store(url, page.context.cookies(), page.evaluate("navigator.userAgent"))
+        # An empty page may be an unsolved challenge: only end on real markup
+        self.paginator.observe(page_num, listings, html if listings else None)
+        return listings
+    
     def _extract_listings(self, html: str) -> list[dict]:
         """Extract listings from HTML."""
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        if 'Just a moment' in html:
+        if find_challenge_marker(html[:config.CHALLENGE_SNIFF_BYTES]):
             logger.warning("Still on Cloudflare page - couldn't get real content")
             return []
         
+        soup = BeautifulSoup(html, 'html.parser')
+        
         # First, check what we actually have on the page
         logger.debug(f"HTML length: {len(html)}")
         
@@ -267,10 +345,10 @@ class HybridInteractiveScraper:
         return None
 
 
-def scrape_revolico_hybrid(query: str, max_pages: int = 1) -> list[dict]:
+def scrape_revolico_hybrid(query: str, max_pages: int = 1, budget_s: float = None) -> list[dict]:
     """Hybrid scraper with user interaction."""
     scraper = HybridInteractiveScraper()
-    return scraper.scrape(query, max_pages)
+    return scraper.scrape(query, max_pages, budget_s)
 
 
 if __name__ == "__main__":
@@ -1,11 +1,28 @@
 """Scraper using requests with proper gzip handling."""
-import requests
+import asyncio
+from collections import Counter
+import httpx
+try:
+    import h2  # enables http2=True in httpx
+except ImportError:
+    h2 = None
 from bs4 import BeautifulSoup
 import gzip
 import re
-import time
-import random
 from logger import get_logger
+from src.challenge import ChallengeBlocked, check_challenge, read_body, read_body_async
+from src.cookie_vault import cookie_vault
+from src.deadline import Deadline, DeadlineExceeded
+from src.page_results import flatten_pages
+from src.pagination import Paginator
+from src.pipeline import PagePipeline, PageTimer
+from src.proxy_pool import proxy_pool
+from src.rate_limiter import rate_limiter
+from src.response_cache import conditional_headers, response_cache, validators_from
+from src.retry_policy import RetryBudget, check_status, retry_policy
+from src.session_pool import session_pool
+from src.transfer_stats import ACCEPT_ENCODING, transfer_stats
+from src.threading_wrapper import run_on_shared_loop
 import config
 
 logger = get_logger(__name__)
@@ -14,98 +31,420 @@ logger = get_logger(__name__)
 class RequestsScraper:
     """Scraper using requests with proper encoding handling."""
     
-    def __init__(self):
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Accept-Encoding': ACCEPT_ENCODING,  # br/zstd when their decoders are installed
+        'DNT': '1',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Sec-Fetch-Dest': 'document',
+        'Sec-Fetch-Mode': 'navigate',
+        'Sec-Fetch-Site': 'none',
+        'Sec-Fetch-User': '?1',
+        'Cache-Control': 'max-age=0',
+    }
+    
+    def __init__(self, max_concurrency: int = None, http2: bool = False):
         self.base_url = config.REVOLICO_SEARCH_URL
-        # Create session with good headers
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Sec-Fetch-User': '?1',
-            'Cache-Control': 'max-age=0',
-        })
-        
-    def scrape(self, query: str, max_pages: int = 1) -> list[dict]:
-        """Scrape using requests."""
+        self.backend = 'http2' if http2 else 'requests'  # name for transfer_stats
+        if http2 and h2 is None:
+            logger.warning("h2 is not installed, the concurrent engine will use HTTP/1.1")
+        # HTTP/2 multiplexes every request over one connection, so more can be in flight
+        self.http2 = bool(http2 and h2 is not None)
+        self.max_concurrency = max_concurrency or (
+            config.HTTP2_MAX_STREAMS if self.http2 else config.ASYNC_MAX_CONCURRENCY
+        )
+        self.http_versions = Counter()  # responses by negotiated protocol
+        # Shared keep-alive session; headers are sent per request
+        self.session = session_pool.get('requests', self.base_url)
+        self.paginator = Paginator()
+        # Retries and time this scraper may spend; RevolicoScraper shares them across backends
+        self.retry_budget = RetryBudget()
+        self.deadline = Deadline()
+        self.pipeline_stats = {}  # fetch/parse overlap of the last scrape (see src.pipeline)
+        
+    def scrape(self, query: str, max_pages: int = 1, budget_s: float = None) -> list[dict]:
+        """
+        Scrape using requests, one page after another.
+        
+        Each page is parsed on a worker thread while the next one downloads
+        (see PagePipeline); a failed first page or a challenge ends the scrape.
+        With ``budget_s`` the scrape returns the pages it got within that
+        many seconds (see src.deadline).
+        """
         logger.info(f"Starting requests scrape for: {query} ({max_pages} pages)")
+        if budget_s is not None:
+            self.deadline = Deadline(budget_s)
+            self.retry_budget = RetryBudget(deadline=self.deadline)
         
-        results = []
+        self.paginator = Paginator(query, response_cache)
+        pipeline = PagePipeline(self.paginator)
+        outcomes = pipeline.run(
+            range(1, max_pages + 1),
+            fetch=lambda page_num: retry_policy.call(self._fetch_page, query, page_num, budget=self.retry_budget),
+            parse=lambda page_num, page: self._parse_page(query, page_num, page),
+            stop=lambda page_num, error: page_num == 1 or isinstance(error, ChallengeBlocked)
+        )
+        self.pipeline_stats = pipeline.stats
+        results = flatten_pages(outcomes)
         
-        for page_num in range(1, max_pages + 1):
-            logger.info(f"Scraping page {page_num}")
-            try:
-                page_results = self._scrape_page(query, page_num)
-                results.extend(page_results)
-                
-                if page_num < max_pages:
-                    delay = random.uniform(1, 2)
-                    logger.debug(f"Waiting {delay:.1f}s...")
-                    time.sleep(delay)
-                    
-            except Exception as e:
-                logger.error(f"Error on page {page_num}: {e}")
-                if page_num == 1:
-                    raise
-                continue
+        logger.info(f"Found {len(results)} listings")
+        return results
+    
+    def scrape_concurrent(self, query: str, max_pages: int = 1, budget_s: float = None) -> list[dict]:
+        """Blocking wrapper around scrape_async for synchronous callers."""
+        return run_on_shared_loop(self.scrape_async(query, max_pages, budget_s))
+    
+    async def scrape_async(self, query: str, max_pages: int = 1, budget_s: float = None) -> list[dict]:
+        """
+        Scrape all result pages concurrently using httpx.
+        
+        Args:
+            query: Search query
+            max_pages: Maximum number of pages to scrape
+            budget_s: Seconds the scrape may take; pages still downloading
+                then are given up (see src.deadline)
+            
+        Returns:
+            List of listing dictionaries
+        """
+        if budget_s is not None:
+            self.deadline = Deadline(budget_s)
+            self.retry_budget = RetryBudget(deadline=self.deadline)
+        outcomes = await self.scrape_pages_async(query, range(1, max_pages + 1))
+        results = flatten_pages(outcomes)
         
         logger.info(f"Found {len(results)} listings")
         return results
     
-    def _scrape_page(self, query: str, page_num: int) -> list[dict]:
-        """Scrape a single page."""
+    def scrape_pages(self, query: str, page_nums) -> dict:
+        """
+        Blocking wrapper around scrape_pages_async for synchronous callers.
+        
+        It runs on the shared event loop, so the pooled httpx clients (and
+        their warm connections) carry over from one search to the next.
+        """
+        return run_on_shared_loop(self.scrape_pages_async(query, page_nums))
+    
+    async def scrape_pages_async(self, query: str, page_nums) -> dict:
+        """
+        Fetch the given result pages concurrently.
+        
+        Every page is requested at once, with at most ``max_concurrency``
+        requests in flight. Pages are parsed on a worker thread in page order,
+        each as soon as it and the pages before it have arrived, while the
+        later ones are still downloading. Pages past the last one
+        (see Paginator) are not requested: when the page count is not known
+        yet, page 1 is fetched on its own first to discover it. Timeouts,
+        429s and 5xx are retried with backoff (see src.retry_policy).
+        
+        Args:
+            query: Search query
+            page_nums: Page numbers to fetch
+            
+        Returns:
+            {page_num: listings or the Exception that page failed with};
+            pages past the end of the results are left out
+        """
+        self.paginator = Paginator(query, response_cache)
+        page_nums = self.paginator.plan(page_nums)
+        logger.info(
+            f"Starting concurrent scrape for: {query} "
+            f"(pages {page_nums}, concurrency {self.max_concurrency})"
+        )
+        
+        page_results = {}
+        stale_entries = {}
+        for page_num in page_nums:
+            entry = response_cache.get(query, page_num, include_stale=True)
+            if entry and not entry['stale']:
+                page_results[page_num] = entry['listings']
+                self.paginator.observe(page_num, entry['listings'], entry.get('body', ""))
+            elif entry:
+                stale_entries[page_num] = entry
+        
+        to_fetch = self.paginator.plan(n for n in page_nums if n not in page_results)
+        timer = PageTimer()
+        client_for = self._client_for
+        if to_fetch[:1] == [1] and len(to_fetch) > 1 and self.paginator.last_page is None:
+            page_results.update(await self._fetch_pages_async(client_for, query, [1], stale_entries, timer))
+            to_fetch = self.paginator.plan(to_fetch[1:])
+        if to_fetch:
+            page_results.update(await self._fetch_pages_async(client_for, query, to_fetch, stale_entries, timer))
+        self.pipeline_stats = timer.summary()
+        
+        return page_results
+    
+    def fetch_details(self, urls) -> dict:
+        """Blocking wrapper around fetch_details_async for synchronous callers."""
+        return run_on_shared_loop(self.fetch_details_async(urls))
+    
+    async def fetch_details_async(self, urls) -> dict:
+        """
+        Download listing detail pages concurrently.
+        
+        They share the pooled clients (and, with HTTP/2, the single
+        connection) of the result pages, and go through the same pacing,
+        proxies and challenge checks.
+        
+        Args:
+            urls: Listing URLs (the 'url' of scraped listings)
+            
+        Returns:
+            {url: html ("" if unusable) or the Exception that URL failed with}
+        """
+        urls = list(dict.fromkeys(urls))
+        logger.info(f"Fetching {len(urls)} detail pages (concurrency {self.max_concurrency})")
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        pages = await asyncio.gather(
+            *(retry_policy.call_async(self._fetch_html_async, self._client_for, semaphore, url,
+                                      budget=self.retry_budget)
+              for url in urls),
+            return_exceptions=True
+        )
+        return {url: outcome if isinstance(outcome, Exception) else outcome[0]
+                for url, outcome in zip(urls, pages)}
+    
+    def _client_for(self, proxy_url: str, http2: bool = None) -> httpx.AsyncClient:
+        """
+        The pooled httpx client for ``proxy_url`` on the running event loop.
+        
+        httpx binds the proxy and protocol to the client, so there is one
+        client per (proxy, HTTP version); None means a direct connection and
+        the scraper's own HTTP version. With HTTP/2 every request through a
+        client is multiplexed over one connection per host. Clients live in
+        session_pool, so later calls on the same loop (see scrape_pages)
+        reuse their keep-alive connections; it closes them when idle.
+        """
+        http2 = self.http2 if http2 is None else http2
+        return session_pool.get_async(
+            'httpx', self.base_url,
+            lambda: httpx.AsyncClient(
+                headers=self.HEADERS,
+                timeout=15,
+                follow_redirects=True,
+                proxy=proxy_url,
+                http2=http2
+            ),
+            scope=(proxy_url, http2)
+        )
+    
+    async def _fetch_pages_async(self, client_for, query: str, page_nums: list[int], stale_entries: dict,
+                                 timer: PageTimer) -> dict:
+        """Download ``page_nums`` concurrently, parsing them in page order as they arrive."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def fetch(page_num):
+            with timer.fetching():
+                return await self._until_deadline(retry_policy.call_async(
+                    self._fetch_html_async, client_for, semaphore, self._page_url(query, page_num),
+                    stale_entries.get(page_num), budget=self.retry_budget
+                ))
+        
+        def parse(page_num, page):
+            with timer.parsing():
+                return self._parse_page(query, page_num, page)
+        
+        downloads = {page_num: asyncio.ensure_future(fetch(page_num)) for page_num in page_nums}
+        page_results = {}
+        try:
+            for page_num, download in downloads.items():
+                try:
+                    html, validators = await download
+                    page = (html, validators, stale_entries.get(page_num))
+                    page_results[page_num] = await asyncio.to_thread(parse, page_num, page)
+                except Exception as e:
+                    page_results[page_num] = e
+        finally:
+            for download in downloads.values():
+                download.cancel()
+        return page_results
+    
+    async def _until_deadline(self, download):
+        """Await ``download``, abandoning it with DeadlineExceeded when the deadline passes."""
+        if not self.deadline.bounded:
+            return await download
+        try:
+            return await asyncio.wait_for(download, self.deadline.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("Time budget ran out while downloading") from None
+    
+    async def _fetch_html_async(self, client_for, semaphore: asyncio.Semaphore,
+                                url: str, stale_entry: dict = None) -> tuple:
+        """
+        Download a single page.
+        
+        Sends conditional headers when a stale cache entry exists. The body is
+        streamed and abandoned as soon as its first bytes show a challenge.
+        The request goes through a proxy leased from proxy_pool; ``client_for``
+        returns the httpx client for that proxy. If an HTTP/2 connection
+        breaks at the protocol level, the request is retried once over
+        HTTP/1.1 and the scraper stays on HTTP/1.1 from then on.
+        
+        Returns:
+            (html, validators) - html is None on 304 Not Modified and "" if unusable
+            
+        Raises:
+            ChallengeBlocked: If the response is a Cloudflare challenge page
+            RetryableStatus: On 429 and 5xx (the callers retry through retry_policy)
+        """
+        clearance = cookie_vault.clearance_headers(url)
+        headers = {**conditional_headers(stale_entry), **clearance}
+        
+        async with semaphore:
+            await rate_limiter.acquire_async(url, self.deadline)
+            async with proxy_pool.lease_async(deadline=self.deadline) as lease:
+                try:
+                    response, body = await self._stream_async(client_for(lease.url), url, headers, lease,
+                                                              stale_entry, bool(clearance))
+                except httpx.ProtocolError as e:
+                    if not self.http2:
+                        raise
+                    logger.warning(f"HTTP/2 failed for {url} ({e}), falling back to HTTP/1.1")
+                    self.http2 = False
+                    response, body = await self._stream_async(client_for(lease.url, http2=False), url, headers,
+                                                              lease, stale_entry, bool(clearance))
+        
+        validators = validators_from(response.headers)
+        if body is None:
+            return None, validators
+        
+        if response.status_code != 200:
+            check_status(url, response.status_code, response.headers)
+            logger.warning(f"Status: {response.status_code}")
+            return "", {}
+        
+        html = body.decode(response.encoding or 'utf-8', errors='replace')
+        if not html or len(html) < 1000:
+            logger.warning(f"Small response: {len(html)} bytes")
+            return "", {}
+        
+        logger.debug(f"Got {len(html)} bytes of HTML from {url}")
+        return html, validators
+    
+    async def _stream_async(self, client: httpx.AsyncClient, url: str, headers: dict, lease,
+                            stale_entry: dict, used_clearance: bool) -> tuple:
+        """One GET; returns (response, body), body None on 304 Not Modified."""
+        logger.debug(f"Fetching: {url}")
+        async with client.stream('GET', url, headers=headers, timeout=self.deadline.timeout(15)) as response:
+            logger.debug(f"{url} status: {response.status_code} ({response.http_version})")
+            self.http_versions[response.http_version] += 1
+            lease.report_status(response.status_code)
+            cookie_vault.report_response(url, response.status_code, used_clearance=used_clearance)
+            
+            if response.status_code == 304 and stale_entry:
+                return response, None
+            
+            with transfer_stats.measure(self.backend, url, response) as meter:
+                body = await read_body_async(
+                    meter.achunks(response.aiter_bytes()), url, response.status_code,
+                    used_clearance=used_clearance
+                )
+        return response, body
+    
+    def _page_url(self, query: str, page_num: int) -> str:
+        """Build the search URL for a results page."""
         url = f"{self.base_url}?q={query}"
         if page_num > 1:
             url += f"&page={page_num}"
+        return url
+    
+    def _scrape_page(self, query: str, page_num: int) -> list[dict]:
+        """Scrape a single page."""
+        return self._parse_page(query, page_num, self._fetch_page(query, page_num))
+    
+    def _fetch_page(self, query: str, page_num: int) -> tuple:
+        """
+        Network half of a page: the cache lookup and the download.
+        
+        Returns:
+            (html, validators, cache entry) for _parse_page; html is None
+            when the cached entry is to be used (fresh, or 304 Not
+            Modified) and "" if the response is unusable
+        """
+        entry = response_cache.get(query, page_num, include_stale=True)
+        if entry and not entry['stale']:
+            return None, {}, entry
         
+        url = self._page_url(query, page_num)
+        
+        rate_limiter.acquire(url, self.deadline)
         logger.debug(f"Fetching: {url}")
+        clearance = cookie_vault.clearance_headers(url)
         
         try:
-            response = self.session.get(
+            with proxy_pool.lease(deadline=self.deadline) as lease, self.session.get(
                 url,
-                timeout=15,
+                headers={**self.HEADERS, **conditional_headers(entry), **clearance},
+                timeout=self.deadline.timeout(15),
                 verify=True,
-                allow_redirects=True
-            )
-            
-            logger.debug(f"Status: {response.status_code}")
+                allow_redirects=True,
+                stream=True,
+                proxies=lease.requests_proxies()
+            ) as response:
+                logger.debug(f"Status: {response.status_code}")
+                lease.report_status(response.status_code)
+                cookie_vault.report_response(url, response.status_code, used_clearance=bool(clearance))
+                
+                if response.status_code == 304 and entry:
+                    return None, validators_from(response.headers), entry
+                
+                # Stream the body (requests decompresses it) so a challenge
+                # page is dropped after its first few KB
+                with transfer_stats.measure(self.backend, url, response) as meter:
+                    body = read_body(
+                        meter.chunks(response.iter_content(chunk_size=8192)), url,
+                        response.status_code, used_clearance=bool(clearance)
+                    )
             
             if response.status_code != 200:
+                check_status(url, response.status_code, response.headers)
                 logger.warning(f"Status: {response.status_code}")
-                return []
+                return "", {}, entry
             
-            # Get HTML - requests automatically handles gzip
-            html = response.text
+            html = body.decode(response.encoding or 'utf-8', errors='replace')
             
             if not html or len(html) < 1000:
                 logger.warning(f"Small response: {len(html)} bytes")
-                return []
+                return "", {}, entry
             
             logger.debug(f"Got {len(html)} bytes of HTML")
-            
-            # Extract listings
-            return self._extract_listings(html)
+            return html, validators_from(response.headers), entry
             
         except Exception as e:
             logger.error(f"Request failed: {e}")
             raise
     
+    def _parse_page(self, query: str, page_num: int, page: tuple) -> list[dict]:
+        """CPU half of a page: reuse the cached listings, or extract and cache new ones (see _fetch_page)."""
+        html, validators, entry = page
+        if html is None:
+            self.paginator.observe(page_num, entry['listings'], entry.get('body', ""))
+            if entry['stale']:
+                # 304 Not Modified: reuse the listings parsed last time
+                return response_cache.refresh(query, page_num, entry, validators)
+            return entry['listings']
+        if not html:
+            return []
+        
+        listings = self._extract_listings(html)
+        if listings:
+            response_cache.put(query, page_num, listings, body=html, validators=validators)
+        self.paginator.observe(page_num, listings, html)
+        return listings
+    
     def _extract_listings(self, html: str) -> list[dict]:
         """Extract listings from HTML."""
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # Check if we got Cloudflare block
-        if 'Just a moment' in html or 'cf-challenge' in html:
-            logger.warning("Got Cloudflare challenge page")
+        # Check for a Cloudflare block before paying for a parse
+        try:
+            check_challenge(html[:config.CHALLENGE_SNIFF_BYTES], self.base_url)
+        except ChallengeBlocked:
             return []
         
+        soup = BeautifulSoup(html, 'html.parser')
+        
         # Find listings
         listings = []
         
@@ -185,10 +524,22 @@ class RequestsScraper:
         return None
 
 
-def scrape_revolico_requests(query: str, max_pages: int = 1) -> list[dict]:
-    """Requests-based scraper."""
+def scrape_revolico_requests(query: str, max_pages: int = 1, budget_s: float = None) -> list[dict]:
+    """Requests-based scraper (pages fetched concurrently)."""
+    scraper = RequestsScraper()
+    return scraper.scrape_concurrent(query, max_pages, budget_s)
+
+
+def scrape_revolico_http2(query: str, max_pages: int = 1, budget_s: float = None) -> list[dict]:
+    """httpx scraper with all pages multiplexed over one HTTP/2 connection."""
+    scraper = RequestsScraper(http2=True)
+    return scraper.scrape_concurrent(query, max_pages, budget_s)
+
+
+async def scrape_revolico_requests_async(query: str, max_pages: int = 1, budget_s: float = None) -> list[dict]:
+    """Async requests-based scraper for callers already inside an event loop."""
     scraper = RequestsScraper()
-    return scraper.scrape(query, max_pages)
+    return await scraper.scrape_async(query, max_pages, budget_s)
 
 
 if __name__ == "__main__":
@@ -1,11 +1,14 @@
 """Selenium-based scraper for Revolico (handles Cloudflare)."""
 import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import random
-import time
 from logger import get_logger
+from src.cookie_vault import cookie_vault
+from src.deadline import Deadline, DeadlineExceeded
+from src.page_ready import wait_until_ready_selenium
+from src.pagination import Paginator
+from src.proxy_pool import proxy_pool
+from src.rate_limiter import rate_limiter
+from src.response_cache import response_cache
 import config
 
 logger = get_logger(__name__)
@@ -17,19 +20,25 @@ class RevolicoSeleniumScraper:
     def __init__(self):
         self.base_url = config.REVOLICO_SEARCH_URL
         self.timeout = config.SCRAPER_TIMEOUT
-        
-    def scrape(self, query: str, max_pages: int = 1) -> list[dict]:
+        self.paginator = Paginator()
+        self.deadline = Deadline()
+    
+    def scrape(self, query: str, max_pages: int = 1, budget_s: float = None) -> list[dict]:
         """
         Scrape Revolico listings using Selenium.
         
         Args:
             query: Search query
             max_pages: Maximum number of pages to scrape
-            
+            budget_s: Seconds the scrape may take; the pages scraped by
+                then are returned (see src.deadline)
+        
         Returns:
             List of listing dictionaries
         """
         logger.info(f"Starting Selenium scrape for: {query} ({max_pages} pages)")
+        if budget_s is not None:
+            self.deadline = Deadline(budget_s)
         
         # Use undetected_chromedriver to bypass Cloudflare
         options = uc.ChromeOptions()
@@ -38,52 +47,61 @@ class RevolicoSeleniumScraper:
         options.add_argument("--disable-dev-shm-usage")
         options.add_argument("--disable-gpu")
         
-        driver = None
-        try:
-            driver = uc.Chrome(options=options, version_main=None)
-            results = []
+        # One proxy for the whole browser session (its duration is not a latency sample)
+        with proxy_pool.lease(timed=False, deadline=self.deadline) as lease:
+            if lease.url:
+                options.add_argument(lease.chrome_argument())
             
-            for page_num in range(1, max_pages + 1):
-                logger.info(f"Scraping page {page_num}")
-                page_results = self._scrape_page(driver, query, page_num)
-                results.extend(page_results)
+            driver = None
+            try:
+                driver = uc.Chrome(options=options, version_main=None)
+                results = []
+                self.paginator = Paginator(query, response_cache)
                 
-                if page_num < max_pages:
-                    time.sleep(random.uniform(2, 4))
-            
-            return results
-            
-        except Exception as e:
-            logger.error(f"Selenium scraping error: {e}", exc_info=True)
-            raise
-        finally:
-            if driver:
-                driver.quit()
+                for page_num in range(1, max_pages + 1):
+                    if not self.paginator.wants(page_num):
+                        break
+                    if self.deadline.expired():
+                        logger.warning(f"Time budget exhausted: stopping before page {page_num}")
+                        break
+                    logger.info(f"Scraping page {page_num}")
+                    page_results = self._scrape_page(driver, query, page_num)
+                    results.extend(page_results)
+                
+                return results
+                
+            except Exception as e:
+                logger.error(f"Selenium scraping error: {e}", exc_info=True)
+                raise
+            finally:
+                if driver:
+                    driver.quit()
     
     def _scrape_page(self, driver, query: str, page_num: int) -> list[dict]:
         """Scrape a single page."""
+        entry = response_cache.get(query, page_num)
+        if entry is not None:
+            self.paginator.observe(page_num, entry['listings'], entry.get('body', ""))
+            return entry['listings']
+        
         url = f"{self.base_url}?q={query}"
         if page_num > 1:
             url += f"&page={page_num}"
         
         try:
+            rate_limiter.acquire(url, self.deadline)
             logger.debug(f"Loading {url}")
+            driver.set_page_load_timeout(self.deadline.timeout(self.timeout / 1000))
             driver.get(url)
             
-            # Wait for listings to load
-            wait = WebDriverWait(driver, 15)
-            
-            # Try to wait for common elements
-            try:
-                wait.until(EC.presence_of_all_elements_located(
-                    (By.CSS_SELECTOR, "a[href*='/anuncio/'], article, div[class*='card']")
-                ))
-                logger.debug("Listings loaded")
-            except:
+            # Wait for listings to load (until they stop changing)
+            ready = wait_until_ready_selenium(driver, "a[href*='/anuncio/'], article, div[class*='card']",
+                                              cap=15, deadline=self.deadline)
+            if ready['ready']:
+                logger.debug(f"Listings loaded in {ready['waited']:.1f}s")
+            else:
                 logger.warning("Timeout waiting for listings")
             
-            time.sleep(random.uniform(1, 3))
-            
             # Get listings
             listings = self._find_listings(driver)
             logger.info(f"Found {len(listings)} listings on page {page_num}")
@@ -98,8 +116,20 @@ class RevolicoSeleniumScraper:
                     logger.debug(f"Error extracting listing: {e}")
                     continue
             
+            if results:
+                html = driver.page_source
+                response_cache.put(query, page_num, results, body=html)
+                # Share the solved challenge with the cheap HTTP backends
+                cookie_vault.store(url, driver.get_cookies(), driver.execute_script("return navigator.userAgent"))
+                self.paginator.observe(page_num, results, html)
+            else:
+                # An empty browser page may still be a challenge: don't end on it
+                self.paginator.observe(page_num, results)
             return results
             
+        except DeadlineExceeded as e:
+            logger.warning(f"Page {page_num} not scraped: {e}")
+            return []
         except Exception as e:
             logger.error(f"Error scraping page {page_num}: {e}")
             return []
@@ -182,10 +212,10 @@ class RevolicoSeleniumScraper:
             return None
 
 
-def scrape_revolico_selenium(query: str, max_pages: int = 1) -> list[dict]:
+def scrape_revolico_selenium(query: str, max_pages: int = 1, budget_s: float = None) -> list[dict]:
     """Convenience function using Selenium."""
     scraper = RevolicoSeleniumScraper()
-    return scraper.scrape(query, max_pages)
+    return scraper.scrape(query, max_pages, budget_s)
 
 
 if __name__ == "__main__":
@@ -4,12 +4,21 @@ try:
 except ImportError:
     curl_requests = None
 
-import requests
 from bs4 import BeautifulSoup
 import re
-import time
-import random
 from logger import get_logger
+from src.challenge import ChallengeBlocked, check_challenge, read_body
+from src.cookie_vault import cookie_vault
+from src.deadline import Deadline, DeadlineExceeded
+from src.page_results import flatten_pages
+from src.pagination import Paginator
+from src.pipeline import PagePipeline
+from src.proxy_pool import proxy_pool
+from src.rate_limiter import rate_limiter
+from src.response_cache import conditional_headers, response_cache, validators_from
+from src.retry_policy import RetryBudget, check_status, retry_policy
+from src.session_pool import session_pool
+from src.transfer_stats import ACCEPT_ENCODING, transfer_stats
 import config
 
 logger = get_logger(__name__)
@@ -20,144 +29,277 @@ class UltraPotentScraper:
     
     def __init__(self):
         self.base_url = config.REVOLICO_SEARCH_URL
-        
-    def scrape(self, query: str, max_pages: int = 1) -> list[dict]:
+        self.paginator = Paginator()
+        self.retry_budget = RetryBudget()
+        self.deadline = Deadline()
+        self.pipeline_stats = {}  # fetch/parse overlap of the last scrape (see src.pipeline)
+    
+    def scrape(self, query: str, max_pages: int = 1, budget_s: float = None) -> list[dict]:
         """
         Scrape Revolico listings using curl-cffi (ultimate Cloudflare bypass).
         
         Args:
             query: Search query
             max_pages: Maximum number of pages to scrape
-            
+            budget_s: Seconds the scrape may take (see src.deadline)
+        
         Returns:
-            List of listing dictionaries
+            List of listing dictionaries (those fetched in time)
         """
         logger.info(f"Starting ultra-potent scrape for: {query} ({max_pages} pages)")
+        if budget_s is not None:
+            self.deadline = Deadline(budget_s)
+            self.retry_budget = RetryBudget(deadline=self.deadline)
         
         if not curl_requests:
             logger.warning("curl-cffi not available, falling back to requests")
             return self._scrape_with_requests(query, max_pages)
         
-        results = []
-        
-        for page_num in range(1, max_pages + 1):
-            logger.info(f"Scraping page {page_num} with curl-cffi")
-            try:
-                page_results = self._scrape_page_curl(query, page_num)
-                results.extend(page_results)
-                
-                if page_num < max_pages:
-                    delay = random.uniform(1, 3)
-                    logger.debug(f"Waiting {delay:.1f}s...")
-                    time.sleep(delay)
-                    
-            except Exception as e:
-                logger.error(f"curl-cffi failed on page {page_num}: {e}")
-                logger.info("Falling back to cloudscraper...")
-                try:
-                    import cloudscraper
-                    scraper = cloudscraper.create_scraper()
-                    page_results = self._scrape_page_cloudscraper(scraper, query, page_num)
-                    results.extend(page_results)
-                except Exception as e2:
-                    logger.error(f"Cloudscraper also failed: {e2}")
-                    if page_num == 1:
-                        raise
-                    continue
+        results = flatten_pages(self.scrape_pages(query, range(1, max_pages + 1)))
         
         logger.info(f"Found {len(results)} listings total")
         return results
     
-    def _scrape_page_curl(self, query: str, page_num: int) -> list[dict]:
-        """Scrape using curl-cffi."""
+    def scrape_pages(self, query: str, page_nums) -> dict:
+        """
+        Fetch the given pages, each with curl-cffi and then cloudscraper.
+        
+        Transient failures are retried on the same client first (see
+        src.retry_policy). Each page is parsed while the next one downloads
+        (see PagePipeline). Stops at the first page on which both clients
+        get a challenge: the pages after it would be challenged too.
+        
+        Returns:
+            {page_num: listings or the Exception that page failed with};
+            pages past the end of the results (see Paginator) are left out
+        """
+        if not curl_requests:
+            return self._scrape_with_requests_pages(query, page_nums)
+        
+        self.paginator = Paginator(query, response_cache)
+        pipeline = PagePipeline(self.paginator)
+        page_results = pipeline.run(
+            page_nums,
+            fetch=lambda page_num: self._fetch_page(query, page_num),
+            parse=lambda page_num, page: self._parse_page(query, page_num, page)
+        )
+        self.pipeline_stats = pipeline.stats
+        return page_results
+    
+    def _fetch_page(self, query: str, page_num: int) -> tuple:
+        """Network half of a page: the cache, else curl-cffi, else cloudscraper (see _parse_page)."""
+        entry = response_cache.get(query, page_num, include_stale=True)
+        if entry and not entry['stale']:
+            logger.info(f"Page {page_num} served from cache")
+            return None, {}, entry
+        
+        logger.info(f"Scraping page {page_num} with curl-cffi")
+        try:
+            return retry_policy.call(self._fetch_page_curl, query, page_num, entry, budget=self.retry_budget)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"curl-cffi failed on page {page_num}: {e}")
+            logger.info("Falling back to cloudscraper...")
+        
+        try:
+            scraper = session_pool.get('cloudscraper', self.base_url)
+            return retry_policy.call(
+                self._fetch_page_cloudscraper, scraper, query, page_num, entry, budget=self.retry_budget
+            )
+        except Exception as e2:
+            logger.error(f"Cloudscraper also failed: {e2}")
+            raise
+    
+    def _fetch_page_curl(self, query: str, page_num: int, entry: dict = None) -> tuple:
+        """Download using curl-cffi (conditional request if ``entry`` is a stale cache entry)."""
         url = f"{self.base_url}?q={query}"
         if page_num > 1:
             url += f"&page={page_num}"
         
+        rate_limiter.acquire(url, self.deadline)
         logger.debug(f"Fetching {url}")
         
+        clearance = cookie_vault.clearance_headers(url)
+        
         try:
             # curl-cffi with browser simulation
-            response = curl_requests.get(
-                url,
-                impersonate="chrome120",  # Impersonate Chrome 120
-                timeout=15,
-                headers={
-                    'Accept-Language': 'en-US,en;q=0.9',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'DNT': '1',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1'
-                }
-            )
-            
-            logger.debug(f"Response status: {response.status_code}")
-            
-            if response.status_code not in [200, 403]:
-                logger.warning(f"Unexpected status: {response.status_code}")
-                return []
-            
-            return self._extract_listings(response.text)
-            
+            session = session_pool.get('curl_cffi', url)
+            with proxy_pool.lease(deadline=self.deadline) as lease:
+                response = session.get(
+                    url,
+                    impersonate="chrome120",  # Impersonate Chrome 120
+                    timeout=self.deadline.timeout(15),
+                    stream=True,
+                    headers={
+                        'Accept-Language': 'en-US,en;q=0.9',
+                        # Accept-Encoding is left to the impersonated browser
+                        'DNT': '1',
+                        'Connection': 'keep-alive',
+                        'Upgrade-Insecure-Requests': '1',
+                        **conditional_headers(entry),
+                        **clearance
+                    },
+                    proxies=lease.requests_proxies()
+                )
+                
+                logger.debug(f"Response status: {response.status_code}")
+                lease.report_status(response.status_code)
+                cookie_vault.report_response(url, response.status_code, used_clearance=bool(clearance))
+                
+                if response.status_code == 304 and entry:
+                    response.close()
+                    return None, validators_from(response.headers), entry
+                
+                if response.status_code not in [200, 403]:
+                    response.close()
+                    check_status(url, response.status_code, response.headers)
+                    logger.warning(f"Unexpected status: {response.status_code}")
+                    return "", {}, entry
+                
+                return self._read_page(response, url, entry, bool(clearance))
+        
         except Exception as e:
             logger.error(f"curl-cffi request failed: {e}")
             raise
     
-    def _scrape_page_cloudscraper(self, scraper, query: str, page_num: int) -> list[dict]:
-        """Scrape using cloudscraper as fallback."""
+    def _fetch_page_cloudscraper(self, scraper, query: str, page_num: int, entry: dict = None) -> tuple:
+        """Download using cloudscraper as fallback."""
         url = f"{self.base_url}?q={query}"
         if page_num > 1:
             url += f"&page={page_num}"
         
-        response = scraper.get(url, timeout=15)
-        
-        if response.status_code != 200:
-            logger.warning(f"Cloudscraper status: {response.status_code}")
-            return []
-        
-        return self._extract_listings(response.text)
+        clearance = cookie_vault.clearance_headers(url)
+        rate_limiter.acquire(url, self.deadline)
+        with proxy_pool.lease(deadline=self.deadline) as lease:
+            headers = {'Accept-Encoding': ACCEPT_ENCODING, **conditional_headers(entry), **clearance}
+            response = scraper.get(url, timeout=self.deadline.timeout(15), stream=True, headers=headers,
+                                   proxies=lease.requests_proxies())
+            lease.report_status(response.status_code)
+            cookie_vault.report_response(url, response.status_code, used_clearance=bool(clearance))
+            
+            if response.status_code == 304 and entry:
+                response.close()
+                return None, validators_from(response.headers), entry
+            
+            if response.status_code != 200:
+                response.close()
+                check_status(url, response.status_code, response.headers)
+                logger.warning(f"Cloudscraper status: {response.status_code}")
+                return "", {}, entry
+            
+            return self._read_page(response, url, entry, bool(clearance))
     
     def _scrape_with_requests(self, query: str, max_pages: int) -> list[dict]:
         """Fallback to regular requests with good headers."""
+        return flatten_pages(self._scrape_with_requests_pages(query, range(1, max_pages + 1)))
+    
+    def _scrape_with_requests_pages(self, query: str, page_nums) -> dict:
+        """Per-page form of _scrape_with_requests (see scrape_pages)."""
         logger.info("Using standard requests with enhanced headers")
         
-        results = []
+        def fetch(page_num):
+            entry = response_cache.get(query, page_num, include_stale=True)
+            if entry and not entry['stale']:
+                return None, {}, entry
+            return retry_policy.call(self._fetch_page_requests, query, page_num, entry, budget=self.retry_budget)
         
-        for page_num in range(1, max_pages + 1):
-            url = f"{self.base_url}?q={query}"
-            if page_num > 1:
-                url += f"&page={page_num}"
-            
-            try:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.5',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'DNT': '1',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1',
-                    'Sec-Fetch-Dest': 'document',
-                    'Sec-Fetch-Mode': 'navigate',
-                    'Sec-Fetch-Site': 'none',
-                }
-                
-                response = requests.get(url, headers=headers, timeout=15)
-                results.extend(self._extract_listings(response.text))
-                
-                if page_num < max_pages:
-                    time.sleep(random.uniform(1, 2))
-                    
-            except Exception as e:
-                logger.error(f"Request page {page_num} failed: {e}")
-                if page_num == 1:
-                    raise
-                continue
+        self.paginator = Paginator(query, response_cache)
+        pipeline = PagePipeline(self.paginator)
+        page_results = pipeline.run(
+            page_nums,
+            fetch=fetch,
+            parse=lambda page_num, page: self._parse_page(query, page_num, page)
+        )
+        self.pipeline_stats = pipeline.stats
+        return page_results
+    
+    def _fetch_page_requests(self, query: str, page_num: int, entry: dict = None) -> tuple:
+        """Download using plain requests (conditional request if ``entry`` is a stale cache entry)."""
+        url = f"{self.base_url}?q={query}"
+        if page_num > 1:
+            url += f"&page={page_num}"
         
-        return results
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.5',
+            'Accept-Encoding': ACCEPT_ENCODING,
+            'DNT': '1',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1',
+            'Sec-Fetch-Dest': 'document',
+            'Sec-Fetch-Mode': 'navigate',
+            'Sec-Fetch-Site': 'none',
+            **conditional_headers(entry)
+        }
+        clearance = cookie_vault.clearance_headers(url)
+        headers.update(clearance)
+        
+        session = session_pool.get('requests', url)
+        rate_limiter.acquire(url, self.deadline)
+        with proxy_pool.lease(deadline=self.deadline) as lease:
+            response = session.get(url, headers=headers, timeout=self.deadline.timeout(15), stream=True,
+                                   proxies=lease.requests_proxies())
+            lease.report_status(response.status_code)
+            cookie_vault.report_response(url, response.status_code, used_clearance=bool(clearance))
+            if response.status_code == 304 and entry:
+                response.close()
+                return None, validators_from(response.headers), entry
+            return self._read_page(response, url, entry, bool(clearance))
+    
+    def _read_page(self, response, url: str, entry: dict = None, used_clearance: bool = False) -> tuple:
+        """
+        Read a streamed response into (html, validators, cache entry) for _parse_page.
+        
+        html is "" for a non-200 response.
+        
+        Raises:
+            ChallengeBlocked: If the body starts like a challenge page (the
+                rest is not downloaded)
+            RetryableStatus: On 429 and 5xx
+        """
+        try:
+            with transfer_stats.measure('ultimate', url, response) as meter:
+                body = read_body(meter.chunks(response.iter_content(chunk_size=8192)), url,
+                                 response.status_code, used_clearance)
+        finally:
+            response.close()
+        check_status(url, response.status_code, response.headers)
+        if response.status_code != 200:
+            return "", {}, entry
+        html = body.decode(response.encoding or 'utf-8', errors='replace')
+        return html, validators_from(response.headers), entry
+    
+    def _parse_page(self, query: str, page_num: int, page: tuple) -> list[dict]:
+        """
+        CPU half of a page: extract listings and store them in the shared response cache.
+        
+        ``page`` is (html, validators, cache entry); html None means the
+        entry is to be reused (fresh, or refreshed after a 304 Not Modified).
+        """
+        html, validators, entry = page
+        if html is None:
+            self.paginator.observe(page_num, entry['listings'], entry.get('body', ""))
+            if entry['stale']:
+                return response_cache.refresh(query, page_num, entry, validators)
+            return entry['listings']
+        if not html:
+            return []
+        
+        listings = self._extract_listings(html)
+        if listings:
+            response_cache.put(query, page_num, listings, body=html, validators=validators)
+        self.paginator.observe(page_num, listings, html)
+        return listings
     
     def _extract_listings(self, html: str) -> list[dict]:
         """Extract listings from HTML."""
+        try:
+            check_challenge(html[:config.CHALLENGE_SNIFF_BYTES], self.base_url)
+        except ChallengeBlocked:
+            return []
+        
         soup = BeautifulSoup(html, 'html.parser')
         
         # Find listings
@@ -233,10 +375,10 @@ class UltraPotentScraper:
         return None
 
 
-def scrape_revolico_ultimate(query: str, max_pages: int = 1) -> list[dict]:
+def scrape_revolico_ultimate(query: str, max_pages: int = 1, budget_s: float = None) -> list[dict]:
     """Ultimate Cloudflare bypass scraper."""
     scraper = UltraPotentScraper()
-    return scraper.scrape(query, max_pages)
+    return scraper.scrape(query, max_pages, budget_s)
 
 
 if __name__ == "__main__":
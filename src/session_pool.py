@@ -0,0 +1,173 @@
+"""Process-wide registry of keep-alive HTTP sessions shared by every backend."""
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+from logger import get_logger
+import config
+
+logger = get_logger(__name__)
+
+
+def _create_requests_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=config.SESSION_POOL_MAXSIZE,
+        pool_maxsize=config.SESSION_POOL_MAXSIZE
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _create_cloudscraper_session():
+    import cloudscraper
+    return cloudscraper.create_scraper()
+
+
+def _create_curl_cffi_session():
+    from curl_cffi import requests as curl_requests
+    return curl_requests.Session(impersonate="chrome120")
+
+
+SESSION_FACTORIES = {
+    'requests': _create_requests_session,
+    'cloudscraper': _create_cloudscraper_session,
+    'curl_cffi': _create_curl_cffi_session,
+}
+
+
+class SessionPool:
+    """
+    Long-lived sessions keyed by (backend, host).
+    
+    Sessions are created lazily, reused across scraper instances (and
+    Streamlit reruns, since the module stays imported), closed after
+    ``idle_ttl`` seconds without use, and capped at ``max_sessions`` with the
+    least recently used session evicted first. Asyncio clients (see
+    get_async) are pooled the same way, keyed by their event loop as well.
+    """
+    
+    def __init__(self, idle_ttl: float = None, max_sessions: int = None):
+        self.idle_ttl = idle_ttl if idle_ttl is not None else config.SESSION_IDLE_TTL
+        self.max_sessions = max_sessions or config.SESSION_POOL_MAX_SESSIONS
+        self._sessions: dict[tuple, list] = {}  # key -> [session, last_used]
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+    
+    def get(self, backend: str, url: str):
+        """
+        Return the pooled session for a backend and the host of ``url``.
+        
+        Args:
+            backend: One of SESSION_FACTORIES ('requests', 'cloudscraper', 'curl_cffi')
+            url: Any URL (or bare host) on the target site
+        
+        Returns:
+            A session object for that backend
+        """
+        if backend not in SESSION_FACTORIES:
+            raise ValueError(f"Unknown session backend: {backend}")
+        return self._get((backend, urlparse(url).netloc or url), SESSION_FACTORIES[backend])
+    
+    def get_async(self, backend: str, url: str, factory, scope: tuple = ()):
+        """
+        Return the pooled asyncio client (e.g. an httpx.AsyncClient) for the running event loop.
+        
+        Such a client belongs to the loop it is first used on, so the loop is
+        part of the key; ``scope`` adds whatever else the client is bound to
+        (e.g. its proxy and HTTP version). It is closed on its own loop, and
+        dropped once that loop is closed - reusing it across calls takes a
+        loop that outlives them (see threading_wrapper.run_on_shared_loop).
+        
+        Args:
+            backend: Name of the backend the client is for
+            url: Any URL (or bare host) on the target site
+            factory: Creates the client
+            scope: Further key parts
+        """
+        key = (backend, urlparse(url).netloc or url, asyncio.get_running_loop(), *scope)
+        return self._get(key, factory)
+    
+    def _get(self, key: tuple, factory):
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._sessions.get(key)
+            if entry:
+                entry[1] = now
+                self.reused += 1
+                return entry[0]
+            
+            if len(self._sessions) >= self.max_sessions:
+                oldest = min(self._sessions, key=lambda k: self._sessions[k][1])
+                logger.debug(f"Session pool full, evicting {oldest[:2]}")
+                self._close(oldest, self._sessions.pop(oldest)[0])
+            
+            session = factory()
+            self._sessions[key] = [session, now]
+            self.created += 1
+            logger.debug(f"Created pooled {key[0]} session for {key[1]}")
+            return session
+    
+    def discard(self, backend: str, url: str):
+        """Drop a session (e.g. after it was blocked) so the next get() starts fresh."""
+        key = (backend, urlparse(url).netloc or url)
+        with self._lock:
+            entry = self._sessions.pop(key, None)
+        if entry:
+            self._close(key, entry[0])
+    
+    def close_all(self):
+        """Close every pooled session."""
+        with self._lock:
+            sessions = [(key, entry[0]) for key, entry in self._sessions.items()]
+            self._sessions.clear()
+        for key, session in sessions:
+            self._close(key, session)
+    
+    def stats(self) -> dict:
+        """Snapshot of pool usage for logging or health checks."""
+        with self._lock:
+            return {
+                'open': len(self._sessions),
+                'created': self.created,
+                'reused': self.reused,
+                'keys': [f"{key[0]}:{key[1]}" for key in self._sessions],
+            }
+    
+    def _evict_idle(self, now: float):
+        """Close sessions unused for longer than idle_ttl, or whose event loop is gone (caller holds the lock)."""
+        expired = [k for k, (_, last_used) in self._sessions.items()
+                   if now - last_used > self.idle_ttl or (len(k) > 2 and k[2].is_closed())]
+        for key in expired:
+            logger.debug(f"Closing idle session {key[:2]}")
+            self._close(key, self._sessions.pop(key)[0])
+    
+    @staticmethod
+    def _close(key: tuple, session):
+        try:
+            if len(key) == 2:
+                session.close()
+                return
+            loop = key[2]
+            if loop.is_closed():
+                return  # no loop left to close it on
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is loop:
+                loop.create_task(session.aclose())
+            else:
+                asyncio.run_coroutine_threadsafe(session.aclose(), loop)
+        except Exception as e:
+            logger.debug(f"Error closing session: {e}")
+
+
+session_pool = SessionPool()
@@ -0,0 +1,155 @@
+"""Coalesce identical concurrent calls into one (singleflight)."""
+import asyncio
+import hashlib
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from logger import get_logger
+from src.file_lock import FileLock
+import config
+
+logger = get_logger(__name__)
+
+
+class _Call:
+    """One in-flight call and the outcome its followers wait for."""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False  # leader cancelled: followers run the call themselves
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    At most one call per key in flight; concurrent callers share its outcome.
+    
+    The first caller of a key (the leader) runs the function, callers that
+    arrive while it runs (followers) block until it finishes and get the
+    same result, or the same exception. Nothing is kept afterwards: the
+    next call of that key runs again.
+    
+    With ``lock_dir`` the leader also holds a FileLock for the key while it
+    runs, so the leader of the same key in another process waits for it
+    (at most ``lock_timeout`` seconds). That only serialises the two; the
+    caller's function is expected to find the first one's work (e.g. in the
+    response cache).
+    """
+    
+    def __init__(self, lock_dir: Path = None, lock_timeout: float = None):
+        self.lock_dir = Path(lock_dir) if lock_dir else None
+        self.lock_timeout = config.SINGLEFLIGHT_LOCK_TIMEOUT if lock_timeout is None else lock_timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {'calls': 0, 'shared': 0}
+    
+    def do(self, key, fn, *args, **kwargs):
+        """Return ``fn(*args, **kwargs)``, or the outcome of the same key's call in flight."""
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                break
+            call.done.wait()
+            if not call.abandoned:
+                return self._outcome(call)
+        
+        try:
+            with self._process_lock(key):
+                call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException:
+            call.abandoned = True
+            raise
+        finally:
+            self._leave(key, call)
+    
+    async def do_async(self, key, fn, *args, **kwargs):
+        """do() for a coroutine function ``fn``; waiting happens off the event loop."""
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                break
+            await asyncio.to_thread(call.done.wait)
+            if not call.abandoned:
+                return self._outcome(call)
+        
+        try:
+            lock = await asyncio.to_thread(self._acquire_process_lock, key)
+            try:
+                call.result = await fn(*args, **kwargs)
+            finally:
+                if lock:
+                    lock.release()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException:
+            call.abandoned = True
+            raise
+        finally:
+            self._leave(key, call)
+    
+    def stats(self) -> dict:
+        """Calls made and how many of them shared another caller's call."""
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
+    
+    def _join(self, key) -> tuple:
+        """(call, True) for a new leader, or (the key's call in flight, False)."""
+        with self._lock:
+            self._stats['calls'] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self._stats['shared'] += 1
+                logger.info(f"Joining in-flight call for {key}")
+                return call, False
+            call = self._calls[key] = _Call()
+            return call, True
+    
+    def _leave(self, key, call: _Call):
+        with self._lock:
+            del self._calls[key]
+        if call.followers:
+            logger.info(f"Call for {key} shared with {call.followers} other caller(s)")
+        call.done.set()
+    
+    @staticmethod
+    def _outcome(call: _Call):
+        if call.error is not None:
+            raise call.error
+        return call.result
+    
+    @contextmanager
+    def _process_lock(self, key):
+        lock = self._acquire_process_lock(key)
+        try:
+            yield
+        finally:
+            if lock:
+                lock.release()
+    
+    def _acquire_process_lock(self, key) -> FileLock:
+        """Take the key's FileLock (None without lock_dir, or if it timed out)."""
+        if self.lock_dir is None:
+            return None
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+        lock = FileLock(self.lock_dir / f"{digest}.lock", timeout=self.lock_timeout)
+        try:
+            lock.acquire()
+        except TimeoutError:
+            logger.warning(f"Another process kept {key} locked for {self.lock_timeout}s, running anyway")
+            return None
+        return lock
+
+
+# Identical scrape_revolico() calls (across processes with SINGLEFLIGHT_ACROSS_PROCESSES)
+scrape_flight = SingleFlight(
+    lock_dir=config.CACHE_DIR / "singleflight" if config.SINGLEFLIGHT_ACROSS_PROCESSES else None
+)
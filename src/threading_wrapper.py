@@ -10,10 +10,24 @@ import threading
 import queue
 import asyncio
 import sys
-from typing import Callable, Any, TypeVar
+from typing import Callable, Any, Coroutine, TypeVar
 
 T = TypeVar('T')
 
+_shared_loop = None
+_shared_loop_lock = threading.Lock()
+
+
+def use_compatible_event_loop():
+    """
+    Make threads started from now on use an event loop Playwright can run on.
+    
+    On Windows with Python 3.14, ProactorEventLoop has the subprocess bug;
+    SelectorEventLoopPolicy works better. Nothing to do elsewhere.
+    """
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
 
 def run_playwright_in_thread(func: Callable[..., T], *args, **kwargs) -> T:
     """
@@ -38,10 +52,7 @@ def run_playwright_in_thread(func: Callable[..., T], *args, **kwargs) -> T:
     def worker():
         try:
             # Set event loop policy to SelectorEventLoop (compatible with Python 3.14)
-            if sys.platform == 'win32':
-                # On Windows with Python 3.14, ProactorEventLoop has bug
-                # SelectorEventLoopPolicy works better
-                asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+            use_compatible_event_loop()
             
             result = func(*args, **kwargs)
             result_queue.put(result)
@@ -61,3 +72,75 @@ def run_playwright_in_thread(func: Callable[..., T], *args, **kwargs) -> T:
         raise exc
     
     return result_queue.get()
+
+
+def run_async(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine to completion from synchronous code.
+    
+    Uses asyncio.run directly when no event loop is running in this thread,
+    otherwise runs the coroutine on a fresh loop in a helper thread so callers
+    inside an existing loop (Streamlit, Jupyter) don't hit "loop already running".
+    
+    Args:
+        coro: Coroutine to execute
+        
+    Returns:
+        Result of the coroutine
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    
+    outcome: dict[str, Any] = {}
+    
+    def worker():
+        try:
+            outcome['result'] = asyncio.run(coro)
+        except BaseException as e:
+            outcome['error'] = e
+    
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    thread.join()
+    
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
+def shared_loop() -> asyncio.AbstractEventLoop:
+    """The event loop of a daemon thread that lives as long as the process (started on first use)."""
+    global _shared_loop
+    with _shared_loop_lock:
+        if _shared_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="shared-event-loop", daemon=True).start()
+            _shared_loop = loop
+        return _shared_loop
+
+
+def run_on_shared_loop(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine on shared_loop() and wait for its result.
+    
+    Unlike run_async, the loop outlives the call, so what is bound to it
+    (e.g. pooled httpx clients and their keep-alive connections) can be
+    reused by later calls. Calls from several threads run concurrently on
+    it; a call from the shared loop itself falls back to run_async.
+    
+    Args:
+        coro: Coroutine to execute
+    
+    Returns:
+        Result of the coroutine
+    """
+    loop = shared_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        return run_async(coro)
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
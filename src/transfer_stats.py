@@ -0,0 +1,164 @@
+"""Compression negotiation and per-backend / per-query byte accounting."""
+import importlib.util
+import threading
+from contextlib import contextmanager
+from urllib.parse import parse_qs, urlparse
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _decodable_encodings() -> list[str]:
+    """
+    Content codings requests/urllib3 and httpx can decode here, best first.
+    
+    Both decode br with the brotli (or brotlicffi) package and zstd with
+    zstandard; gzip and deflate need nothing extra.
+    """
+    encodings = []
+    if importlib.util.find_spec('brotli') or importlib.util.find_spec('brotlicffi'):
+        encodings.append('br')
+    if importlib.util.find_spec('zstandard'):
+        encodings.append('zstd')
+    return encodings + ['gzip', 'deflate']
+
+
+# Accept-Encoding for the Python HTTP clients. The curl executable
+# advertises what its own build decodes (--compressed) and curl-cffi what
+# the impersonated browser sends.
+ACCEPT_ENCODING = ", ".join(_decodable_encodings())
+
+
+def wire_bytes(response) -> int:
+    """
+    Body bytes received from the network so far, before decompression.
+    
+    Works for httpx, requests/cloudscraper (urllib3) and curl-cffi
+    responses; curl-cffi's must not be closed yet. None if unknown.
+    """
+    if hasattr(response, 'num_bytes_downloaded'):  # httpx
+        return response.num_bytes_downloaded
+    raw = getattr(response, 'raw', None)
+    if raw is not None and hasattr(raw, 'tell'):  # urllib3
+        return raw.tell()
+    curl = getattr(response, 'curl', None)
+    if curl is not None:  # curl-cffi
+        from curl_cffi import CurlInfo
+        return curl.getinfo(CurlInfo.SIZE_DOWNLOAD_T)
+    return None
+
+
+def _query_of(url: str) -> str:
+    """The search query of a results page URL ('' for other URLs)."""
+    return parse_qs(urlparse(url).query).get('q', [''])[0]
+
+
+class _Meter:
+    """Counts the decoded bytes of a body as its chunks go by."""
+    
+    def __init__(self):
+        self.body_bytes = 0
+    
+    def chunks(self, chunks):
+        for chunk in chunks:
+            self.body_bytes += len(chunk)
+            yield chunk
+    
+    async def achunks(self, chunks):
+        async for chunk in chunks:
+            self.body_bytes += len(chunk)
+            yield chunk
+
+
+class TransferStats:
+    """
+    Response bodies downloaded, per backend and per search query.
+    
+    For each body it adds up the bytes that crossed the wire (compressed)
+    and the bytes after decompression, and counts the content coding the
+    server picked. Bodies abandoned early (challenge pages) count what was
+    read. 304 Not Modified responses have no body and are not counted.
+    Kept in memory for the life of the process.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._backends = {}
+        self._queries = {}
+    
+    def record(self, backend: str, url: str, wire: int, body: int, encoding: str = None):
+        """
+        Add one downloaded body.
+        
+        Args:
+            backend: Backend name (as in RevolicoScraper.BACKENDS)
+            url: Requested URL; its ``q`` parameter is the query
+            wire: Bytes received (None if unknown: counted as ``body``)
+            body: Bytes after decompression
+            encoding: Content-Encoding of the response
+        """
+        wire = body if wire is None else wire
+        encoding = (encoding or 'identity').strip().lower()
+        with self._lock:
+            for totals in (self._backends.setdefault(backend, _new_totals()),
+                           self._queries.setdefault(_query_of(url), _new_totals())):
+                totals['responses'] += 1
+                totals['wire_bytes'] += wire
+                totals['body_bytes'] += body
+                totals['encodings'][encoding] = totals['encodings'].get(encoding, 0) + 1
+        logger.debug(f"{backend}: {url} {wire} bytes on the wire, {body} decoded ({encoding})")
+    
+    @contextmanager
+    def measure(self, backend: str, url: str, response):
+        """
+        Record ``response``'s body once the block is done reading it.
+        
+        Yields a meter; read the body through ``meter.chunks(...)`` (or
+        ``meter.achunks(...)`` for an async iterator) so its decoded size is
+        known. Recorded even if reading raised.
+        """
+        meter = _Meter()
+        try:
+            yield meter
+        finally:
+            try:
+                wire = wire_bytes(response)
+            except Exception as e:
+                logger.debug(f"Could not read the transfer size of {url}: {e}")
+                wire = None
+            self.record(backend, url, wire, meter.body_bytes, response.headers.get('content-encoding'))
+    
+    def report(self) -> dict:
+        """{'backends': {name: totals}, 'queries': {query: totals}} with savings ratios."""
+        with self._lock:
+            return {
+                'backends': {name: _summary(t) for name, t in self._backends.items()},
+                'queries': {query: _summary(t) for query, t in self._queries.items()},
+            }
+    
+    def query_summary(self, query: str) -> dict:
+        """Totals for one query so far (zeros if nothing was downloaded for it)."""
+        with self._lock:
+            return _summary(self._queries.get(query, _new_totals()))
+    
+    def reset(self):
+        """Forget everything recorded so far."""
+        with self._lock:
+            self._backends.clear()
+            self._queries.clear()
+
+
+def _new_totals() -> dict:
+    return {'responses': 0, 'wire_bytes': 0, 'body_bytes': 0, 'encodings': {}}
+
+
+def _summary(totals: dict) -> dict:
+    """Copy of ``totals`` plus the fraction of the decoded size compression saved."""
+    summary = dict(totals, encodings=dict(totals['encodings']))
+    body = totals['body_bytes']
+    summary['saved_ratio'] = round(1 - totals['wire_bytes'] / body, 3) if body else 0.0
+    return summary
+
+
+# Shared by every HTTP backend
+transfer_stats = TransferStats()
@@ -0,0 +1,111 @@
+"""Offline test for the backend availability registry."""
+import json
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import src.scraper as scraper_module
+from src.backend_registry import PROBES, BackendRegistry
+from src.backend_stats import BackendStats
+from src.scraper import RevolicoScraper
+
+
+def test_probes_run_once():
+    """Capabilities are probed once and cached; a crashing probe means unavailable."""
+    print("\n" + "="*60)
+    print("TEST 1: Probing and caching")
+    print("="*60)
+    
+    runs = []
+    
+    def probe_ok():
+        runs.append('ok')
+        return {'available': True, 'reason': None, 'version': '1.0'}
+    
+    def probe_crash():
+        runs.append('crash')
+        raise RuntimeError("segfault in a native extension")
+    
+    registry = BackendRegistry(probes={
+        'ok': probe_ok,
+        'missing': lambda: {'available': False, 'reason': "missing Python package(s): nope"},
+        'crash': probe_crash,
+    })
+    assert registry.usable(['crash', 'ok', 'missing', 'unprobed']) == ['ok', 'unprobed']
+    assert registry.available('ok') and not registry.available('crash')
+    registry.report()
+    assert runs == ['ok', 'crash'], "Each probe runs once per process"
+    
+    report = registry.report()
+    print(f"✅ {report['usable']}; crash: {report['backends']['crash']['reason']}")
+    assert report['usable'] == ['ok']
+    assert report['backends']['crash']['reason'].startswith("probe failed")
+    assert report['backends']['ok']['version'] == '1.0'
+    report['backends']['ok']['available'] = False
+    assert registry.available('ok'), "The report is a copy"
+    
+    registry.probe(refresh=True)
+    assert runs == ['ok', 'crash'] * 2, "refresh probes again"
+    return True
+
+
+def test_real_probes():
+    """The shipped probes run here and describe the environment as JSON."""
+    print("\n" + "="*60)
+    print("TEST 2: Probes of the real backends")
+    print("="*60)
+    
+    report = BackendRegistry().report()
+    json.dumps(report)
+    print(f"✅ usable here: {report['usable']}")
+    assert set(report['backends']) == set(PROBES)
+    assert set(RevolicoScraper.BACKENDS) <= set(PROBES), "Every scrape backend has a probe"
+    curl = report['backends']['curl-direct']
+    if shutil.which("curl"):
+        assert 'version' in curl, "A curl on PATH is run to get its version"
+    else:
+        assert not curl['available'] and "not found" in curl['reason']
+    return True
+
+
+def test_scrape_skips_unusable_backends():
+    """RevolicoScraper never attempts a backend the registry rules out."""
+    print("\n" + "="*60)
+    print("TEST 3: Unusable backends are skipped")
+    print("="*60)
+    
+    attempted = []
+    
+    def fake_backend(backend, query, page_nums):
+        attempted.append(backend)
+        return {page_num: RuntimeError(f"{backend} failed") for page_num in page_nums}
+    
+    saved = (scraper_module.backend_registry, scraper_module.backend_stats)
+    scraper_module.backend_stats = BackendStats(path=Path(tempfile.mkdtemp()) / "stats.json")
+    scraper_module.backend_registry = BackendRegistry(probes={
+        'http2': lambda: {'available': False, 'reason': "missing Python package(s): h2"},
+        'curl-direct': lambda: {'available': False, 'reason': "curl executable not found on PATH"},
+    })
+    try:
+        scraper = RevolicoScraper()
+        scraper._run_backend = fake_backend
+        try:
+            scraper.scrape("car", max_pages=1)
+            raise AssertionError("The scrape fails once every usable backend did")
+        except AssertionError:
+            raise
+        except Exception:
+            pass
+    finally:
+        scraper_module.backend_registry, scraper_module.backend_stats = saved
+    
+    print(f"✅ attempted: {attempted}")
+    assert sorted(attempted) == ['requests', 'ultimate']
+    return True
+
+
+if __name__ == "__main__":
+    passed = test_probes_run_once() and test_real_probes() and test_scrape_skips_unusable_backends()
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,93 @@
+"""Offline test for adaptive backend ordering."""
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+import src.scraper as scraper_module
+from src.backend_stats import CHALLENGE, ERROR, SUCCESS, BackendStats
+from src.challenge import ChallengeBlocked
+from src.scraper import RevolicoScraper
+
+
+def test_stats_and_persistence():
+    """Rates and percentiles are computed from the window and survive a restart."""
+    print("\n" + "="*60)
+    print("TEST 1: Rolling stats persisted to disk")
+    print("="*60)
+    
+    path = Path(tempfile.mkdtemp()) / "stats.json"
+    stats = BackendStats(path=path, window=10)
+    for latency in (1.0, 2.0, 3.0, 4.0):
+        stats.record('requests', SUCCESS, latency)
+    stats.record('requests', CHALLENGE, 0.1)
+    for _ in range(20):
+        stats.record('curl-direct', ERROR, 5.0)
+    
+    summary = BackendStats(path=path).summary('requests')
+    print(f"✅ requests: {summary}")
+    assert summary['attempts'] == 5
+    assert summary['success_rate'] == 0.8
+    assert summary['challenge_rate'] == 0.2
+    assert summary['p50'] == 2.0 and summary['p95'] == 4.0
+    assert BackendStats(path=path).summary('curl-direct')['attempts'] == 10, "Window caps history"
+    return True
+
+
+def test_working_backend_first():
+    """A backend that keeps failing drops behind the one that works."""
+    print("\n" + "="*60)
+    print("TEST 2: Order by expected time-to-success")
+    print("="*60)
+    
+    stats = BackendStats(path=Path(tempfile.mkdtemp()) / "stats.json", rng=random.Random(0))
+    for _ in range(20):
+        stats.record('requests', CHALLENGE, 0.5)
+        stats.record('ultimate', SUCCESS, 3.0)
+    
+    firsts = [stats.order(('requests', 'curl-direct', 'ultimate'))[0] for _ in range(50)]
+    print(f"✅ ultimate first {firsts.count('ultimate')}/50, untried curl-direct {firsts.count('curl-direct')}/50")
+    assert firsts.count('ultimate') > 40, "The working backend should usually lead"
+    assert 'requests' not in firsts, "The always-challenged backend should not lead"
+    return True
+
+
+def test_scrape_records_attempts():
+    """RevolicoScraper.scrape follows the order and records every attempt."""
+    print("\n" + "="*60)
+    print("TEST 3: scrape() feeds the stats")
+    print("="*60)
+    
+    stats = BackendStats(path=Path(tempfile.mkdtemp()) / "stats.json")
+    original_stats = scraper_module.backend_stats
+    scraper_module.backend_stats = stats
+    
+    calls = []
+    
+    def fake_backend(backend, query, page_nums):
+        calls.append(backend)
+        if backend == 'requests':
+            return {1: ChallengeBlocked("https://revolico.com/search.html", 200, 'Just a moment')}
+        return {1: [{'titulo': 'Car', 'precio_raw': '100 USD', 'url': ''}] if backend == 'ultimate' else []}
+    
+    scraper = RevolicoScraper()
+    scraper._run_backend = fake_backend
+    try:
+        results = scraper.scrape("car")
+    finally:
+        scraper_module.backend_stats = original_stats
+    
+    print(f"✅ Attempts: {calls}, stats: {stats.stats()}")
+    assert len(results) == 1
+    assert calls[-1] == 'ultimate', "Stops at the first backend with results"
+    assert all(stats.summary(backend)['attempts'] == 1 for backend in calls)
+    assert stats.summary('ultimate')['success_rate'] == 1.0
+    if 'requests' in calls:
+        assert stats.summary('requests')['challenge_rate'] == 1.0
+    return True
+
+
+if __name__ == "__main__":
+    passed = all([test_stats_and_persistence(), test_working_backend_first(), test_scrape_records_attempts()])
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
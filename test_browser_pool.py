@@ -0,0 +1,211 @@
+"""Offline test for the pool of warm Playwright browsers (with fake browsers)."""
+import sys
+import threading
+import time
+
+from src.browser_pool import BrowserPool
+from src.deadline import Deadline, DeadlineExceeded
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+    
+    def close(self):
+        self.context.pages.remove(self)
+
+
+class FakeContext:
+    def __init__(self, browser, options):
+        self.browser = browser
+        self.options = options
+        self.pages = []
+        self.closed = False
+        self.setup = []
+    
+    def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+    
+    def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.contexts = []
+    
+    def new_context(self, **options):
+        context = FakeContext(self, options)
+        self.contexts.append(context)
+        return context
+    
+    def is_connected(self):
+        return self.connected
+    
+    def close(self):
+        self.connected = False
+
+
+def _fake_launcher(browsers: list, fail_first: int = 0):
+    """launch() for BrowserPool that records the FakeBrowsers it starts."""
+    failures = [fail_first]
+    
+    def launch():
+        time.sleep(0.2)  # a (very) fast Chromium cold start
+        if failures[0] > 0:
+            failures[0] -= 1
+            raise RuntimeError("Executable doesn't exist")
+        browser = FakeBrowser()
+        browsers.append(browser)
+        return browser, lambda: None
+    return launch
+
+
+def _open_page(context, label):
+    """A job: leave a page open, report where it ran."""
+    context.new_page()
+    return label, threading.current_thread().name, context
+
+
+def test_warm_browser_and_recycled_context():
+    """Jobs share one warm browser and one context, left without pages between jobs."""
+    print("\n" + "="*60)
+    print("TEST 1: Warm browser, recycled context")
+    print("="*60)
+    
+    browsers = []
+    pool = BrowserPool(size=1, launch=_fake_launcher(browsers), context_max_jobs=3, name="test-browser")
+    try:
+        options = {'viewport': {'width': 1280, 'height': 720}}
+        first = pool.run(_open_page, 1, context_options=options, context_setup=lambda c: c.setup.append(1))
+        start = time.perf_counter()
+        second = pool.run(_open_page, 2, context_options=dict(options))
+        warm_seconds = time.perf_counter() - start
+        
+        print(f"✅ second job started warm in {warm_seconds * 1000:.1f} ms; {pool.stats()}")
+        assert len(browsers) == 1 and pool.launches == 1, "The browser is launched once"
+        assert warm_seconds < 0.1, "No cold start for later jobs"
+        assert first[1] == second[1] and first[1].startswith("test-browser"), "Jobs run on the worker thread"
+        assert first[1] != threading.current_thread().name
+        
+        context = first[2]
+        assert first[2].setup == [1], "context_setup runs when the context is created"
+        assert second[2] is not context, "A different context_setup is a different context"
+        third = pool.run(_open_page, 3, context_options=dict(options))
+        assert third[2] is second[2] and pool.contexts_reused == 1, "Same settings: same context"
+        assert third[2].pages == [], "The pages a job left open are closed"
+        assert context.closed, "The replaced context is closed"
+        
+        pool.run(_open_page, 4, context_options=dict(options))
+        recycled = pool.run(_open_page, 5, context_options=dict(options))
+        assert recycled[2] is not second[2], "A context is replaced after context_max_jobs jobs"
+    finally:
+        pool.close()
+    assert not browsers[0].connected, "close() shuts the browsers down"
+    return True
+
+
+def test_crashed_browser_restarts():
+    """A crashed browser fails its job and is relaunched for the next one."""
+    print("\n" + "="*60)
+    print("TEST 2: Crash recovery")
+    print("="*60)
+    
+    def crash(context):
+        context.browser.connected = False
+        raise RuntimeError("Target page, context or browser has been closed")
+    
+    browsers = []
+    pool = BrowserPool(size=1, launch=_fake_launcher(browsers, fail_first=1))
+    try:
+        try:
+            pool.run(_open_page, 'no browser')
+            raise AssertionError("A failed launch fails the job")
+        except RuntimeError:
+            pass
+        assert pool.run(_open_page, 'launched')[0] == 'launched', "The launch is retried on the next job"
+        
+        try:
+            pool.run(crash)
+            raise AssertionError("The crash is the job's error")
+        except RuntimeError:
+            pass
+        label, _, context = pool.run(_open_page, 'after crash')
+        print(f"✅ {pool.stats()}")
+        assert label == 'after crash' and context.browser is browsers[-1] and len(browsers) == 2
+        assert pool.restarts == 1
+    finally:
+        pool.close()
+    return True
+
+
+def test_pool_runs_jobs_concurrently():
+    """With size N, N jobs run at once, each on its own browser."""
+    print("\n" + "="*60)
+    print("TEST 3: Pool size")
+    print("="*60)
+    
+    def slow(context):
+        time.sleep(0.3)
+        return context.browser
+    
+    browsers = []
+    pool = BrowserPool(size=3, launch=_fake_launcher(browsers))
+    try:
+        assert pool.warm() == 3 and len(browsers) == 3, "warm() starts every browser"
+        start = time.perf_counter()
+        used = [future.result() for future in [pool.submit(slow) for _ in range(3)]]
+        elapsed = time.perf_counter() - start
+        print(f"✅ 3 jobs in {elapsed:.2f}s on {len(set(map(id, used)))} browsers")
+        assert elapsed < 0.6 and len(set(map(id, used))) == 3
+    finally:
+        pool.close()
+    return True
+
+
+def test_run_honours_the_deadline():
+    """A caller out of time stops waiting, and its still-queued job never starts."""
+    print("\n" + "="*60)
+    print("TEST 4: Deadline while waiting for a browser")
+    print("="*60)
+    
+    ran = []
+    
+    def slow(context, label):
+        time.sleep(0.5)
+        ran.append(label)
+    
+    pool = BrowserPool(size=1, launch=_fake_launcher([]))
+    try:
+        pool.warm()
+        busy = pool.submit(slow, 'busy')
+        start = time.perf_counter()
+        try:
+            pool.run(slow, 'queued', deadline=Deadline(0.2))
+            raise AssertionError("The wait ends at the deadline")
+        except DeadlineExceeded as e:
+            waited = time.perf_counter() - start
+            print(f"✅ gave up after {waited:.2f}s: {e}")
+        assert waited < 0.4
+        busy.result()
+        time.sleep(0.1)
+        assert ran == ['busy'], "The abandoned job was cancelled before it started"
+        
+        try:
+            pool.run(slow, 'running', deadline=Deadline(0.2))
+            raise AssertionError("The wait ends at the deadline")
+        except DeadlineExceeded as e:
+            assert "during" in str(e), "A running job cannot be cancelled"
+    finally:
+        pool.close()
+    return True
+
+
+if __name__ == "__main__":
+    passed = (test_warm_browser_and_recycled_context() and test_crashed_browser_restarts()
+              and test_pool_runs_jobs_concurrently() and test_run_honours_the_deadline())
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,155 @@
+"""Offline test for scraping result pages in several tabs at once (with fake pages)."""
+import sys
+import tempfile
+import time
+
+import src.scraper as scraper_module
+from src.browser_tabs import scrape_in_tabs
+from src.deadline import Deadline, DeadlineExceeded
+from src.response_cache import ResponseCache
+from src.scraper import RevolicoScraper
+import config
+
+LOAD_SECONDS = 0.3  # how long the fake browser takes to load a page
+
+
+class FakeTab:
+    """A page that loads in the background once navigated, like a browser tab."""
+    
+    def __init__(self, context):
+        self.context = context
+        self.loaded_at = None
+        self.url = None
+        self.closed = False
+    
+    def goto(self, url):
+        self.url = url
+        self.loaded_at = time.perf_counter() + LOAD_SECONDS
+    
+    def wait_loaded(self):
+        time.sleep(max(0.0, self.loaded_at - time.perf_counter()))
+        return [f"{self.url}#{i}" for i in range(2)]
+    
+    def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    def __init__(self, cookies: list = None):
+        self.pages = []
+        self._cookies = cookies or []
+    
+    def new_page(self):
+        page = FakeTab(self)
+        self.pages.append(page)
+        return page
+    
+    def cookies(self):
+        return self._cookies
+
+
+class FakePaginator:
+    def __init__(self, last_page):
+        self.last_page = last_page
+    
+    def wants(self, page_num):
+        return page_num <= self.last_page
+
+
+def _navigate(tab, page_num):
+    if page_num == 4:
+        raise RuntimeError("net::ERR_CONNECTION_RESET")
+    tab.goto(f"page{page_num}")
+    return page_num
+
+
+def _harvest(tab, page_num, state):
+    assert state == page_num
+    return tab.wait_loaded()
+
+
+def test_tabs_load_concurrently():
+    """A wave of tabs takes about as long as one page; results are keyed by page."""
+    print("\n" + "="*60)
+    print("TEST 1: Concurrent tabs")
+    print("="*60)
+    
+    context = FakeContext()
+    first_tab = context.new_page()
+    start = time.perf_counter()
+    outcomes = scrape_in_tabs(context, [2, 3, 4, 5, 6, 7], _navigate, _harvest, tabs=3, first_tab=first_tab)
+    elapsed = time.perf_counter() - start
+    
+    print(f"✅ 6 pages in {elapsed:.2f}s ({6 * LOAD_SECONDS:.1f}s one at a time)")
+    assert elapsed < 3 * LOAD_SECONDS, "Two waves of three tabs, not six page loads"
+    assert sorted(outcomes) == [2, 3, 4, 5, 6, 7]
+    assert outcomes[2] == ["page2#0", "page2#1"] and outcomes[7][0] == "page7#0"
+    assert isinstance(outcomes[4], RuntimeError), "A failed page does not stop the others"
+    
+    assert len(context.pages) == 3, "Tabs are reused across waves"
+    assert not first_tab.closed, "The caller's tab is left open"
+    assert all(tab.closed for tab in context.pages[1:]), "The extra tabs are closed"
+    return True
+
+
+def test_pagination_and_deadline():
+    """No wave starts for pages past the end of the results or after the deadline."""
+    print("\n" + "="*60)
+    print("TEST 2: Pagination and time budget")
+    print("="*60)
+    
+    context = FakeContext()
+    outcomes = scrape_in_tabs(context, [2, 3, 5, 6, 7, 8], _navigate, _harvest, tabs=2,
+                              paginator=FakePaginator(last_page=5))
+    assert sorted(outcomes) == [2, 3, 5], "Pages past the last one are not loaded"
+    
+    context = FakeContext()
+    budget = config.DEADLINE_MIN_REQUEST + LOAD_SECONDS / 2
+    outcomes = scrape_in_tabs(context, [2, 3, 5, 6], _navigate, _harvest, tabs=2,
+                              deadline=Deadline(budget))
+    print(f"✅ with a {budget:.2f}s budget: {sorted(outcomes)}")
+    assert outcomes[2] == ["page2#0", "page2#1"], "A started wave is finished"
+    assert all(isinstance(outcomes[n], DeadlineExceeded) for n in (5, 6))
+    assert len(context.pages) == 2
+    return True
+
+
+def _scrape_with_page_one(first_page: list, cookies: list = None) -> tuple:
+    """RevolicoScraper._scrape_playwright_internal over fakes; returns (context, listings)."""
+    scraper = RevolicoScraper()
+    scraper._scrape_page = lambda page, query, page_num: first_page
+    scraper._open_page = lambda tab, query, page_num, wait_until: tab.goto(f"page{page_num}")
+    scraper._harvest_page = lambda tab, query, page_num, url: tab.wait_loaded()
+    context = FakeContext(cookies)
+    return context, scraper._scrape_playwright_internal(context, "car", 4)
+
+
+def test_tabs_only_after_the_challenge():
+    """Later pages only go to parallel tabs once page 1 got through the challenge."""
+    print("\n" + "="*60)
+    print("TEST 3: No tabs in an uncleared context")
+    print("="*60)
+    
+    saved = scraper_module.response_cache
+    scraper_module.response_cache = ResponseCache(directory=tempfile.mkdtemp())
+    try:
+        context, results = _scrape_with_page_one([])
+        print(f"✅ page 1 empty: {len(context.pages)} tab(s), {len(results)} listings")
+        assert len(context.pages) == 1, "An uncleared context loads one page at a time"
+        assert results == [f"page{n}#{i}" for n in (2, 3, 4) for i in range(2)], "Later pages are still tried"
+        
+        context, _ = _scrape_with_page_one([], cookies=[{'name': 'cf_clearance', 'value': 'x'}])
+        assert len(context.pages) == 3, "A clearance cookie is proof enough"
+        
+        context, results = _scrape_with_page_one(['page1#0'])
+        print(f"✅ page 1 scraped: {len(context.pages)} tab(s)")
+        assert len(context.pages) == 3 and results[0] == 'page1#0'
+    finally:
+        scraper_module.response_cache = saved
+    return True
+
+
+if __name__ == "__main__":
+    passed = test_tabs_load_concurrently() and test_pagination_and_deadline() and test_tabs_only_after_the_challenge()
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
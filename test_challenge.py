@@ -0,0 +1,103 @@
+"""Offline test for early Cloudflare challenge detection on streamed bodies."""
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import src.challenge as challenge
+import src.scraper_requests as scraper_requests
+from src.challenge import ChallengeBlocked, read_body
+from src.cookie_vault import CookieVault
+from src.rate_limiter import RateLimiter
+from src.response_cache import ResponseCache
+from src.scraper_requests import RequestsScraper
+
+CHALLENGE_HTML = Path(__file__).with_name("page_sample.html").read_bytes()
+
+
+def test_read_body_stops_early():
+    """Only the sniffed prefix of a challenge body is consumed."""
+    print("\n" + "="*60)
+    print("TEST 1: Stop reading at the challenge marker")
+    print("="*60)
+    
+    consumed = []
+    
+    def chunks():
+        yield CHALLENGE_HTML
+        for _ in range(100):
+            consumed.append(1)
+            yield b" " * 8192
+    
+    try:
+        read_body(chunks(), "https://revolico.com/search.html")
+        raise AssertionError("Challenge page should raise ChallengeBlocked")
+    except ChallengeBlocked as e:
+        print(f"✅ Blocked on {e.marker!r} after {len(consumed)} extra chunk(s)")
+        assert e.marker == 'Just a moment'
+        assert len(consumed) <= 1, "The rest of the body must not be read"
+    
+    assert read_body([b"<html>listings</html>"], "https://revolico.com/") == b"<html>listings</html>"
+    return True
+
+
+class _ChallengeHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(CHALLENGE_HTML)
+        try:
+            # A large tail the client should never wait for
+            for _ in range(50):
+                time.sleep(0.05)
+                self.wfile.write(b" " * 65536)
+        except OSError:
+            pass
+    
+    def log_message(self, *args):
+        pass
+
+
+def test_requests_backend_reports_blocked():
+    """The requests backend raises ChallengeBlocked fast and drops a stale clearance."""
+    print("\n" + "="*60)
+    print("TEST 2: Typed blocked outcome from the requests backend")
+    print("="*60)
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _ChallengeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    
+    vault = CookieVault(path=Path(tempfile.mkdtemp()) / "vault.json")
+    scraper_requests.cookie_vault = vault
+    challenge.cookie_vault = vault
+    scraper_requests.rate_limiter = RateLimiter(rate=100, burst=10)
+    scraper_requests.response_cache = ResponseCache(directory=tempfile.mkdtemp())
+    try:
+        base_url = f"http://127.0.0.1:{server.server_port}/search.html"
+        vault.store(base_url, [{'name': 'cf_clearance', 'value': 'old', 'expires': time.time() + 60}], "UA")
+        
+        scraper = RequestsScraper()
+        scraper.base_url = base_url
+        
+        start = time.perf_counter()
+        try:
+            scraper.scrape("car", max_pages=3)
+            raise AssertionError("Scrape should stop with ChallengeBlocked")
+        except ChallengeBlocked as e:
+            elapsed = time.perf_counter() - start
+            print(f"✅ Blocked in {elapsed:.2f}s: {e}")
+            assert elapsed < 1.0, "Should not download the whole challenge response"
+        
+        assert vault.get(base_url) is None, "Challenged clearance should be evicted"
+        return True
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    passed = all([test_read_body_stops_early(), test_requests_backend_reports_blocked()])
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
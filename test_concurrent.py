@@ -0,0 +1,111 @@
+"""Offline test for the concurrent (httpx) requests engine against a local server."""
+import asyncio
+import contextlib
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import src.scraper_requests as scraper_requests
+from src.rate_limiter import RateLimiter
+from src.response_cache import ResponseCache
+from src.scraper_requests import RequestsScraper
+
+PAGE_DELAY = 0.5  # seconds of simulated network wait per page
+
+
+@contextlib.contextmanager
+def _local_setup():
+    """Local server: no production pacing and an empty cache, for one test only."""
+    saved = (scraper_requests.rate_limiter, scraper_requests.response_cache)
+    scraper_requests.rate_limiter = RateLimiter(rate=100, burst=10)
+    scraper_requests.response_cache = ResponseCache(directory=tempfile.mkdtemp())
+    try:
+        yield
+    finally:
+        scraper_requests.rate_limiter, scraper_requests.response_cache = saved
+
+
+def _listing_page(page_num: int) -> str:
+    """Build a fake results page with a handful of listing links."""
+    items = "".join(
+        f'<a href="/anuncio/{page_num}-{i}" title="Car {page_num}-{i}">Car {page_num}-{i} {100 * i} USD</a>'
+        for i in range(1, 6)
+    )
+    return f"<html><body>{items}{' ' * 1000}</body></html>"
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        page_num = int(params.get('page', ['1'])[0])
+        time.sleep(PAGE_DELAY)
+        body = _listing_page(page_num).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+def _start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_concurrent_pages():
+    """All pages should be fetched in roughly the time of one batch."""
+    print("\n" + "="*60)
+    print("TEST 1: Concurrent page fetch")
+    print("="*60)
+    
+    server = _start_server()
+    try:
+        with _local_setup():
+            scraper = RequestsScraper(max_concurrency=5)
+            scraper.base_url = f"http://127.0.0.1:{server.server_port}/search.html"
+            
+            start = time.perf_counter()
+            results = scraper.scrape_concurrent("car", max_pages=5)
+            elapsed = time.perf_counter() - start
+        
+        print(f"✅ {len(results)} listings from 5 pages in {elapsed:.2f}s")
+        assert len(results) == 25, "Should extract 5 listings per page"
+        assert elapsed < PAGE_DELAY * 3, "Pages should be fetched concurrently"
+        assert results[0]['url'].endswith('/anuncio/1-1'), "Results keep page order"
+        return True
+    finally:
+        server.shutdown()
+
+
+def test_async_entry_point():
+    """scrape_async should be awaitable from a running event loop."""
+    print("\n" + "="*60)
+    print("TEST 2: Async entry point")
+    print("="*60)
+    
+    server = _start_server()
+    try:
+        with _local_setup():
+            scraper = RequestsScraper(max_concurrency=2)
+            scraper.base_url = f"http://127.0.0.1:{server.server_port}/search.html"
+            
+            results = asyncio.run(scraper.scrape_async("car", max_pages=2))
+        
+        print(f"✅ {len(results)} listings via asyncio")
+        assert len(results) == 10, "Should extract 5 listings per page"
+        return True
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    passed = test_concurrent_pages() and test_async_entry_point()
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,143 @@
+"""Offline test for the shared Cloudflare clearance cookie vault."""
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import src.scraper_requests as scraper_requests
+from src.cookie_vault import CookieVault
+from src.rate_limiter import RateLimiter
+from src.response_cache import ResponseCache
+from src.scraper_requests import RequestsScraper
+
+BROWSER_COOKIES = [
+    {'name': 'cf_clearance', 'value': 'solved', 'expires': time.time() + 3600},
+    {'name': '__cf_bm', 'value': 'bm', 'expires': -1},
+    {'name': '_ga', 'value': 'analytics', 'expires': -1},
+]
+
+
+def test_store_and_headers():
+    """Only clearance cookies are kept, together with the browser UA."""
+    print("\n" + "="*60)
+    print("TEST 1: Store clearance and build headers")
+    print("="*60)
+    
+    vault = CookieVault(path=Path(tempfile.mkdtemp()) / "vault.json")
+    vault.store("https://www.revolico.com/search.html?q=car", BROWSER_COOKIES, "Browser/1.0")
+    headers = vault.clearance_headers("https://revolico.com/search.html")
+    
+    print(f"✅ Headers: {headers}")
+    assert headers == {'Cookie': 'cf_clearance=solved; __cf_bm=bm', 'User-Agent': 'Browser/1.0'}
+    
+    vault.report_response("https://revolico.com/search.html", 403)
+    assert vault.clearance_headers("https://revolico.com/search.html") == {}, "403 should evict"
+    
+    vault.store("https://revolico.com/", [{'name': 'cf_clearance', 'value': 'x', 'expires': time.time() - 1}], "UA")
+    assert vault.get("https://revolico.com/") is None, "Expired clearance should be ignored"
+    return True
+
+
+def test_concurrent_processes():
+    """Writers in separate processes must not lose each other's entries."""
+    print("\n" + "="*60)
+    print("TEST 2: Process-safe writes")
+    print("="*60)
+    
+    path = Path(tempfile.mkdtemp()) / "vault.json"
+    script = (
+        "import sys, time\n"
+        "from src.cookie_vault import CookieVault\n"
+        f"vault = CookieVault(path={str(path)!r})\n"
+        "for i in range(10):\n"
+        "    vault.store(f'https://site{sys.argv[1]}-{i}.example', "
+        "[{'name': 'cf_clearance', 'value': 'v', 'expires': time.time() + 60}], 'UA')\n"
+    )
+    procs = [subprocess.Popen([sys.executable, "-c", script, str(n)], stderr=subprocess.DEVNULL) for n in range(4)]
+    for proc in procs:
+        proc.wait()
+    
+    vault = CookieVault(path=path)
+    stored = sum(1 for n in range(4) for i in range(10) if vault.get(f"https://site{n}-{i}.example"))
+    print(f"✅ {stored}/40 entries survived concurrent writers")
+    assert stored == 40, "No writes should be lost"
+    return True
+
+
+class _CookieEchoHandler(BaseHTTPRequestHandler):
+    seen = []
+    
+    def do_GET(self):
+        type(self).seen.append((self.headers.get('Cookie'), self.headers.get('User-Agent')))
+        items = "".join(
+            f'<a href="/anuncio/{i}" title="Car {i}">Car {i} {100 * i} USD</a>' for i in range(1, 6)
+        )
+        body = f"<html><body>{items}{' ' * 1000}</body></html>".encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+def test_http_backend_attaches_clearance():
+    """The requests backend sends the stored cookie and UA."""
+    print("\n" + "="*60)
+    print("TEST 3: HTTP backend reuses browser clearance")
+    print("="*60)
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _CookieEchoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    
+    vault = CookieVault(path=Path(tempfile.mkdtemp()) / "vault.json")
+    scraper_requests.cookie_vault = vault
+    scraper_requests.rate_limiter = RateLimiter(rate=100, burst=10)
+    scraper_requests.response_cache = ResponseCache(directory=tempfile.mkdtemp())
+    try:
+        base_url = f"http://127.0.0.1:{server.server_port}/search.html"
+        vault.store(base_url, BROWSER_COOKIES, "Browser/1.0")
+        
+        scraper = RequestsScraper()
+        scraper.base_url = base_url
+        scraper._scrape_page("car", 1)
+        
+        print(f"✅ Server saw: {_CookieEchoHandler.seen[-1]}")
+        assert _CookieEchoHandler.seen[-1] == ('cf_clearance=solved; __cf_bm=bm', 'Browser/1.0')
+        return True
+    finally:
+        server.shutdown()
+
+
+def test_failed_write_leaves_no_temp_file():
+    """A write that fails keeps the old file and cleans up its temp file."""
+    print("\n" + "="*60)
+    print("TEST 4: Failed writes clean up")
+    print("="*60)
+    
+    directory = Path(tempfile.mkdtemp())
+    vault = CookieVault(path=directory / "vault.json")
+    vault.store("https://revolico.com/", BROWSER_COOKIES, "UA")
+    try:
+        with vault._store.locked() as data:
+            data['bad'] = object()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("An unserialisable entry should fail the write")
+    
+    print(f"✅ Files left: {sorted(p.name for p in directory.iterdir())}")
+    assert not list(directory.glob("*.tmp")), "No temp file is left behind"
+    assert vault.get("https://revolico.com/"), "The previous contents survive"
+    return True
+
+
+if __name__ == "__main__":
+    passed = all([test_store_and_headers(), test_concurrent_processes(), test_http_backend_attaches_clearance(),
+                  test_failed_write_leaves_no_temp_file()])
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,186 @@
+"""Offline test for the batched (--parallel) curl-direct scraper."""
+import contextlib
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import src.scraper_curl as scraper_curl
+from src.cookie_vault import CookieVault
+from src.rate_limiter import RateLimiter
+from src.response_cache import ResponseCache
+from src.retry_policy import RetryPolicy
+from src.scraper_curl import CurlDirectScraper
+
+PAGE_DELAY = 0.5  # seconds of simulated network wait per page
+
+
+@contextlib.contextmanager
+def _local_setup(run=None, burst: int = 10):
+    """
+    No production pacing, an empty cache and cookie vault and one quick
+    retry of the failing page - plus ``run`` in place of subprocess.run, if
+    given - for one test only.
+    """
+    saved = (scraper_curl.rate_limiter, scraper_curl.response_cache, scraper_curl.cookie_vault,
+             scraper_curl.retry_policy, scraper_curl.subprocess.run)
+    scraper_curl.rate_limiter = RateLimiter(rate=100, burst=burst)
+    scraper_curl.response_cache = ResponseCache(directory=tempfile.mkdtemp())
+    scraper_curl.cookie_vault = CookieVault(path=Path(tempfile.mkdtemp()) / "vault.json")
+    scraper_curl.retry_policy = RetryPolicy(max_attempts=2, base_delay=0.01)
+    if run is not None:
+        scraper_curl.subprocess.run = run
+    try:
+        yield
+    finally:
+        (scraper_curl.rate_limiter, scraper_curl.response_cache, scraper_curl.cookie_vault,
+         scraper_curl.retry_policy, scraper_curl.subprocess.run) = saved
+
+
+class _PageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    
+    def do_GET(self):
+        page_num = int(parse_qs(urlparse(self.path).query).get('page', ['1'])[0])
+        time.sleep(PAGE_DELAY)
+        
+        if page_num == 3:
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        
+        items = "".join(
+            f'<a href="/anuncio/{page_num}-{i}" title="Car {page_num}-{i}">Car {page_num}-{i} {100 * i} USD</a>'
+            for i in range(1, 6)
+        )
+        body = f"<html><body>{items}{' ' * 1000}</body></html>".encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+def test_single_process_batch():
+    """Page 1 is probed, every other page comes from one curl run, the 500 is retried alone."""
+    print("\n" + "="*60)
+    print("TEST 1: One curl process for the remaining pages")
+    print("="*60)
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    
+    runs = []
+    durations = []
+    original_run = scraper_curl.subprocess.run
+    
+    def counting_run(*args, **kwargs):
+        runs.append((args[0], kwargs.get('input', "")))
+        start = time.perf_counter()
+        try:
+            return original_run(*args, **kwargs)
+        finally:
+            durations.append(time.perf_counter() - start)
+    
+    try:
+        with _local_setup(run=counting_run):
+            scraper = CurlDirectScraper(max_concurrency=4)
+            scraper.base_url = f"http://127.0.0.1:{server.server_port}/search.html"
+            scraper_curl.cookie_vault.store(scraper.base_url, [{'name': 'cf_clearance', 'value': 'solved'}], "UA")
+            
+            start = time.perf_counter()
+            results = scraper.scrape("car", max_pages=4)
+            elapsed = time.perf_counter() - start
+        
+        print(f"✅ {len(results)} listings, {len(runs)} curl run(s), {elapsed:.2f}s")
+        assert len(runs) == 3, "Page 1 probe, a single curl process for the rest, one retry"
+        assert re.findall(r'^url = "(.*)"$', runs[2][1], re.MULTILINE) == [f"{scraper.base_url}?q=car&page=3"], \
+            "Only the failed page is fetched again"
+        assert all(argv[1:] == ["--config", "-"] for argv, _ in runs), "Options are not passed as arguments"
+        assert all('header = "Cookie: cf_clearance=solved"' in config for _, config in runs), \
+            "The clearance cookie goes through the config on stdin"
+        assert len(results) == 15, "Pages 1, 2 and 4 succeed; page 3 (500 every time) is skipped"
+        assert results[0]['url'].endswith('/anuncio/1-1'), "Results keep page order"
+        assert results[-1]['url'].endswith('/anuncio/4-5'), "Results map back to page numbers"
+        assert durations[1] < PAGE_DELAY * 3, "Pages 2-4 should run in parallel after the probe"
+        assert elapsed < PAGE_DELAY * 5, "Probe, batch and retry: three rounds, not five"
+        return True
+    finally:
+        server.shutdown()
+
+
+def test_old_curl_write_out():
+    """Write-out lines a curl older than 7.75 prints literally are reported, and pages judged by their files."""
+    print("\n" + "="*60)
+    print("TEST 2: Unparsable write-out")
+    print("="*60)
+    
+    old_format = "2\t%{exitcode}\t5120\t%{errormsg}\ncurl: unknown --write-out variable: 'exitcode'\n"
+    errors, sizes, unparsed = CurlDirectScraper._parse_write_out(old_format + "3\t0\t900\t\n")
+    assert errors == {} and sizes == {3: 900}, "Well-formed lines are still used"
+    assert len(unparsed) == 2, "Literal variables and curl's complaint are reported"
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    original_run = scraper_curl.subprocess.run
+    
+    def old_curl_run(*args, **kwargs):
+        result = original_run(*args, **kwargs)
+        # What curl 7.74 prints for "%{exitcode}" and "%{errormsg}"
+        result.stderr = re.sub(r"^(\d+)\t\d+\t(\d+)\t.*$", r"\1\t%{exitcode}\t\2\t%{errormsg}",
+                               result.stderr, flags=re.MULTILINE)
+        return result
+    
+    try:
+        with _local_setup(run=old_curl_run):
+            scraper = CurlDirectScraper(max_concurrency=4)
+            scraper.base_url = f"http://127.0.0.1:{server.server_port}/search.html"
+            outcomes = scraper._scrape_pages_curl("old", [2, 3, 4], {})
+        print(f"✅ {({page: type(o).__name__ if isinstance(o, Exception) else len(o) for page, o in outcomes.items()})}")
+        assert len(outcomes[2]) == 5 and len(outcomes[4]) == 5, "Pages that downloaded are read from their files"
+        assert isinstance(outcomes[3], Exception) and "500" in str(outcomes[3]), "The 500 is still an error"
+        return True
+    finally:
+        server.shutdown()
+
+
+def test_batches_follow_the_burst():
+    """No curl run fires more requests at once than the host's bucket lets through."""
+    print("\n" + "="*60)
+    print("TEST 3: Burst-sized batches")
+    print("="*60)
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    batches = []
+    original_run = scraper_curl.subprocess.run
+    
+    def counting_run(*args, **kwargs):
+        batches.append(re.findall(r'page=(\d+)"$', kwargs['input'], re.MULTILINE))
+        return original_run(*args, **kwargs)
+    
+    try:
+        with _local_setup(run=counting_run, burst=2):
+            scraper = CurlDirectScraper(max_concurrency=8)
+            scraper.base_url = f"http://127.0.0.1:{server.server_port}/search.html"
+            outcomes = scraper._scrape_pages_curl("burst", [2, 4, 5, 6, 7], {})
+        print(f"✅ curl runs: {batches}")
+        assert batches == [['2', '4'], ['5', '6'], ['7']]
+        assert sorted(outcomes) == [2, 4, 5, 6, 7] and len(outcomes[7]) == 5
+        return True
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    passed = test_single_process_batch() and test_old_curl_write_out() and test_batches_follow_the_burst()
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
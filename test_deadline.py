@@ -0,0 +1,187 @@
+"""Offline test for the scrape time budget (deadline) and its propagation to the backends."""
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import config
+import src.scraper_curl as scraper_curl
+import src.scraper_requests as scraper_requests
+from src.deadline import Deadline, DeadlineExceeded
+from src.page_results import flatten_pages
+from src.rate_limiter import RateLimiter
+from src.response_cache import ResponseCache
+from src.retry_policy import RetryBudget
+from src.scraper_curl import CurlDirectScraper
+from src.scraper_requests import RequestsScraper
+
+PAGE_DELAY = 1.0  # seconds the local server takes per page
+
+# Local server: don't let the production pacing dominate the timings
+for module in (scraper_requests, scraper_curl):
+    module.rate_limiter = RateLimiter(rate=100, burst=10)
+    module.response_cache = ResponseCache(directory=tempfile.mkdtemp())
+
+
+def _listing_page(page_num: int) -> str:
+    """Build a fake results page with a handful of listing links."""
+    items = "".join(
+        f'<a href="/anuncio/{page_num}-{i}" title="Car {page_num}-{i}">Car {page_num}-{i} {100 * i} USD</a>'
+        for i in range(1, 6)
+    )
+    return f"<html><body>{items}{' ' * 1000}</body></html>"
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        page_num = int(params.get('page', ['1'])[0])
+        time.sleep(PAGE_DELAY)
+        body = _listing_page(page_num).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass  # the client gave up on this page
+    
+    def log_message(self, *args):
+        pass
+
+
+def _start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _pages_of(results: list[dict]) -> list[int]:
+    return sorted({int(r['url'].rsplit('/', 1)[-1].split('-')[0]) for r in results})
+
+
+def test_deadline_primitives():
+    """Timeouts are capped, waits that would overrun are refused."""
+    print("\n" + "="*60)
+    print("TEST 1: Deadline, rate limiter and retry budget")
+    print("="*60)
+    
+    unbounded = Deadline()
+    assert not unbounded.bounded and not unbounded.expired()
+    assert unbounded.timeout(15) == 15
+    
+    deadline = Deadline(2.0)
+    assert 1.5 < deadline.timeout(15) <= 2.0, "A request timeout is capped at the time left"
+    assert Deadline.of(deadline, budget_s=1.0).remaining() <= 1.0, "The earlier deadline wins"
+    assert Deadline.of(time.monotonic() + 1.0).remaining() <= 1.0
+    
+    start = time.perf_counter()
+    assert deadline.sleep(5) is False, "A wait past the deadline is skipped"
+    assert time.perf_counter() - start < 0.1
+    
+    try:
+        Deadline(0.1).timeout(15)
+        raise AssertionError("No request may start without time for it")
+    except DeadlineExceeded:
+        pass
+    print("✅ timeouts capped, overrunning waits skipped")
+    
+    # One token every 5 seconds: the second request would wait past a 1 s deadline
+    limiter = RateLimiter(rate=0.2, burst=1)
+    url = "https://example.com/search"
+    limiter.acquire(url, Deadline(1.0))
+    start = time.perf_counter()
+    try:
+        limiter.acquire(url, Deadline(1.0))
+        raise AssertionError("The rate limiter must not wait past the deadline")
+    except DeadlineExceeded:
+        pass
+    assert time.perf_counter() - start < 0.1, "It refuses at once instead of sleeping"
+    limiter.acquire(url, Deadline(10.0))  # the refused token was given back: ~5 s wait fits
+    print("✅ rate limiter refuses (and refunds) a wait past the deadline")
+    
+    budget = RetryBudget(retries=5, deadline=Deadline(1.0))
+    assert not budget.take(2.0), "No retry whose backoff overruns the deadline"
+    assert budget.take(0.1) and budget.spent == 1
+    assert RetryBudget(retries=5).take(60.0), "Without a deadline only the count matters"
+    print("✅ retry budget refuses a backoff past the deadline")
+    return True
+
+
+def test_requests_partial_results():
+    """RequestsScraper returns the pages it got within the budget, sync and async."""
+    print("\n" + "="*60)
+    print("TEST 2: RequestsScraper within a budget")
+    print("="*60)
+    
+    server = _start_server()
+    try:
+        base_url = f"http://127.0.0.1:{server.server_port}/search.html"
+        
+        # Sequential: pages 1 and 2 take ~2 s, then no time is left for page 3
+        scraper_requests.response_cache.clear()
+        scraper = RequestsScraper()
+        scraper.base_url = base_url
+        start = time.perf_counter()
+        results = scraper.scrape("car", max_pages=5, budget_s=2.3)
+        elapsed = time.perf_counter() - start
+        print(f"✅ sync: pages {_pages_of(results)} in {elapsed:.2f}s")
+        assert _pages_of(results) == [1, 2], "Pages fetched in time are returned"
+        assert elapsed < 2.3 + 0.3, "The scrape ends at its deadline"
+        
+        # Concurrent: page 1 first (it tells how many pages there are), then
+        # ASYNC_MAX_CONCURRENCY pages at once; the rest find no time left
+        scraper_requests.response_cache.clear()
+        scraper = RequestsScraper()
+        scraper.base_url = base_url
+        start = time.perf_counter()
+        results = scraper.scrape_concurrent("car", max_pages=5, budget_s=2.8)
+        elapsed = time.perf_counter() - start
+        print(f"✅ async: pages {_pages_of(results)} in {elapsed:.2f}s")
+        assert _pages_of(results) == list(range(1, config.ASYNC_MAX_CONCURRENCY + 2))
+        assert elapsed < 2.8 + 0.3
+        assert scraper.retry_budget.spent == 0, "Requests cut off by the deadline are not retried"
+        
+        # No time at all: nothing is requested and nothing is raised
+        scraper = RequestsScraper()
+        scraper.base_url = base_url
+        scraper.deadline = Deadline(0.1)
+        outcomes = scraper.scrape_pages("truck", [1, 2])
+        assert all(isinstance(o, DeadlineExceeded) for o in outcomes.values())
+        assert flatten_pages(outcomes) == [], "Pages out of time are skipped, not failures"
+        print("✅ an exhausted budget yields no pages and no error")
+    finally:
+        server.shutdown()
+    return True
+
+
+def test_curl_partial_results():
+    """The curl batch is cut off at the deadline and keeps the pages that completed."""
+    print("\n" + "="*60)
+    print("TEST 3: curl-direct within a budget")
+    print("="*60)
+    
+    server = _start_server()
+    try:
+        scraper_curl.response_cache.clear()
+        scraper = CurlDirectScraper(max_concurrency=1)
+        scraper.base_url = f"http://127.0.0.1:{server.server_port}/search.html"
+        start = time.perf_counter()
+        results = scraper.scrape("car", max_pages=5, budget_s=2.6)
+        elapsed = time.perf_counter() - start
+        print(f"✅ curl: pages {_pages_of(results)} in {elapsed:.2f}s")
+        assert _pages_of(results) == [1, 2], "The pages that completed before the cut-off are kept"
+        assert elapsed < 2.6 + 0.5
+    finally:
+        server.shutdown()
+    return True
+
+
+if __name__ == "__main__":
+    passed = (test_deadline_primitives() and test_requests_partial_results()
+              and test_curl_partial_results())
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,210 @@
+"""Offline test: HTTP/2 multiplexing vs the HTTP/1.1 requests engine on a local TLS server."""
+import asyncio
+import contextlib
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qs
+
+try:
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+except ImportError:
+    serve = None
+
+import src.scraper_requests as scraper_requests
+from src.rate_limiter import RateLimiter
+from src.response_cache import ResponseCache
+from src.scraper_requests import RequestsScraper
+
+PAGE_DELAY = 0.2  # seconds of simulated server time per request
+PAGES = 10
+DETAILS = 20
+
+
+def _listing_page(page_num: int) -> str:
+    """Build a fake results page with a handful of listing links."""
+    items = "".join(
+        f'<a href="/anuncio/{page_num}-{i}" title="Car {page_num}-{i}">Car {page_num}-{i} {100 * i} USD</a>'
+        for i in range(1, 6)
+    )
+    return f"<html><body><p>{PAGES * 5} anuncios</p>{items}{' ' * 1000}</body></html>"
+
+
+class _Server:
+    """hypercorn serving result and detail pages over TLS; records each request's connection."""
+    
+    def __init__(self, cert_dir: Path, alpn: list[str]):
+        self.connections = set()  # (http_version, client port)
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+        
+        self.config = Config()
+        self.config.bind = [f"127.0.0.1:{self.port}"]
+        self.config.certfile = str(cert_dir / "cert.pem")
+        self.config.keyfile = str(cert_dir / "key.pem")
+        self.config.alpn_protocols = alpn
+        self.config.accesslog = None
+        self.config.errorlog = None
+        
+        self._loop = asyncio.new_event_loop()
+        self._stop = None
+        started = threading.Event()
+        threading.Thread(target=self._run, args=(started,), daemon=True).start()
+        started.wait(5)
+        time.sleep(0.3)
+    
+    async def app(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        self.connections.add((scope['http_version'], scope['client'][1]))
+        await asyncio.sleep(PAGE_DELAY)
+        page_num = int(parse_qs(scope['query_string'].decode()).get('page', ['1'])[0])
+        body = _listing_page(page_num).encode()
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/html; charset=utf-8'),
+                                (b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body})
+    
+    def _run(self, started: threading.Event):
+        asyncio.set_event_loop(self._loop)
+        self._stop = asyncio.Event()
+        started.set()
+        self._loop.run_until_complete(serve(self.app, self.config, shutdown_trigger=self._stop.wait))
+    
+    def url(self) -> str:
+        return f"https://localhost:{self.port}/search.html"
+    
+    def shutdown(self):
+        self._loop.call_soon_threadsafe(self._stop.set)
+
+
+def _make_cert(cert_dir: Path) -> bool:
+    """Self-signed certificate for localhost (trusted while _local_setup() is active)."""
+    if not shutil.which("openssl"):
+        return False
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-keyout", str(cert_dir / "key.pem"), "-out", str(cert_dir / "cert.pem"),
+         "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost"],
+        check=True, capture_output=True
+    )
+    return True
+
+
+@contextlib.contextmanager
+def _local_setup(cert_dir: Path):
+    """
+    Trust the test certificate (httpx reads SSL_CERT_FILE when a client is
+    created) and skip the production pacing and cache, for one test only.
+    """
+    saved_env = os.environ.get('SSL_CERT_FILE')
+    saved = (scraper_requests.rate_limiter, scraper_requests.response_cache)
+    os.environ['SSL_CERT_FILE'] = str(cert_dir / "cert.pem")
+    scraper_requests.rate_limiter = RateLimiter(rate=1000, burst=100)
+    scraper_requests.response_cache = ResponseCache(directory=tempfile.mkdtemp())
+    try:
+        yield
+    finally:
+        scraper_requests.rate_limiter, scraper_requests.response_cache = saved
+        if saved_env is None:
+            os.environ.pop('SSL_CERT_FILE', None)
+        else:
+            os.environ['SSL_CERT_FILE'] = saved_env
+
+
+def _run(scraper: RequestsScraper, server: '_Server') -> tuple:
+    """
+    Scrape PAGES result pages, then DETAILS detail pages.
+    
+    Returns:
+        (seconds, listings, details, [server connections of each of the two calls])
+    """
+    scraper_requests.response_cache.clear()
+    scraper.base_url = server.url()
+    connections = []
+    start = time.perf_counter()
+    server.connections.clear()
+    listings = [l for page in scraper.scrape_pages("car", range(1, PAGES + 1)).values() for l in page]
+    connections.append(set(server.connections))
+    server.connections.clear()
+    details = scraper.fetch_details(
+        server.url().replace("/search.html", f"/anuncio/{i}") for i in range(DETAILS)
+    )
+    connections.append(set(server.connections))
+    return time.perf_counter() - start, listings, details, connections
+
+
+def test_http2_multiplexing():
+    """HTTP/2 multiplexes the pages, then the details, over one connection kept warm across calls."""
+    print("\n" + "="*60)
+    print("TEST 1: HTTP/2 vs HTTP/1.1 connections")
+    print("="*60)
+    
+    cert_dir = Path(tempfile.mkdtemp())
+    if serve is None or scraper_requests.h2 is None or not _make_cert(cert_dir):
+        print("⚠️ Skipped: needs hypercorn, h2 and openssl")
+        return True
+    
+    server = _Server(cert_dir, ['h2', 'http/1.1'])
+    try:
+        with _local_setup(cert_dir):
+            h1_time, h1_listings, h1_details, h1_calls = _run(RequestsScraper(), server)
+            scraper = RequestsScraper(http2=True)
+            h2_time, h2_listings, h2_details, h2_calls = _run(scraper, server)
+            _, _, _, next_search = _run(RequestsScraper(http2=True), server)
+        
+        # Timings are for information only: localhost on a busy machine is no benchmark
+        requests_made = PAGES + DETAILS
+        print(f"HTTP/1.1: {h1_time:.2f}s, connections per call {[len(c) for c in h1_calls]}")
+        print(f"HTTP/2:   {h2_time:.2f}s, connections per call {[len(c) for c in h2_calls]}")
+        print(f"✅ Responses by protocol: {dict(scraper.http_versions)}")
+        
+        assert len(h2_listings) == len(h1_listings) == PAGES * 5, "Both protocols extract every page"
+        assert all(h2_details.values()) and len(h2_details) == DETAILS, "Every detail page downloaded"
+        assert scraper.http_versions == {'HTTP/2': requests_made}, "Every request negotiated HTTP/2"
+        assert all({version for version, _ in call} == {'2'} for call in h2_calls)
+        assert [len(call) for call in h2_calls] == [1, 1], "Each call shares one connection"
+        assert h2_calls[0] == h2_calls[1] == next_search[0], "Later calls and searches reuse the warm connection"
+        assert all({version for version, _ in call} == {'1.1'} for call in h1_calls)
+        return True
+    finally:
+        server.shutdown()
+
+
+def test_falls_back_to_http1():
+    """A server that only offers HTTP/1.1 is scraped normally in HTTP/2 mode."""
+    print("\n" + "="*60)
+    print("TEST 2: HTTP/1.1-only server")
+    print("="*60)
+    
+    cert_dir = Path(tempfile.mkdtemp())
+    if serve is None or scraper_requests.h2 is None or not _make_cert(cert_dir):
+        print("⚠️ Skipped: needs hypercorn, h2 and openssl")
+        return True
+    
+    server = _Server(cert_dir, ['http/1.1'])
+    try:
+        with _local_setup(cert_dir):
+            scraper = RequestsScraper(http2=True)
+            _, listings, _, _ = _run(scraper, server)
+        
+        print(f"✅ {len(listings)} listings, responses by protocol: {dict(scraper.http_versions)}")
+        assert len(listings) == PAGES * 5
+        assert set(scraper.http_versions) == {'HTTP/1.1'}, "ALPN settles on HTTP/1.1"
+        return True
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    passed = test_http2_multiplexing() and test_falls_back_to_http1()
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
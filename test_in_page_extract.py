@@ -0,0 +1,155 @@
+"""Offline test for finding and reading a page's listings in few evaluate() round trips (with fake pages)."""
+import logging
+import sys
+
+import config
+from src.scraper import RevolicoScraper
+
+
+class FakeElement:
+    """An element handle that counts the browser round trips made through it."""
+    
+    def __init__(self, page, fields: dict):
+        self.page = page
+        self.fields = fields
+    
+    def query_selector(self, selector):
+        self.page.round_trips += 1
+        if selector in self.fields:
+            return FakeElement(self.page, {'text': self.fields[selector]})
+        return None
+    
+    def inner_text(self):
+        self.page.round_trips += 1
+        return self.fields['text']
+    
+    def get_attribute(self, name):
+        self.page.round_trips += 1
+        return self.fields['text']
+
+
+class FakePage:
+    def __init__(self, rows=None):
+        self.rows = rows
+        self.round_trips = 0
+        self.evaluated = []
+    
+    def evaluate(self, script, arg):
+        self.round_trips += 1
+        self.evaluated.append(arg)
+        if self.rows is None:
+            raise RuntimeError("Execution context was destroyed")
+        return self.rows
+
+
+def _listings(page, count):
+    return [FakeElement(page, {'h2, h3': f" Car {i} ", '[class*="price"]': "100 USD", 'a': f"/item/{i}"})
+            for i in range(count)]
+
+
+def test_one_round_trip():
+    """All listings come back from one evaluate() call, normalised like the per-element path."""
+    print("\n" + "="*60)
+    print("TEST 1: One round trip per page")
+    print("="*60)
+    
+    rows = [{'titulo': f" Car {i} ", 'precio_raw': "100 USD", 'url': f"/item/{i}"} for i in range(50)]
+    page = FakePage(rows)
+    listings = _listings(page, 50)
+    scraper = RevolicoScraper()
+    items = scraper._extract_listings(page, listings)
+    
+    print(f"✅ 50 listings in {page.round_trips} round trip(s)")
+    assert page.round_trips == 1
+    arg = page.evaluated[0]
+    assert arg['listings'] == listings and arg['title'] == RevolicoScraper.TITLE_SELECTORS
+    assert arg['price'] == RevolicoScraper.PRICE_SELECTORS and arg['link'] == RevolicoScraper.LINK_SELECTORS
+    assert items[0] == {'titulo': "Car 0", 'precio_raw': "100 USD", 'url': f"{config.REVOLICO_BASE_URL}/item/0"}
+    assert items == [scraper._extract_listing_data(listing) for listing in listings], \
+        "Same data as querying each listing"
+    return True
+
+
+def test_fallback_to_element_queries():
+    """If the script fails (or the mode is off) each listing is queried as before."""
+    print("\n" + "="*60)
+    print("TEST 2: Per-element fallback")
+    print("="*60)
+    
+    page = FakePage(rows=None)
+    listings = _listings(page, 3)
+    items = RevolicoScraper()._extract_listings(page, listings)
+    print(f"✅ fallback took {page.round_trips} round trips")
+    assert [item['titulo'] for item in items] == ["Car 0", "Car 1", "Car 2"]
+    assert page.round_trips > 3
+    
+    saved = config.BROWSER_EXTRACT_IN_PAGE
+    config.BROWSER_EXTRACT_IN_PAGE = False
+    try:
+        page = FakePage(rows=[])
+        assert len(RevolicoScraper()._extract_listings(page, _listings(page, 2))) == 2
+        assert page.evaluated == [], "No script when the mode is off"
+    finally:
+        config.BROWSER_EXTRACT_IN_PAGE = saved
+    return True
+
+
+class ProbedPage:
+    """A page with ``matches`` elements per selector, answering the selector probe."""
+    
+    def __init__(self, matches: dict):
+        self.matches = matches
+        self.round_trips = 0
+        self.probes = []
+    
+    def evaluate(self, script, arg):
+        self.round_trips += 1
+        self.probes.append(arg)
+        return {'counts': [self.matches.get(selector, 0) for selector in arg['selectors']],
+                'elements': 500 if arg['debug'] else None}
+    
+    def query_selector_all(self, selector):
+        self.round_trips += 1
+        return [selector] * self.matches[selector]
+    
+    def content(self):
+        raise AssertionError("The DOM is not serialised to find listings")
+
+
+def test_selector_probe():
+    """All candidate selectors are counted at once; only the winner's elements are fetched."""
+    print("\n" + "="*60)
+    print("TEST 3: One-shot selector probe")
+    print("="*60)
+    
+    scraper = RevolicoScraper()
+    page = ProbedPage({'article': 3, 'div[class*="card"]': 20, 'a[href*="/anuncio/"]': 20})
+    listings = scraper._find_listings(page)
+    print(f"✅ {len(listings)} listings of {listings[0]} in {page.round_trips} round trips")
+    assert listings == ['div[class*="card"]'] * 20, "The first selector with more than 5 matches wins"
+    assert page.round_trips == 2
+    
+    page = ProbedPage({'[data-cy="listing"]': 2, 'article': 30})
+    assert scraper._find_listings(page) == ['[data-cy="listing"]'] * 2, "Any data-cy listing wins"
+    
+    page = ProbedPage({'article': 4})
+    assert scraper._find_listings(page) == [] and page.round_trips == 1, "No winner: nothing fetched"
+    
+    logger = logging.getLogger('src.scraper')
+    saved = logger.level
+    logger.setLevel(logging.INFO)
+    try:
+        scraper._find_listings(page)
+        assert page.probes[-1]['debug'] is False, "No debug-only work without debug logging"
+        logger.setLevel(logging.DEBUG)
+        scraper._find_listings(page)
+        assert page.probes[-1]['debug'] is True
+    finally:
+        logger.setLevel(saved)
+    return True
+
+
+if __name__ == "__main__":
+    passed = test_one_round_trip() and test_fallback_to_element_queries() and test_selector_probe()
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,58 @@
+"""Offline test for per-page backend fallback."""
+import sys
+import tempfile
+from pathlib import Path
+
+import src.scraper as scraper_module
+from src.backend_stats import BackendStats
+from src.challenge import ChallengeBlocked
+from src.scraper import RevolicoScraper
+
+
+def _listing(name: str) -> dict:
+    return {'titulo': name, 'precio_raw': '100 USD', 'url': f'https://revolico.com/anuncio/{name}'}
+
+
+def test_failed_pages_retried_on_next_backend():
+    """Only the pages a backend failed are sent to the next one."""
+    print("\n" + "="*60)
+    print("TEST 1: Per-page fallback with merged, deduplicated results")
+    print("="*60)
+    
+    requested = {}
+    
+    def fake_backend(backend, query, page_nums):
+        requested[backend] = list(page_nums)
+        if not requested.get('first'):
+            requested['first'] = backend
+            return {
+                1: [_listing('a'), _listing('b')],
+                2: ChallengeBlocked("https://revolico.com/search.html?page=2", 200, 'Just a moment'),
+                3: [_listing('c')],
+            }
+        # The page shifted: 'c' is repeated on the page served by the second backend
+        return {page_num: [_listing('c'), _listing('d')] for page_num in page_nums}
+    
+    saved = scraper_module.backend_stats
+    scraper_module.backend_stats = BackendStats(path=Path(tempfile.mkdtemp()) / "stats.json")
+    try:
+        scraper = RevolicoScraper()
+        scraper._run_backend = fake_backend
+        results = scraper.scrape("car", max_pages=3)
+    finally:
+        scraper_module.backend_stats = saved
+    
+    first = requested.pop('first')
+    second = next(backend for backend in requested if backend != first)
+    print(f"✅ Requested: {requested}, sources: {scraper.page_sources}")
+    assert requested[second] == [2], "Only the blocked page is retried"
+    assert len(requested) == 2, "No third backend once every page is served"
+    assert scraper.page_sources == {1: first, 2: second, 3: first}
+    assert [r['titulo'] for r in results] == ['a', 'b', 'c', 'd'], "Merged in page order without duplicates"
+    return True
+
+
+if __name__ == "__main__":
+    passed = test_failed_pages_retried_on_next_backend()
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,105 @@
+"""Offline test for harvesting browser pages once ready instead of after fixed sleeps (with fakes)."""
+import sys
+import time
+
+import config
+from src.deadline import Deadline
+from src.page_ready import wait_until_ready, wait_until_ready_selenium
+
+
+class FakeDriver:
+    """A Selenium driver whose page becomes ready after ``ready_after`` seconds."""
+    
+    def __init__(self, ready_after: float, fail_first: int = 0):
+        self.ready_at = time.perf_counter() + ready_after
+        self.failures = fail_first
+        self.checks = 0
+    
+    def execute_script(self, script, arg):
+        self.checks += 1
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("stale element reference")
+        if 'window.__pageReady' in script and 'querySelectorAll' not in script:
+            return {'count': 0, 'challenge': True, 'since': 0}
+        if time.perf_counter() >= self.ready_at:
+            return {'count': 12, 'challenge': False}
+        return False
+
+
+class FakePage:
+    """A Playwright page; wait_for_function polls in the page, so it just sleeps here."""
+    
+    def __init__(self, ready_after: float):
+        self.ready_after = ready_after
+        self.timeouts = []
+    
+    def wait_for_function(self, script, arg, polling, timeout):
+        self.timeouts.append(timeout)
+        if self.ready_after * 1000 > timeout:
+            time.sleep(timeout / 1000)
+            raise TimeoutError(f"Timeout {timeout}ms exceeded.")
+        time.sleep(self.ready_after)
+        return FakeHandle({'count': 20, 'challenge': False})
+    
+    def evaluate(self, script, token):
+        assert token.startswith("wait")
+        return {'count': 0, 'challenge': True, 'since': 0}
+
+
+class FakeHandle:
+    def __init__(self, value):
+        self.value = value
+    
+    def json_value(self):
+        return self.value
+
+
+def test_ready_as_soon_as_rendered():
+    """The wait ends when the page is ready, not after a fixed time."""
+    print("\n" + "="*60)
+    print("TEST 1: Harvest when ready")
+    print("="*60)
+    
+    outcome = wait_until_ready(FakePage(ready_after=0.2), "article", cap=5)
+    print(f"✅ Playwright: {outcome}")
+    assert outcome['ready'] and outcome['listings'] == 20 and outcome['waited'] < 1
+    
+    driver = FakeDriver(ready_after=0.3, fail_first=2)
+    outcome = wait_until_ready_selenium(driver, "article", cap=5)
+    print(f"✅ Selenium: {outcome} after {driver.checks} checks")
+    assert outcome['ready'] and outcome['listings'] == 12
+    assert outcome['waited'] < 0.3 + 2 * config.PAGE_READY_POLL_MS / 1000, "Ready within a poll interval"
+    return True
+
+
+def test_hard_cap_and_deadline():
+    """A page that never gets ready is given up on at the cap, sooner if the deadline needs it."""
+    print("\n" + "="*60)
+    print("TEST 2: Hard cap")
+    print("="*60)
+    
+    outcome = wait_until_ready_selenium(FakeDriver(ready_after=60), "article", cap=0.3)
+    print(f"✅ capped: {outcome}")
+    assert not outcome['ready'] and outcome['challenge'], "The last state is reported"
+    assert 0.3 <= outcome['waited'] < 0.6
+    
+    page = FakePage(ready_after=60)
+    outcome = wait_until_ready(page, "article", cap=0.3)
+    assert not outcome['ready'] and outcome['challenge'] and page.timeouts == [300]
+    
+    page = FakePage(ready_after=60)
+    wait_until_ready(page, "article", deadline=Deadline(config.DEADLINE_MIN_REQUEST + 0.2))
+    assert page.timeouts[0] <= 200, "Time is left for the next request"
+    
+    page = FakePage(ready_after=60)
+    outcome = wait_until_ready(page, "article", deadline=Deadline(0.1))
+    print(f"✅ out of time: {outcome}")
+    assert not outcome['ready'] and outcome['waited'] < 0.1, "No wait without time left"
+    return True
+
+
+if __name__ == "__main__":
+    passed = test_ready_as_soon_as_rendered() and test_hard_cap_and_deadline()
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
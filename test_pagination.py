@@ -0,0 +1,115 @@
+"""Offline test for pagination end detection."""
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import src.scraper_requests as scraper_requests
+from src.pagination import Paginator, detect_last_page, estimate_last_page
+from src.rate_limiter import RateLimiter
+from src.response_cache import ResponseCache
+from src.scraper_requests import RequestsScraper
+
+
+def _listing(name: str) -> dict:
+    return {'titulo': name, 'precio_raw': '1 USD', 'url': f'https://revolico.com/anuncio/{name}'}
+
+
+def test_detect_last_page():
+    """Pagination links give the last page; the total-count text is only an estimate."""
+    print("\n" + "="*60)
+    print("TEST 1: Last page from markup, empty and repeated pages")
+    print("="*60)
+    
+    assert detect_last_page("<p>1.234 anuncios</p>", 1) is None, "A count alone does not end the results"
+    assert estimate_last_page("<p>1.234 anuncios</p>", per_page=20) == 62
+    assert detect_last_page('<a href="?q=car&amp;page=2">2</a><a href="?q=car&amp;page=9" rel="last">»</a>'
+                            '<a rel="next" href="?q=car&amp;page=2">', 1) == 9
+    assert detect_last_page('<a rel="next" href="?page=2">2</a> <a href="?page=7">Última</a>', 1) == 7
+    assert detect_last_page('<a href="?q=car&page=2">2</a><a rel="next" href="?q=car&page=3">', 2) is None
+    assert detect_last_page('<a href="?q=car&page=1">1</a><a href="?q=car&page=2">2</a>', 2) == 2
+    assert detect_last_page("<html>no pagination here</html>", 3) is None
+
+    paginator = Paginator()
+    paginator.observe(1, [_listing('a'), _listing('b')])
+    paginator.observe(2, [_listing('a'), _listing('b')])
+    assert paginator.last_page == 1, "A repeated page ends the results"
+
+    paginator = Paginator()
+    paginator.observe(1, [_listing('a')], "<html></html>")
+    paginator.observe(2, [], "<html>No hay resultados</html>")
+    assert paginator.last_page == 1 and paginator.plan(range(1, 5)) == [1], "An empty page ends the results"
+    
+    paginator = Paginator()
+    paginator.observe(1, [], "<html><div class='new-layout'>...</div></html>")
+    assert paginator.last_page is None, "An empty first page may be a parse failure"
+    paginator.observe(1, [], "<html><p>No se encontraron anuncios</p></html>")
+    assert paginator.last_page == 0, "Unless it says there are no results"
+    
+    paginator = Paginator()
+    promoted = _listing('promoted')
+    paginator.observe(1, [promoted, promoted] + [_listing(f'p1-{i}') for i in range(4)], "<p>15 anuncios</p>")
+    assert paginator.per_page == 5, "A listing shown twice counts once"
+    assert paginator.estimated_last_page == 3 and paginator.last_page is None, "The count is only a hint"
+    print("✅ Markup, repeated and empty pages detected")
+    return True
+
+
+class _ThreePageHandler(BaseHTTPRequestHandler):
+    requested = []
+    
+    def do_GET(self):
+        page_num = int(parse_qs(urlparse(self.path).query).get('page', ['1'])[0])
+        type(self).requested.append(page_num)
+        items = "".join(
+            f'<a href="/anuncio/{page_num}-{i}" title="Car {page_num}-{i}">Car {page_num}-{i} {100 * i} USD</a>'
+            for i in range(1, 6)
+        )
+        if page_num == 1:
+            # A promoted listing shown twice, and a count that leaves it out:
+            # 12 / 6 per page would wrongly end the results at page 2
+            items += '<a href="/anuncio/1-1" title="Car 1-1">Car 1-1 100 USD</a>'
+        pagination = '<a href="?q=car&amp;page=3" rel="last">Última</a>'
+        body = f"<html><body><p>12 anuncios</p>{items}{pagination}{' ' * 1000}</body></html>".encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_concurrent_fetch_plans_pages():
+    """The concurrent fetcher stops at the last page the markup links to, not at the count estimate."""
+    print("\n" + "="*60)
+    print("TEST 2: Only existing pages are requested")
+    print("="*60)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _ThreePageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    saved = (scraper_requests.rate_limiter, scraper_requests.response_cache)
+    scraper_requests.rate_limiter = RateLimiter(rate=100, burst=10)
+    scraper_requests.response_cache = ResponseCache(directory=tempfile.mkdtemp())
+    try:
+        scraper = RequestsScraper()
+        scraper.base_url = f"http://127.0.0.1:{server.server_port}/search.html"
+        results = scraper.scrape_concurrent("car", max_pages=8)
+        
+        urls = {listing['url'] for listing in results}
+        print(f"✅ Requested pages {sorted(_ThreePageHandler.requested)}, {len(urls)} unique listings")
+        assert sorted(_ThreePageHandler.requested) == [1, 2, 3], "The last-page link ends the results"
+        assert scraper.paginator.last_page == 3
+        assert len(urls) == 15
+        return True
+    finally:
+        scraper_requests.rate_limiter, scraper_requests.response_cache = saved
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    passed = all([test_detect_last_page(), test_concurrent_fetch_plans_pages()])
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
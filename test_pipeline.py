@@ -0,0 +1,214 @@
+"""Offline test for overlapping page parsing with the next page's download."""
+import contextlib
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import config
+import src.scraper_requests as scraper_requests
+import src.scraper_ultimate as scraper_ultimate
+from src.pagination import Paginator
+from src.pipeline import PagePipeline, pipeline_stats
+from src.rate_limiter import RateLimiter
+from src.response_cache import ResponseCache
+from src.scraper_requests import RequestsScraper
+from src.scraper_ultimate import UltraPotentScraper
+
+PAGE_DELAY = 0.3  # seconds of simulated network wait per page
+PARSE_DELAY = 0.3  # seconds of simulated BeautifulSoup work per page
+
+
+@contextlib.contextmanager
+def _local_setup(scraper_class):
+    """
+    No production pacing, an empty cache and a listing extraction that
+    takes PARSE_DELAY longer in scraper_class, for one test only.
+    """
+    modules = (scraper_requests, scraper_ultimate)
+    saved = [(module.rate_limiter, module.response_cache) for module in modules]
+    saved_pipeline = config.SCRAPER_PIPELINE
+    extract = scraper_class._extract_listings
+    
+    def slow_extract(self, html):
+        time.sleep(PARSE_DELAY)
+        return extract(self, html)
+    
+    scraper_class._extract_listings = slow_extract
+    for module in modules:
+        module.rate_limiter = RateLimiter(rate=100, burst=10)
+        module.response_cache = ResponseCache(directory=tempfile.mkdtemp())
+    try:
+        yield
+    finally:
+        scraper_class._extract_listings = extract
+        config.SCRAPER_PIPELINE = saved_pipeline
+        for module, (rate_limiter, response_cache) in zip(modules, saved):
+            module.rate_limiter, module.response_cache = rate_limiter, response_cache
+
+
+def _listing_page(page_num: int) -> str:
+    """Build a fake results page with a handful of listing links."""
+    items = "".join(
+        f'<a href="/anuncio/{page_num}-{i}" title="Car {page_num}-{i}">Car {page_num}-{i} {100 * i} USD</a>'
+        for i in range(1, 6)
+    )
+    return f"<html><body>{items}{' ' * 1000}</body></html>"
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        page_num = int(params.get('page', ['1'])[0])
+        time.sleep(PAGE_DELAY)
+        body = _listing_page(page_num).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+def _start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_pipeline_overlaps_parse_with_fetch():
+    """Page N is parsed while page N+1 downloads; results stay in page order."""
+    print("\n" + "="*60)
+    print("TEST 1: PagePipeline overlap")
+    print("="*60)
+    
+    parsed = []
+    
+    def fetch(page_num):
+        time.sleep(PAGE_DELAY)
+        return page_num
+    
+    def parse(page_num, fetched):
+        time.sleep(PARSE_DELAY)
+        parsed.append(page_num)
+        if page_num == 3:
+            raise ValueError("bad page")
+        return [fetched]
+    
+    stats = {}
+    for enabled in (False, True):
+        pipeline = PagePipeline(Paginator(), enabled=enabled)
+        outcomes = pipeline.run(range(1, 5), fetch, parse)
+        stats[enabled] = pipeline.stats
+        assert list(outcomes) == [1, 2, 3, 4]
+        assert outcomes[1] == [1] and isinstance(outcomes[3], ValueError), "A failed parse is that page's outcome"
+    
+    print(f"✅ sequential: {stats[False]}")
+    print(f"✅ pipelined:  {stats[True]}")
+    assert parsed == [1, 2, 3, 4] * 2, "Pages are parsed in page order"
+    assert stats[False]['overlap_seconds'] < 0.05, "A plain loop never parses during a download"
+    assert stats[True]['overlap_seconds'] > PARSE_DELAY * 2, "Parses hide behind the next download"
+    assert stats[True]['wall_seconds'] < stats[False]['wall_seconds'] - PARSE_DELAY * 2
+    assert stats[True]['pages'] == 4
+    return True
+
+
+def test_requests_scrape_reports_overlap():
+    """RequestsScraper.scrape pipelines its pages and reports the overlap."""
+    print("\n" + "="*60)
+    print("TEST 2: RequestsScraper pipelined scrape")
+    print("="*60)
+    
+    server = _start_server()
+    try:
+        runs = {}
+        with _local_setup(RequestsScraper):
+            for enabled in (False, True):
+                config.SCRAPER_PIPELINE = enabled
+                scraper_requests.response_cache.clear()
+                scraper = RequestsScraper()
+                scraper.base_url = f"http://127.0.0.1:{server.server_port}/search.html"
+                results = scraper.scrape("car", max_pages=4)
+                runs[enabled] = (results, scraper.pipeline_stats)
+                print(f"✅ pipeline={enabled}: {len(results)} listings, {scraper.pipeline_stats}")
+        
+        assert runs[True][0] == runs[False][0] and len(runs[True][0]) == 20, "Same listings either way"
+        assert runs[True][0][0]['url'].endswith('/anuncio/1-1'), "Results keep page order"
+        assert runs[False][1]['overlap_seconds'] < 0.05
+        assert runs[True][1]['overlap_seconds'] > PARSE_DELAY * 2
+        assert runs[True][1]['wall_seconds'] < runs[False][1]['wall_seconds'] - PARSE_DELAY * 2
+        assert pipeline_stats['scrapes'] >= 2 and pipeline_stats['overlap_seconds'] > 0
+        return True
+    finally:
+        server.shutdown()
+
+
+def test_ultimate_requests_path_pipelined():
+    """UltraPotentScraper's plain-requests fallback runs through the pipeline too."""
+    print("\n" + "="*60)
+    print("TEST 3: UltraPotentScraper pipelined fallback")
+    print("="*60)
+    
+    server = _start_server()
+    try:
+        with _local_setup(UltraPotentScraper):
+            scraper = UltraPotentScraper()
+            scraper.base_url = f"http://127.0.0.1:{server.server_port}/search.html"
+            outcomes = scraper._scrape_with_requests_pages("car", range(1, 4))
+            
+            print(f"✅ pages {sorted(outcomes)}, {scraper.pipeline_stats}")
+            assert sorted(outcomes) == [1, 2, 3] and all(len(listings) == 5 for listings in outcomes.values())
+            assert scraper.pipeline_stats['overlap_seconds'] > PARSE_DELAY
+            
+            again = scraper._scrape_with_requests_pages("car", range(1, 4))
+            assert again == outcomes, "Second run is served from the cache"
+        return True
+    finally:
+        server.shutdown()
+
+
+class _EndsAt:
+    """A Paginator that learns the last page when that page is parsed."""
+    
+    def __init__(self):
+        self.last_page = None
+    
+    def wants(self, page_num):
+        return self.last_page is None or page_num <= self.last_page
+
+
+def test_downloads_stay_one_page_ahead():
+    """With parsing slower than downloading, at most one page past the end is fetched."""
+    print("\n" + "="*60)
+    print("TEST 4: One page of read-ahead")
+    print("="*60)
+    
+    paginator = _EndsAt()
+    fetched = []
+    
+    def fetch(page_num):
+        fetched.append(page_num)
+        return page_num
+    
+    def parse(page_num, data):
+        time.sleep(PARSE_DELAY / 3)
+        if page_num == 2:
+            paginator.last_page = 2
+        return [data]
+    
+    outcomes = PagePipeline(paginator, enabled=True).run(range(1, 10), fetch, parse)
+    print(f"✅ fetched {fetched}, kept {sorted(outcomes)}")
+    assert fetched == [1, 2, 3], "Only the page after the last one is fetched too early"
+    assert sorted(outcomes) == [1, 2]
+    return True
+
+
+if __name__ == "__main__":
+    passed = (test_pipeline_overlaps_parse_with_fetch() and test_requests_scrape_reports_overlap()
+              and test_ultimate_requests_path_pipelined() and test_downloads_stay_one_page_ahead())
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,193 @@
+"""Offline test for the proxy pool, using local stand-in proxy processes."""
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+import src.scraper_requests as scraper_requests
+from src.backend_stats import CHALLENGE, ERROR
+from src.proxy_pool import ProxyPool, ProxyUnavailable
+from src.rate_limiter import RateLimiter
+from src.response_cache import ResponseCache
+from src.scraper_requests import RequestsScraper
+
+# A forward proxy stand-in: answers every proxied GET itself, after ``delay``
+# seconds, as a working proxy ("ok"), a broken one ("broken": 502) or one
+# whose IP the site challenges ("challenged"). GET /stats on the proxy itself
+# reports the most requests it ever had in flight.
+STAND_IN_PROXY = r'''
+import json, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+delay, mode = float(sys.argv[1]), sys.argv[2]
+lock = threading.Lock()
+state = {'in_flight': 0, 'max_in_flight': 0}
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/stats':
+            return self.reply(200, json.dumps(state).encode())
+        with lock:
+            state['in_flight'] += 1
+            state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+        try:
+            time.sleep(delay)
+            if mode == 'broken':
+                return self.reply(502, b"")
+            if mode == 'challenged':
+                return self.reply(403, b"<html><title>Just a moment...</title>" + b" " * 2000 + b"</html>")
+            query = parse_qs(urlparse(self.path).query)['q'][0]
+            items = "".join(
+                f'<a href="/anuncio/{query}-{i}" title="Car {query}-{i}">Car {query}-{i} {100 * i} USD</a>'
+                for i in range(1, 6)
+            )
+            self.reply(200, f"<html><body>{items}{' ' * 1000}</body></html>".encode())
+        finally:
+            with lock:
+                state['in_flight'] -= 1
+    
+    def reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+print(server.server_port, flush=True)
+server.serve_forever()
+'''
+
+
+def _start_proxy(delay: float, mode: str = 'ok') -> tuple:
+    """Launch a stand-in proxy process; returns (process, proxy URL)."""
+    process = subprocess.Popen(
+        [sys.executable, "-c", STAND_IN_PROXY, str(delay), mode],
+        stdout=subprocess.PIPE, text=True
+    )
+    port = int(process.stdout.readline())
+    return process, f"http://127.0.0.1:{port}"
+
+
+def test_cooldown_and_ejection():
+    """Failing proxies rank lower, are benched, then ejected."""
+    print("\n" + "="*60)
+    print("TEST 1: Ranking, cooldown and ejection")
+    print("="*60)
+    
+    pool = ProxyPool(["http://bad:1", "http://good:2"], rate=100, burst=10)
+    with pool.lease() as lease:
+        assert lease.url == "http://bad:1", "Untried proxies are picked in configured order"
+        lease.mark(ERROR)
+    with pool.lease() as lease:
+        assert lease.url == "http://good:2", "A failed proxy ranks below an untried one"
+    
+    pool = ProxyPool(["http://bad:1"], rate=100, burst=10, cooldown=0.2,
+                     failures_before_cooldown=2, max_cooldowns=1)
+    for outcome in (ERROR, CHALLENGE):
+        with pool.lease() as lease:
+            lease.mark(outcome)
+    assert pool.stats()["http://bad:1"]['cooling_down'], "Two failures in a row start a cooldown"
+    
+    start = time.perf_counter()
+    with pool.lease() as lease:
+        waited = time.perf_counter() - start
+        lease.mark(ERROR)
+    assert waited >= 0.15, "A benched proxy is not leased until its cooldown ends"
+    with pool.lease() as lease:
+        lease.mark(ERROR)
+    
+    stats = pool.stats()
+    print(f"✅ Waited {waited:.2f}s for the cooldown; stats: {stats}")
+    assert stats["http://bad:1"]['ejected'], "Failing again after the last cooldown ejects"
+    assert stats["http://bad:1"]['challenge_rate'] == 0.25
+    try:
+        with pool.lease():
+            raise AssertionError("No proxy should be leased once all are ejected")
+    except ProxyUnavailable:
+        pass
+    return True
+
+
+def test_per_proxy_concurrency_cap():
+    """A proxy never has more than max_concurrency requests in flight."""
+    print("\n" + "="*60)
+    print("TEST 2: Per-proxy concurrency cap")
+    print("="*60)
+    
+    process, proxy_url = _start_proxy(delay=0.3)
+    try:
+        pool = ProxyPool([proxy_url], max_concurrency=2, rate=100, burst=10)
+        
+        def fetch():
+            with pool.lease() as lease:
+                requests.get("http://revolico.test/search.html?q=car",
+                             proxies=lease.requests_proxies(), timeout=5)
+        
+        threads = [threading.Thread(target=fetch) for _ in range(6)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        
+        seen = json.loads(requests.get(f"{proxy_url}/stats", timeout=5).text)
+        print(f"✅ 6 requests in {elapsed:.2f}s, at most {seen['max_in_flight']} in flight")
+        assert seen['max_in_flight'] == 2, "Requests beyond the cap wait for a slot"
+        assert elapsed >= 0.85, "Six 0.3s requests two at a time take three rounds"
+        assert pool.stats()[proxy_url]['p50'] >= 0.3, "Latency is measured per request"
+        return True
+    finally:
+        process.kill()
+
+
+def test_scraper_routes_around_bad_proxies():
+    """RequestsScraper keeps scraping through the proxy that works."""
+    print("\n" + "="*60)
+    print("TEST 3: Scraping through a pool with broken and challenged proxies")
+    print("="*60)
+    
+    stand_ins = [_start_proxy(0.0, 'broken'), _start_proxy(0.0, 'challenged'), _start_proxy(0.2)]
+    broken, challenged, good = (url for _, url in stand_ins)
+    
+    saved = (scraper_requests.rate_limiter, scraper_requests.response_cache, scraper_requests.proxy_pool)
+    scraper_requests.rate_limiter = RateLimiter(rate=100, burst=10)
+    scraper_requests.response_cache = ResponseCache(directory=tempfile.mkdtemp())
+    scraper_requests.proxy_pool = ProxyPool([broken, challenged, good], rate=100, burst=10)
+    try:
+        scraper = RequestsScraper()
+        scraper.base_url = "http://revolico.test/search.html"
+        served = []
+        for i in range(6):
+            outcome = scraper.scrape_pages(f"q{i}", [1])[1]
+            served.append(not isinstance(outcome, Exception) and len(outcome) == 5)
+        
+        stats = scraper_requests.proxy_pool.stats()
+        print(f"✅ Served: {served}; stats: {stats}")
+        assert all(served[-4:]), "Once scored, every request goes through the good proxy"
+        assert stats[broken]['error_rate'] == 1.0
+        assert stats[challenged]['challenge_rate'] == 1.0
+        assert stats[good]['attempts'] >= 4 and stats[good]['error_rate'] == 0
+        return True
+    finally:
+        scraper_requests.rate_limiter, scraper_requests.response_cache, scraper_requests.proxy_pool = saved
+        for process, _ in stand_ins:
+            process.kill()
+
+
+if __name__ == "__main__":
+    passed = all([
+        test_cooldown_and_ejection(),
+        test_per_proxy_concurrency_cap(),
+        test_scraper_routes_around_bad_proxies(),
+    ])
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,120 @@
+"""Offline test for hedged (racing) backend execution."""
+import contextlib
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import config
+import src.scraper as scraper_module
+from src.backend_stats import BackendStats
+from src.response_cache import ResponseCache
+from src.retry_policy import CircuitBreakers
+from src.scraper import RevolicoScraper
+
+LISTING = {'titulo': 'Car', 'precio_raw': '100 USD', 'url': ''}
+
+
+@contextlib.contextmanager
+def _local_setup(hedge_delay: float, max_backends: int):
+    """Race settings plus fresh backend stats, circuit breakers and cache, for one test only."""
+    saved_config = (config.RACE_HEDGE_DELAY, config.RACE_MAX_BACKENDS)
+    saved = (scraper_module.backend_stats, scraper_module.circuit_breakers, scraper_module.response_cache)
+    config.RACE_HEDGE_DELAY, config.RACE_MAX_BACKENDS = hedge_delay, max_backends
+    scraper_module.backend_stats = BackendStats(path=Path(tempfile.mkdtemp()) / "stats.json")
+    scraper_module.circuit_breakers = CircuitBreakers()
+    scraper_module.response_cache = ResponseCache(directory=tempfile.mkdtemp())
+    try:
+        yield
+    finally:
+        config.RACE_HEDGE_DELAY, config.RACE_MAX_BACKENDS = saved_config
+        scraper_module.backend_stats, scraper_module.circuit_breakers, scraper_module.response_cache = saved
+
+
+def test_hedge_beats_slow_backend():
+    """A hedged second backend answers before the stalled first one."""
+    print("\n" + "="*60)
+    print("TEST 1: Hedge after the delay, first result wins")
+    print("="*60)
+    
+    calls = []
+    lock = threading.Lock()
+    
+    def fake_backend(backend, query, page_nums):
+        with lock:
+            calls.append(backend)
+            position = len(calls)
+        time.sleep(2.0 if position == 1 else 0.1)
+        return {1: [dict(LISTING, titulo=backend)]}
+    
+    before = dict(scraper_module.race_stats)
+    with _local_setup(hedge_delay=0.2, max_backends=2):
+        scraper = RevolicoScraper()
+        scraper._run_backend = fake_backend
+        start = time.perf_counter()
+        results = scraper.scrape("car", race=True)
+        elapsed = time.perf_counter() - start
+    
+    print(f"✅ {scraper.last_race} in {elapsed:.2f}s")
+    assert elapsed < 1.0, "Should not wait for the stalled backend"
+    assert results[0]['titulo'] == calls[1], "The hedged backend wins"
+    assert scraper.last_race['abandoned'] == [calls[0]]
+    assert scraper_module.race_stats['extra_attempts'] - before['extra_attempts'] == 1
+    return True
+
+
+def test_failure_starts_next_immediately():
+    """A failed backend frees its slot without waiting for the hedge delay."""
+    print("\n" + "="*60)
+    print("TEST 2: Failures fall through without the hedge delay")
+    print("="*60)
+    
+    calls = []
+    
+    def fake_backend(backend, query, page_nums):
+        calls.append(backend)
+        if len(calls) < 3:
+            raise Exception("blocked")
+        return {1: [LISTING]}
+    
+    with _local_setup(hedge_delay=5.0, max_backends=1):
+        scraper = RevolicoScraper()
+        scraper._run_backend = fake_backend
+        start = time.perf_counter()
+        results = scraper.scrape("car", race=True)
+        elapsed = time.perf_counter() - start
+    
+    print(f"✅ {calls} in {elapsed:.2f}s")
+    assert results == [LISTING]
+    assert elapsed < 1.0
+    assert scraper.last_race['winner'] == calls[2]
+    return True
+
+
+def test_no_usable_backend():
+    """With nothing usable the race is skipped and the scrape fails with the usual message."""
+    print("\n" + "="*60)
+    print("TEST 3: No usable backend")
+    print("="*60)
+    
+    registry = scraper_module.backend_registry
+    with _local_setup(hedge_delay=0.2, max_backends=2):
+        registry.usable = lambda backends: []
+        try:
+            RevolicoScraper().scrape("x", 1, race=True)
+        except Exception as e:
+            print(f"✅ {str(e).splitlines()[0]}")
+            assert "All scraping methods failed" in str(e)
+        else:
+            raise AssertionError("The scrape should fail")
+        finally:
+            del registry.usable
+    return True
+
+
+if __name__ == "__main__":
+    passed = all([test_hedge_beats_slow_backend(), test_failure_starts_next_immediately(),
+                  test_no_usable_backend()])
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
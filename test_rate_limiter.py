@@ -0,0 +1,55 @@
+"""Offline test for the shared per-host token-bucket rate limiter."""
+import sys
+import threading
+import time
+
+from src.rate_limiter import RateLimiter
+
+
+def test_burst_is_immediate():
+    """Idle capacity should be used without sleeping."""
+    print("\n" + "="*60)
+    print("TEST 1: Burst uses idle capacity")
+    print("="*60)
+    
+    limiter = RateLimiter(rate=2, burst=3)
+    start = time.perf_counter()
+    for _ in range(3):
+        limiter.acquire("https://example.com/search.html")
+    elapsed = time.perf_counter() - start
+    
+    print(f"✅ 3 requests in {elapsed:.3f}s")
+    assert elapsed < 0.1, "Burst requests should not wait"
+    return True
+
+
+def test_rate_bounded_across_threads():
+    """Concurrent callers share one bucket per host."""
+    print("\n" + "="*60)
+    print("TEST 2: Rate bounded under concurrency")
+    print("="*60)
+    
+    limiter = RateLimiter(rate=10, burst=1)
+    url = "https://example.com/search.html?q=car"
+    threads = [threading.Thread(target=limiter.acquire, args=(url,)) for _ in range(6)]
+    
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    
+    print(f"✅ 6 concurrent requests took {elapsed:.2f}s at 10 req/s")
+    assert elapsed >= 0.45, "Requests beyond the burst must be paced"
+    assert elapsed < 1.0, "Pacing should not overshoot the configured rate"
+    
+    other = limiter.bucket("https://other.example.org/")
+    assert other is not limiter.bucket(url), "Hosts get independent buckets"
+    return True
+
+
+if __name__ == "__main__":
+    passed = test_burst_is_immediate() and test_rate_bounded_across_threads()
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
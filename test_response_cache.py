@@ -0,0 +1,145 @@
+"""Offline test for the disk-backed response cache."""
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import src.scraper_requests as scraper_requests
+from src.rate_limiter import RateLimiter
+from src.response_cache import ResponseCache
+from src.scraper_requests import RequestsScraper
+
+LISTINGS = [{'titulo': 'Car 1', 'precio_raw': '150 USD', 'url': 'http://example.com/1', 'fuente': 'revolico'}]
+
+
+def test_hit_miss_and_normalization():
+    """Equivalent queries share entries and counters track lookups."""
+    print("\n" + "="*60)
+    print("TEST 1: Hits, misses and query normalization")
+    print("="*60)
+    
+    cache = ResponseCache(directory=tempfile.mkdtemp(), ttl=60)
+    
+    assert cache.get_listings("car", 1) is None, "Empty cache should miss"
+    cache.put("car", 1, LISTINGS, body="<html></html>")
+    assert cache.get_listings("  CAR ", 1) == LISTINGS, "Normalized query should hit"
+    assert cache.get_listings("car", 2) is None, "Other pages are separate entries"
+    
+    stats = cache.stats()
+    print(f"✅ Stats: {stats}")
+    assert stats['hits'] == 1 and stats['misses'] == 2, "Counters should track lookups"
+    assert stats['entries'] == 1, "One entry on disk"
+    return True
+
+
+def test_ttl_expiry():
+    """Entries expire after their own TTL."""
+    print("\n" + "="*60)
+    print("TEST 2: Per-entry TTL")
+    print("="*60)
+    
+    cache = ResponseCache(directory=tempfile.mkdtemp(), ttl=60)
+    cache.put("car", 1, LISTINGS, ttl=0.1)
+    cache.put("car", 2, LISTINGS)
+    time.sleep(0.2)
+    
+    assert cache.get("car", 1) is None, "Short-TTL entry should be stale"
+    assert cache.get("car", 2) is not None, "Default-TTL entry should be fresh"
+    print("✅ TTLs respected")
+    return True
+
+
+def test_lru_eviction():
+    """Least recently used entries are evicted above the size cap."""
+    print("\n" + "="*60)
+    print("TEST 3: Size-bounded LRU eviction")
+    print("="*60)
+    
+    body = "x" * 2000
+    cache = ResponseCache(directory=tempfile.mkdtemp(), ttl=60, max_bytes=5000)
+    cache.put("car", 1, LISTINGS, body=body)
+    time.sleep(0.05)
+    cache.put("car", 2, LISTINGS, body=body)
+    time.sleep(0.05)
+    cache.get("car", 1)  # page 1 is now the most recently used
+    time.sleep(0.05)
+    cache.put("car", 3, LISTINGS, body=body)
+    
+    assert cache.get("car", 2) is None, "LRU entry should be evicted"
+    assert cache.get("car", 1) is not None, "Recently used entry should survive"
+    assert cache.get("car", 3) is not None, "Newest entry should survive"
+    assert cache.stats()['bytes'] <= 5000, "Cache should fit the cap"
+    print("✅ LRU eviction keeps the cache under max_bytes")
+    return True
+
+
+class _ETagHandler(BaseHTTPRequestHandler):
+    """Serves a fixed results page with an ETag and honours If-None-Match."""
+    ETAG = '"v1"'
+    full_responses = 0
+    not_modified = 0
+    
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == self.ETAG:
+            type(self).not_modified += 1
+            self.send_response(304)
+            self.send_header('ETag', self.ETAG)
+            self.end_headers()
+            return
+        
+        type(self).full_responses += 1
+        items = "".join(
+            f'<a href="/anuncio/{i}" title="Car {i}">Car {i} {100 * i} USD</a>' for i in range(1, 6)
+        )
+        body = f"<html><body>{items}{' ' * 1000}</body></html>".encode()
+        self.send_response(200)
+        self.send_header('ETag', self.ETAG)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+def test_conditional_revalidation():
+    """An expired entry is revalidated with If-None-Match and reused on 304."""
+    print("\n" + "="*60)
+    print("TEST 4: Conditional revalidation (ETag)")
+    print("="*60)
+    
+    scraper_requests.rate_limiter = RateLimiter(rate=100, burst=10)
+    scraper_requests.response_cache = ResponseCache(directory=tempfile.mkdtemp(), ttl=0.1)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _ETagHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        scraper = RequestsScraper()
+        scraper.base_url = f"http://127.0.0.1:{server.server_port}/search.html"
+        
+        first = scraper._scrape_page("car", 1)
+        time.sleep(0.2)  # let the entry expire
+        second = scraper._scrape_page("car", 1)
+        time.sleep(0.2)
+        third = scraper.scrape_concurrent("car", max_pages=1)
+        
+        print(f"✅ full={_ETagHandler.full_responses} not_modified={_ETagHandler.not_modified}")
+        assert len(first) == 5 and second == first and third == first, "304 should reuse cached listings"
+        assert _ETagHandler.full_responses == 1, "Body should be downloaded only once"
+        assert _ETagHandler.not_modified == 2, "Both engines should revalidate"
+        assert scraper_requests.response_cache.stats()['revalidated'] == 2
+        return True
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    passed = all([
+        test_hit_miss_and_normalization(),
+        test_ttl_expiry(),
+        test_lru_eviction(),
+        test_conditional_revalidation(),
+    ])
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
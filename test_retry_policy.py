@@ -0,0 +1,250 @@
+"""Offline test for the shared retry policy and the per-backend circuit breakers."""
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import requests
+
+import src.scraper as scraper_module
+import src.scraper_requests as scraper_requests
+from src.backend_stats import CHALLENGE, SUCCESS, BackendStats
+from src.challenge import ChallengeBlocked
+from src.rate_limiter import RateLimiter
+from src.response_cache import ResponseCache
+from src.retry_policy import (CONNECTION, DNS, OTHER, RATE_LIMITED, SERVER_ERROR, TIMEOUT, CircuitBreakers,
+                              RetryableStatus, RetryBudget, RetryPolicy, classify)
+from src.scraper import RevolicoScraper
+from src.scraper_requests import RequestsScraper
+
+LISTING = {'titulo': 'Car', 'precio_raw': '100 USD', 'url': ''}
+
+
+def test_classify():
+    """Errors of every client map to the same classes."""
+    print("\n" + "="*60)
+    print("TEST 1: Error classification")
+    print("="*60)
+    
+    try:
+        try:
+            raise socket.gaierror(-2, "Name or service not known")
+        except socket.gaierror as e:
+            raise requests.exceptions.ConnectionError("Max retries exceeded") from e
+    except Exception as e:
+        wrapped_dns = e
+    
+    cases = [
+        (ChallengeBlocked("http://x", 403, "Just a moment"), CHALLENGE),
+        (RetryableStatus("http://x", 429), RATE_LIMITED),
+        (RetryableStatus("http://x", 503), SERVER_ERROR),
+        (requests.exceptions.ReadTimeout("read timed out"), TIMEOUT),
+        (httpx.ConnectTimeout("connect"), TIMEOUT),
+        (subprocess.TimeoutExpired("curl", 20), TIMEOUT),
+        (Exception("curl transfer for page 2 failed: curl: (28) Operation timed out after 15001 ms"), TIMEOUT),
+        (wrapped_dns, DNS),
+        (Exception("curl transfer for page 1 failed: curl: (6) Could not resolve host: x"), DNS),
+        (httpx.ConnectError("[Errno 111] Connection refused"), CONNECTION),
+        (requests.exceptions.ConnectionError("Connection aborted."), CONNECTION),
+        (ValueError("bad markup"), OTHER),
+    ]
+    for error, expected in cases:
+        got = classify(error)
+        print(f"  {type(error).__name__}: {got}")
+        assert got == expected, f"{error!r} should be {expected}, got {got}"
+    print("✅ All errors classified")
+    return True
+
+
+def test_backoff_and_budget():
+    """Transient errors are retried with backoff until the attempts or the budget run out."""
+    print("\n" + "="*60)
+    print("TEST 2: Backoff, attempts and the retry budget")
+    print("="*60)
+    
+    policy = RetryPolicy(max_attempts=3, base_delay=0.05, max_delay=1.0)
+    calls = []
+    
+    def flaky():
+        calls.append(time.perf_counter())
+        if len(calls) < 3:
+            raise requests.exceptions.ReadTimeout("read timed out")
+        return "ok"
+    
+    budget = RetryBudget(5)
+    assert policy.call(flaky, budget=budget) == "ok"
+    assert len(calls) == 3 and budget.spent == 2, "Two retries, both paid from the budget"
+    
+    def challenged():
+        calls.append(None)
+        raise ChallengeBlocked("http://x", 403)
+    
+    calls.clear()
+    try:
+        policy.call(challenged, budget=budget)
+    except ChallengeBlocked:
+        pass
+    assert len(calls) == 1, "Challenges are not retried"
+    
+    def always_503():
+        calls.append(None)
+        raise RetryableStatus("http://x", 503)
+    
+    calls.clear()
+    budget = RetryBudget(1)
+    for _ in range(2):
+        try:
+            policy.call(always_503, budget=budget)
+        except RetryableStatus:
+            pass
+    assert len(calls) == 3, "One retry for the first call, none left for the second"
+    
+    def slow_down():
+        calls.append(None)
+        raise RetryableStatus("http://x", 429, retry_after=60)
+    
+    calls.clear()
+    try:
+        policy.call(slow_down)
+    except RetryableStatus:
+        pass
+    assert len(calls) == 1, "A Retry-After beyond max_delay is not waited for"
+    
+    delays = [RetryPolicy(base_delay=1.0, max_delay=3.0).backoff(n) for n in range(6) for _ in range(50)]
+    assert 0 <= min(delays) and max(delays) <= 3.0, "Full jitter stays within [0, max_delay]"
+    print(f"✅ Retries stop at max_attempts and at the budget; jittered delays in [{min(delays):.2f}, {max(delays):.2f}]")
+    return True
+
+
+def test_circuit_breaker():
+    """Repeated challenges open the breaker; one trial after the cooldown decides."""
+    print("\n" + "="*60)
+    print("TEST 3: Circuit breaker")
+    print("="*60)
+    
+    breakers = CircuitBreakers(threshold=2, cooldown=0.2, max_cooldown=1.0)
+    breakers.record('curl-direct', CHALLENGE)
+    assert breakers.allow('curl-direct'), "One challenge is not enough"
+    breakers.record('curl-direct', CHALLENGE)
+    assert not breakers.allow('curl-direct'), "Two in a row open the breaker"
+    
+    time.sleep(0.25)
+    assert breakers.allow('curl-direct'), "After the cooldown one trial goes through"
+    assert not breakers.allow('curl-direct'), "Only one trial at a time"
+    breakers.record('curl-direct', CHALLENGE)
+    time.sleep(0.25)
+    assert not breakers.allow('curl-direct'), "A challenged trial reopens for twice as long"
+    time.sleep(0.2)
+    assert breakers.allow('curl-direct')
+    breakers.record('curl-direct', SUCCESS)
+    assert breakers.allow('curl-direct') and breakers.allow('curl-direct'), "A successful trial closes it"
+    print(f"✅ {breakers.stats()}")
+    assert breakers.stats()['curl-direct'] == {'state': 'closed', 'challenges': 0, 'trips': 2}
+    return True
+
+
+def test_scrape_skips_tripped_backend():
+    """RevolicoScraper stops calling a backend that keeps getting challenged."""
+    print("\n" + "="*60)
+    print("TEST 4: Scrapes skip a backend with an open breaker")
+    print("="*60)
+    
+    calls = []
+    
+    def fake_backend(backend, query, page_nums):
+        calls.append(backend)
+        if backend == 'requests':
+            raise ChallengeBlocked("http://x", 403)
+        return {1: [dict(LISTING, titulo=backend)]}
+    
+    saved = (scraper_module.circuit_breakers, scraper_module.backend_stats)
+    breakers = scraper_module.circuit_breakers = CircuitBreakers(threshold=3, cooldown=60)
+    scraper_module.backend_stats = BackendStats(path=Path(tempfile.mkdtemp()) / "stats.json")
+    scraper_module.backend_stats.order = lambda backends: list(backends)
+    try:
+        scraper = RevolicoScraper()
+        scraper.BACKENDS = ('requests', 'curl-direct')
+        scraper._run_backend = fake_backend
+        for _ in range(5):
+            scraper.scrape("car")
+    finally:
+        scraper_module.circuit_breakers, scraper_module.backend_stats = saved
+    
+    print(f"✅ Calls: {calls}")
+    assert calls.count('requests') == 3, "Skipped once its breaker opened"
+    assert calls.count('curl-direct') == 5
+    assert breakers.stats()['requests']['state'] == 'open'
+    return True
+
+
+class _FlakyHandler(BaseHTTPRequestHandler):
+    """Fails every page's first request with 503, serves it on the second."""
+    seen = set()
+    lock = threading.Lock()
+    
+    def do_GET(self):
+        with self.lock:
+            first = self.path not in self.seen
+            self.seen.add(self.path)
+        if first:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        page_num = parse_qs(urlparse(self.path).query).get('page', ['1'])[0]
+        items = "".join(
+            f'<a href="/anuncio/{page_num}-{i}" title="Car {i}">Car {i} {100 * i} USD</a>' for i in range(1, 6)
+        )
+        body = f"<html><body>{items}{' ' * 1000}</body></html>".encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+def test_requests_backend_retries_5xx():
+    """A 503 is retried after a backoff and the page is still served."""
+    print("\n" + "="*60)
+    print("TEST 5: The requests engine retries a 503")
+    print("="*60)
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FlakyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    saved = (scraper_requests.retry_policy, scraper_requests.rate_limiter, scraper_requests.response_cache)
+    scraper_requests.retry_policy = RetryPolicy(max_attempts=3, base_delay=0.05)
+    scraper_requests.rate_limiter = RateLimiter(rate=100, burst=10)
+    scraper_requests.response_cache = ResponseCache(directory=tempfile.mkdtemp())
+    try:
+        scraper = RequestsScraper()
+        scraper.base_url = f"http://127.0.0.1:{server.server_port}/search.html"
+        scraper.retry_budget = RetryBudget(10)
+        outcomes = scraper.scrape_pages("car", [1, 2, 3])
+        
+        print(f"✅ Pages: { {n: len(v) for n, v in outcomes.items()} }, retries spent: {scraper.retry_budget.spent}")
+        assert all(len(v) == 5 for v in outcomes.values()), "Every page served on its second try"
+        assert scraper.retry_budget.spent == 3
+        return True
+    finally:
+        scraper_requests.retry_policy, scraper_requests.rate_limiter, scraper_requests.response_cache = saved
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    passed = all([
+        test_classify(),
+        test_backoff_and_budget(),
+        test_circuit_breaker(),
+        test_scrape_skips_tripped_backend(),
+        test_requests_backend_retries_5xx(),
+    ])
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,147 @@
+"""Offline test for coalescing identical concurrent scrapes."""
+import asyncio
+import sys
+import tempfile
+import threading
+import time
+
+import src.scraper as scraper_module
+from src.singleflight import SingleFlight
+
+LISTING = {'titulo': 'Car', 'precio_raw': '100 USD', 'url': ''}
+
+
+def _fake_scrapes(delay: float = 0.3, error: Exception = None) -> list:
+    """Replace RevolicoScraper.scrape/scrape_async with slow fakes; returns the list of calls."""
+    calls = []
+    
+    def scrape(self, query, max_pages=1, race=None, deadline=None, budget_s=None):
+        calls.append((query, max_pages))
+        time.sleep(delay)
+        if error:
+            raise error
+        return [dict(LISTING, titulo=query)]
+    
+    async def scrape_async(self, query, max_pages=1, race=None, deadline=None, budget_s=None):
+        calls.append((query, max_pages))
+        await asyncio.sleep(delay)
+        return [dict(LISTING, titulo=query)]
+    
+    scraper_module.RevolicoScraper.scrape = scrape
+    scraper_module.RevolicoScraper.scrape_async = scrape_async
+    scraper_module.scrape_flight = SingleFlight()
+    return calls
+
+
+def _concurrently(*calls) -> list:
+    """Run the (fn, args) pairs in threads started together; returns their results or exceptions."""
+    results = [None] * len(calls)
+    
+    def run(i, fn, args):
+        try:
+            results[i] = fn(*args)
+        except Exception as e:
+            results[i] = e
+    
+    threads = [threading.Thread(target=run, args=(i, fn, args)) for i, (fn, args) in enumerate(calls)]
+    for t in threads:
+        t.start()
+        time.sleep(0.01)
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_identical_scrapes_share_one_run():
+    """Five callers of the same (normalized) query get one scrape."""
+    print("\n" + "="*60)
+    print("TEST 1: Concurrent identical scrapes")
+    print("="*60)
+    
+    calls = _fake_scrapes()
+    queries = ["car", "Car", " car ", "CAR", "car"]
+    start = time.perf_counter()
+    results = _concurrently(*((scraper_module.scrape_revolico, (q, 2)) for q in queries))
+    elapsed = time.perf_counter() - start
+    
+    print(f"✅ {len(calls)} scrape(s) for {len(queries)} callers in {elapsed:.2f}s; {scraper_module.scrape_flight.stats()}")
+    assert len(calls) == 1, "Later callers attach to the scrape in flight"
+    assert all(r == results[0] for r in results) and results[0], "Everyone gets the same listings"
+    assert results[0] is not results[1], "Each caller gets its own list"
+    assert elapsed < 0.6
+    assert scraper_module.scrape_flight.stats() == {'calls': 5, 'shared': 4, 'in_flight': 0}
+    
+    scraper_module.scrape_revolico("car", 2)
+    assert len(calls) == 2, "Nothing is cached once the scrape is over"
+    return True
+
+
+def test_different_keys_and_errors():
+    """Other queries or page counts run separately; a failure reaches every waiter."""
+    print("\n" + "="*60)
+    print("TEST 2: Distinct keys and shared errors")
+    print("="*60)
+    
+    calls = _fake_scrapes()
+    _concurrently((scraper_module.scrape_revolico, ("car", 1)),
+                  (scraper_module.scrape_revolico, ("car", 2)),
+                  (scraper_module.scrape_revolico, ("moto", 1)))
+    assert len(calls) == 3, "Different query or page count: different scrapes"
+    
+    calls = _fake_scrapes(error=RuntimeError("All scraping methods failed"))
+    results = _concurrently(*((scraper_module.scrape_revolico, ("car", 1)) for _ in range(3)))
+    print(f"✅ {len(calls)} failing scrape, outcomes: {[type(r).__name__ for r in results]}")
+    assert len(calls) == 1
+    assert all(isinstance(r, RuntimeError) for r in results), "Followers see the leader's error"
+    return True
+
+
+def test_async_callers():
+    """scrape_revolico_async coalesces callers on the same loop."""
+    print("\n" + "="*60)
+    print("TEST 3: Async callers")
+    print("="*60)
+    
+    calls = _fake_scrapes()
+    
+    async def main():
+        return await asyncio.gather(*(scraper_module.scrape_revolico_async("car", 1) for _ in range(4)))
+    
+    results = asyncio.run(main())
+    print(f"✅ {len(calls)} scrape(s) for 4 async callers")
+    assert len(calls) == 1 and all(r == results[0] for r in results)
+    return True
+
+
+def test_across_processes():
+    """With a lock directory, the same key's leader elsewhere waits for the running one."""
+    print("\n" + "="*60)
+    print("TEST 4: File lock between flights (one per worker process)")
+    print("="*60)
+    
+    lock_dir = tempfile.mkdtemp()
+    worker_a, worker_b = SingleFlight(lock_dir=lock_dir), SingleFlight(lock_dir=lock_dir)
+    spans = []
+    
+    def scrape(name):
+        start = time.perf_counter()
+        time.sleep(0.3)
+        spans.append((name, start, time.perf_counter()))
+        return name
+    
+    _concurrently((worker_a.do, (("car", 1), scrape, "a")), (worker_b.do, (("car", 1), scrape, "b")))
+    (_, _, first_end), (_, second_start, _) = sorted(spans, key=lambda span: span[1])
+    print(f"✅ Second worker started {second_start - first_end:+.2f}s after the first finished")
+    assert second_start >= first_end, "The second worker's scrape waits for the first"
+    return True
+
+
+if __name__ == "__main__":
+    passed = all([
+        test_identical_scrapes_share_one_run(),
+        test_different_keys_and_errors(),
+        test_async_callers(),
+        test_across_processes(),
+    ])
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)
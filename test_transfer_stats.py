@@ -0,0 +1,162 @@
+"""Offline test for compression negotiation and byte accounting."""
+import asyncio
+import contextlib
+import gzip
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import brotli
+
+import src.scraper_curl as scraper_curl
+import src.scraper_requests as scraper_requests
+import src.transfer_stats as transfer_module
+from src.rate_limiter import RateLimiter
+from src.response_cache import ResponseCache
+from src.scraper_curl import CurlDirectScraper
+from src.scraper_requests import RequestsScraper
+from src.transfer_stats import ACCEPT_ENCODING, TransferStats
+
+seen_encodings = []
+
+
+def _listing_page(page_num: int) -> bytes:
+    """A fake results page; the padding compresses well, like real HTML does."""
+    items = "".join(
+        f'<a href="/anuncio/{page_num}-{i}" title="Car {page_num}-{i}">Car {page_num}-{i} {100 * i} USD</a>'
+        for i in range(1, 6)
+    )
+    return f"<html><body>{items}{'<div class=card></div>' * 500}</body></html>".encode()
+
+
+class _CompressingHandler(BaseHTTPRequestHandler):
+    """Serves br if the client accepts it, else gzip, else identity."""
+    protocol_version = "HTTP/1.1"
+    
+    def do_GET(self):
+        page_num = int(parse_qs(urlparse(self.path).query).get('page', ['1'])[0])
+        accepted = [e.split(';')[0].strip() for e in self.headers.get('Accept-Encoding', '').split(',')]
+        seen_encodings.append(self.headers.get('Accept-Encoding', ''))
+        body = _listing_page(page_num)
+        encoding = None
+        if 'br' in accepted:
+            body, encoding = brotli.compress(body), 'br'
+        elif 'gzip' in accepted:
+            body, encoding = gzip.compress(body), 'gzip'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+def _start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _CompressingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@contextlib.contextmanager
+def _local_setup():
+    """
+    Fresh transfer stats, no production pacing and an empty cache of its own
+    (so nothing another test cached is served), for one test only.
+    """
+    modules = (scraper_requests, scraper_curl, transfer_module)
+    saved = [(module.rate_limiter, module.response_cache) for module in modules[:2]]
+    saved_stats = [module.transfer_stats for module in modules]
+    stats = TransferStats()
+    for module in modules:
+        module.transfer_stats = stats
+    for module in modules[:2]:
+        module.rate_limiter = RateLimiter(rate=100, burst=10)
+        module.response_cache = ResponseCache(directory=tempfile.mkdtemp())
+    try:
+        yield stats
+    finally:
+        for module, (rate_limiter, response_cache) in zip(modules, saved):
+            module.rate_limiter, module.response_cache = rate_limiter, response_cache
+        for module, transfer_stats in zip(modules, saved_stats):
+            module.transfer_stats = transfer_stats
+
+
+def test_accept_encoding():
+    """br is offered first when brotli is installed; gzip is always offered."""
+    print("\n" + "="*60)
+    print("TEST 1: Accept-Encoding")
+    print("="*60)
+    
+    print(f"✅ Accept-Encoding: {ACCEPT_ENCODING}")
+    assert ACCEPT_ENCODING.split(", ")[0] == 'br'
+    assert 'gzip' in ACCEPT_ENCODING
+    assert RequestsScraper.HEADERS['Accept-Encoding'] == ACCEPT_ENCODING
+    assert not any(h.startswith('Accept-Encoding') for h in CurlDirectScraper.HEADERS), "curl negotiates itself"
+    return True
+
+
+def test_requests_engines_account_bytes():
+    """The blocking and the httpx engine record compressed and decoded bytes per backend and query."""
+    print("\n" + "="*60)
+    print("TEST 2: requests/httpx byte accounting")
+    print("="*60)
+    
+    server = _start_server()
+    try:
+        with _local_setup() as stats:
+            scraper = RequestsScraper()
+            scraper.base_url = f"http://127.0.0.1:{server.server_port}/search.html"
+            assert len(scraper.scrape("car", max_pages=2)) == 10
+            
+            scraper_requests.response_cache.clear()
+            assert len(asyncio.run(scraper.scrape_async("truck", max_pages=2))) == 10
+            
+            report = stats.report()
+        print(f"✅ {report}")
+        backend = report['backends']['requests']
+        assert backend['responses'] == 4 and backend['encodings'] == {'br': 4}
+        assert 0 < backend['wire_bytes'] < backend['body_bytes'] / 5, "Bodies crossed the wire compressed"
+        assert backend['body_bytes'] == 4 * len(_listing_page(1))
+        assert backend['saved_ratio'] > 0.8
+        assert report['queries']['car']['responses'] == 2 and report['queries']['truck']['responses'] == 2
+        assert stats.query_summary("bus")['responses'] == 0
+        return True
+    finally:
+        server.shutdown()
+
+
+def test_curl_accounts_bytes():
+    """The curl batch negotiates compression itself and reports size_download per page."""
+    print("\n" + "="*60)
+    print("TEST 3: curl byte accounting")
+    print("="*60)
+    
+    seen_encodings.clear()
+    server = _start_server()
+    try:
+        with _local_setup() as stats:
+            scraper = CurlDirectScraper()
+            scraper.base_url = f"http://127.0.0.1:{server.server_port}/search.html"
+            assert len(scraper.scrape("car", max_pages=3)) == 15
+        
+        totals = stats.report()['backends']['curl-direct']
+        print(f"✅ curl sent Accept-Encoding {seen_encodings[0]!r}; {totals}")
+        assert totals['responses'] == 3
+        assert totals['body_bytes'] == 3 * len(_listing_page(1))
+        assert 0 < totals['wire_bytes'] < totals['body_bytes'] / 5
+        assert sum(totals['encodings'].values()) == 3 and 'identity' not in totals['encodings']
+        return True
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    passed = test_accept_encoding() and test_requests_engines_account_bytes() and test_curl_accounts_bytes()
+    print("\n🎉 All tests passed!" if passed else "\n⚠️ Some tests failed")
+    sys.exit(0 if passed else 1)